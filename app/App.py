@@ -8,14 +8,22 @@ sys.path.insert(0, PROJECT_ROOT)
 
 from components.sidebar import render_sidebar
 from components.layout import page_header, divider, section_title
-from main import main 
-from src.user.model_user import build_user_model, load_user_model, update_user_model, save_user_json
+from main import rank, get_registry, get_prefetcher
+from src.user.model_user import build_user_model, load_user, update_user_model, list_user_ids, enable_write_behind, enable_event_log
 from utils.io_utils import load_yaml
 
 config = load_yaml()
-rel_path_users = config['paths']['user_json']
-users_path = os.path.join(PROJECT_ROOT, rel_path_users)
-os.makedirs(users_path, exist_ok=True)
+
+# salvataggio asincrono dei profili: il feedback non attende la scrittura su disco
+if config.get('write_behind', {}).get('enabled', False):
+    enable_write_behind(
+        flush_interval=config['write_behind'].get('flush_interval', 1.0),
+        max_batch=config['write_behind'].get('max_batch', 500)
+    )
+
+# feedback registrati nel log degli eventi, compattati periodicamente negli snapshot da questo processo
+if config.get('event_log', {}).get('enabled', False):
+    enable_event_log(compact_interval=config['event_log'].get('compact_interval', 300))
 
 if "selected_doc" not in st.session_state:
     st.session_state.selected_doc = None
@@ -83,15 +91,19 @@ if user_mode == "Crea Nuovo Utente":
         section_title("Raccomandazioni per Utente #" + str(st.session_state.current_user['user_id']))
         
         try:
-            df = st.session_state.get("recommendations_df")
-            if df is None:
-                df = main(st.session_state.current_user)
-                st.session_state.recommendations_df = df
+            result = st.session_state.get("recommendations")
+            if result is None:
+                result = get_prefetcher().get(st.session_state.current_user, timeout=5)
+            if result is None:
+                result = rank(st.session_state.current_user)
+            st.session_state.recommendations = result
             
-            if df is not None and len(df) > 0:
+            if result is not None and len(result) > 0:
                 
-                st.success(f"Trovate {len(df)} raccomandazioni!")
+                st.success(f"Trovate {len(result)} raccomandazioni!")
                 st.write("Scegli quale raccomandazione leggere: ")
+                page = st.number_input("Pagina", min_value=1, max_value=result.page_count(), value=1, step=1, key="page_new")
+                df = result.page(page - 1)
                 st.dataframe(df, use_container_width=True)
                 
                 section_title("Seleziona un testo da leggere")
@@ -107,10 +119,9 @@ if user_mode == "Crea Nuovo Utente":
                 col1, col2 = st.columns([1, 3])
                 with col1:
                     if st.button("Apri testo", key="open_btn_new"):
-                        matching_docs = df[df["title"] == selected_title]
-                        if len(matching_docs) > 0:
-                            st.session_state.selected_doc = matching_docs.iloc[0].to_dict()
-                        else:
+                        try:
+                            st.session_state.selected_doc = result.document(selected_title)
+                        except ValueError:
                             st.error("Documento non trovato")
 
                 if st.session_state.selected_doc is not None:
@@ -144,7 +155,12 @@ if user_mode == "Crea Nuovo Utente":
                                 doc_id = str(doc['title'])
                                 doc_readability = float(doc.get('flesch_score', 60))
                                 difficulty_val = int(difficulty)
-                                update_user_model(st.session_state.current_user, doc_id, doc_readability, difficulty_val)
+                                with get_registry().acquire() as engine:
+                                    update_user_model(st.session_state.current_user, doc_id, doc_readability, difficulty_val,
+                                                      doc_embedding=engine.get_document_embedding(doc_id))
+                                    engine.observe_feedback(st.session_state.current_user, doc_id, difficulty_val)
+                                get_prefetcher().schedule(st.session_state.current_user)
+                                st.session_state.recommendations = None
                                 st.success("Feedback registrato e profilo aggiornato!")
                                 st.session_state.selected_doc = None
                                 st.rerun()
@@ -160,7 +176,6 @@ if user_mode == "Crea Nuovo Utente":
                         st.divider() """
             else:
                 st.warning("Nessuna raccomandazione disponibile con questi parametri")
-                st.dataframe(df)
         except Exception as e:
             st.error(f"Errore nel caricamento: {str(e)}")
 
@@ -170,26 +185,15 @@ if user_mode == "Crea Nuovo Utente":
 else:
     section_title("Usa Profilo Utente Esistente")
     
-    existing_users = []
-    
-    for file in os.listdir(users_path):
-        if file.startswith("user") and file.endswith(".json"):
-            path = os.path.join(users_path, file)
-            try:
-                uid = int(file[4:-5])
-                existing_users.append((uid, path))
-            except:
-                pass
+    existing_users = list_user_ids()
 
     if existing_users:
-        existing_users.sort(key=lambda x: x[0])
-        
         col1, col2 = st.columns([2, 1])
         
         with col1:
             selected_user_id = st.selectbox(
                 "Seleziona Utente Esistente",
-                [uid for uid, _ in existing_users],
+                existing_users,
                 format_func=lambda x: f"Utente #{x}"
             )
         
@@ -202,10 +206,8 @@ else:
         
         divider()
         
-        selected_file = [path for uid, path in existing_users if uid == selected_user_id][0]
-        
         try:
-            user_profile = load_user_model(f"user{selected_user_id}.json", users_path)
+            user_profile = load_user(selected_user_id)
             st.session_state.current_user = user_profile 
             if user_profile is not None:
                 st.success(f"Profilo caricato: Utente #{selected_user_id}")
@@ -225,15 +227,20 @@ else:
                 section_title("Raccomandazioni per Utente #" + str(selected_user_id))
                 
                 try:
-                    df = st.session_state.get("recommendations_df_existing")
+                    result = st.session_state.get("recommendations_existing")
                     load_btn2 = st.button("Genera Raccomandazioni")
-                    if df is None and load_btn2 is True:
-                        df = main(user_profile)
-                        st.session_state.recommendations_df_existing = df
+                    if result is None:
+                        result = get_prefetcher().get(user_profile, timeout=5)
+                        st.session_state.recommendations_existing = result
+                    if result is None and load_btn2 is True:
+                        result = rank(user_profile)
+                        st.session_state.recommendations_existing = result
                     
-                    if df is not None and len(df) > 0:
-                        st.success(f"Trovate {len(df)} raccomandazioni!")
+                    if result is not None and len(result) > 0:
+                        st.success(f"Trovate {len(result)} raccomandazioni!")
                         st.write("Scegli quale raccomandazione leggere: ")
+                        page = st.number_input("Pagina", min_value=1, max_value=result.page_count(), value=1, step=1, key="page_existing")
+                        df = result.page(page - 1)
                         st.dataframe(df, use_container_width=True)
                         
                         section_title("Seleziona un testo da leggere")
@@ -249,10 +256,9 @@ else:
                         col1, col2 = st.columns([1, 3])
                         with col1:
                             if st.button("Apri testo", key="open_btn_existing"):
-                                matching_docs = df[df["title"] == selected_title]
-                                if len(matching_docs) > 0:
-                                    st.session_state.selected_doc_existing = matching_docs.iloc[0].to_dict()
-                                else:
+                                try:
+                                    st.session_state.selected_doc_existing = result.document(selected_title)
+                                except ValueError:
                                     st.error("Documento non trovato")
 
                         if st.session_state.get("selected_doc_existing") is not None:
@@ -286,7 +292,12 @@ else:
                                         
                                         doc_readability = float(doc.get('flesch_score', 60))
                                         difficulty_val = int(difficulty)
-                                        update_user_model(st.session_state.current_user, doc_id, doc_readability, difficulty_val)
+                                        with get_registry().acquire() as engine:
+                                            update_user_model(st.session_state.current_user, doc_id, doc_readability, difficulty_val,
+                                                              doc_embedding=engine.get_document_embedding(doc_id))
+                                            engine.observe_feedback(st.session_state.current_user, doc_id, difficulty_val)
+                                        get_prefetcher().schedule(st.session_state.current_user)
+                                        st.session_state.recommendations_existing = None
                                         st.success("Feedback registrato e profilo aggiornato!")
                                         st.session_state.selected_doc_existing = None
                                         st.rerun()
@@ -294,7 +305,8 @@ else:
                                         st.error(f"Errore nell'aggiornamento del profilo: {str(e)}")
                         
                         with st.expander("Visualizza Dettagli Completi"):
-                            for idx, row in df.iterrows():
+                            for title in df["title"]:
+                                row = result.document(title)
                                 st.markdown(f"### {row['title']}")
                                 st.write(f"Score: {row['score']:.4f}")
                                 st.write(f"Testo:\n{row['testo']}")
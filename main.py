@@ -4,9 +4,15 @@ ROOT = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, ROOT)
 
 from src.recommender.recommender_engine import RecommenderEngine
-from utils.io_utils import load_csv, load_pickle, load_yaml
+from src.recommender.prefetch import RecommendationPrefetcher
+from src.recommender.engine_registry import EngineRegistry, artifact_signature
+from src.features.embeddings import document_positions
+from src.user.model_user import set_embedding_source, corpus_centroid
+from utils.data_loader import reset_caches
+from utils.io_utils import load_csv, load_pickle, load_yaml, load_npz
 import numpy as np 
 import pandas as pd
+from functools import lru_cache
 
 
 
@@ -25,6 +31,84 @@ def load_utils():
     return config, df, embedding
 
 
+def segment_index_path(config):
+    """Path dell'indice dei paragrafi scritto dalla pipeline (stage segments)"""
+    return os.path.join(ROOT, config['paths'].get('segment_index', "data/processed/segment_index.npz"))
+
+
+def build_engine():
+    """Crea un motore di raccomandazione leggendo dataset ed embedding da disco
+        (e l'indice dei paragrafi, se la pipeline l'ha creato)
+    
+    Returns:
+        RecommenderEngine: motore con dataset ed embedding caricati
+    """
+    config, df, embedding = load_utils()
+    segments_path = segment_index_path(config)
+    segments = load_npz(segments_path) if os.path.exists(segments_path) else None
+    
+    return RecommenderEngine(
+        df=df,
+        embedding=embedding,
+        config=config,
+        user_id=None,
+        profile_path= None,
+        segments=segments
+    )
+
+
+def artifacts_signature():
+    """Impronta degli artefatti del corpus (csv delle feature, pickle degli embedding e indice dei paragrafi)"""
+    config = load_yaml()
+    return artifact_signature([
+        os.path.join(ROOT, config['paths']['features_csv']),
+        os.path.join(ROOT, config['paths']['embeddings_pickle']),
+        segment_index_path(config)
+    ])
+
+
+def _on_engine_swap(engine):
+    # prima la sorgente degli embedding: indice e posizioni del nuovo motore cambiano insieme,
+    # quindi i feedback non leggono più dai loader mentre le loro cache vengono svuotate
+    # (le richieste ancora sul vecchio motore passano gli embedding del proprio indice)
+    set_embedding_source(engine)
+    reset_caches()
+    document_positions.cache_clear()
+    # i nuovi utenti partono dal centroide del nuovo corpus
+    corpus_centroid.cache_clear()
+
+
+@lru_cache(maxsize=1)
+def get_registry():
+    """Registro condiviso del motore di raccomandazione, creato alla prima chiamata
+        con hot_swap.enabled in configurazione un nuovo corpus pubblicato viene
+        caricato in background senza riavviare il processo
+    
+    Returns:
+        EngineRegistry: registro con il motore corrente
+    """
+    config = load_yaml()
+    hot_swap = config.get('hot_swap', {})
+    registry = EngineRegistry(
+        build_engine,
+        artifacts_signature,
+        on_swap=_on_engine_swap,
+        poll_interval=hot_swap.get('poll_interval', 30)
+    )
+    set_embedding_source(registry.current())
+    if hot_swap.get('enabled', False):
+        registry.start()
+    return registry
+
+
+def get_engine():
+    """Motore di raccomandazione corrente
+    
+    Returns:
+        RecommenderEngine: motore con dataset ed embedding caricati
+    """
+    return get_registry().current()
+
 
 def main(user):
     
@@ -36,20 +120,49 @@ def main(user):
             "history": []
         }
     
-    config, df, embedding = load_utils()
+    with get_registry().acquire() as engine:
+        rank = engine.rank_to_df(user)
     
-    engine = RecommenderEngine(
-        df=df,
-        embedding=embedding,
-        config=config,
-        user_id=user['user_id'],
-        profile_path= None
-    )
+    return rank
+
+
+def rank(user):
+    """Classifica dei documenti per un utente, letta a pagine (testi caricati su richiesta)
     
-    rank = engine.rank_to_df(user)
+    Args:
+        user (dict): dati dell'utente
     
-    return rank
+    Returns:
+        RankingResult: classifica dei documenti candidati
+    """
+    with get_registry().acquire() as engine:
+        return engine.rank(user)
 
 
+def rank_segments(user, k=None):
+    """Paragrafi raccomandati per un utente (indice dei paragrafi del corpus corrente)
+    
+    Args:
+        user (dict): dati dell'utente
+        k (int, optional): numero di paragrafi (default config['k'])
+    
+    Returns:
+        pd.DataFrame: title, score, testo e flesch_score dei paragrafi
+    
+    Raises:
+        ValueError: se la pipeline non ha creato l'indice dei paragrafi
+    """
+    with get_registry().acquire() as engine:
+        titles, scores, testi, flesch = engine.rank_segments(user, k=k)
+    return pd.DataFrame({"title": titles, "score": scores, "testo": testi, "flesch_score": flesch})
 
 
+@lru_cache(maxsize=1)
+def get_prefetcher():
+    """Pool condiviso per il calcolo in background delle prossime raccomandazioni
+    
+    Returns:
+        RecommendationPrefetcher: prefetcher che usa rank() come funzione di ranking
+    """
+    config = load_yaml()
+    return RecommendationPrefetcher(rank, max_workers=config.get('prefetch_workers', 2))
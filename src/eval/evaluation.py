@@ -1,10 +1,12 @@
 import numpy as np
 from sklearn.metrics import ndcg_score
-import os, sys
+import os, sys, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
 sys.path.insert(0, PROJECT_ROOT)
-from src.recommender.recommender_engine import RecommenderEngine
+from src.recommender.corpus_index import CorpusIndex
+from src.recommender.scorer import ScoringParams
 from utils.io_utils import load_yaml
 
 class RecommenderEvaluation:
@@ -59,11 +61,214 @@ class RecommenderEvaluation:
 
         return np.mean(self.ndcg_history)
 
+    def evaluate_full_catalog(self, recommender, users, relevant_gap=10.0, workers=None):
+        """
+        Valuta NDCG@k, precision@k e coverage sull'intero catalogo
+        (vedi evaluate_full_catalog)
+        
+        Args:
+            recommender (RecommenderEngine): il motore di raccomandazione
+            users (list[dict]): profili utente
+            relevant_gap (float): distanza flesch massima perché un documento sia rilevante
+            workers (int, optional): processi per valutare i blocchi di utenti in parallelo
+            
+        Returns:
+            dict: metriche medie e per utente
+        """
+        params = recommender.scorer.params._replace(k=self.k)
+        report = evaluate_full_catalog(recommender.index, users, params, relevant_gap=relevant_gap, workers=workers)
+        self.ndcg_history = report["ndcg_per_user"].tolist()
+        return report
+
+
+def pack_users(users, index):
+    """
+    Converte i profili in array per la valutazione vettoriale
+    
+    Args:
+        users (list[dict]): profili utente
+        index (CorpusIndex): indice del corpus
+        
+    Returns:
+        dict[str, np.ndarray]: topic vector normalizzati (U x D), target (U) e
+                               documenti già letti in forma sparsa (seen_rows, seen_cols)
+    """
+    vectors = np.asarray([user['topic_vector'] for user in users], dtype=np.float32).reshape(len(users), -1)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    targets = np.asarray([user['target_readability'] for user in users], dtype=np.float64)
+    
+    seen = [index.history_positions(user.get('history', ())) for user in users]
+    seen_rows = np.repeat(np.arange(len(users)), [len(cols) for cols in seen])
+    seen_cols = np.concatenate(seen) if seen else np.zeros(0, dtype=np.int64)
+    return {"vectors": vectors, "targets": targets, "seen_rows": seen_rows, "seen_cols": seen_cols}
+
+
+def slice_users(packed, start, stop):
+    """
+    Blocco di utenti [start, stop) di un insieme creato da pack_users
+    
+    Returns:
+        dict[str, np.ndarray]: stesso formato di pack_users
+    """
+    lo, hi = np.searchsorted(packed["seen_rows"], [start, stop])
+    return {
+        "vectors": packed["vectors"][start:stop],
+        "targets": packed["targets"][start:stop],
+        "seen_rows": packed["seen_rows"][lo:hi] - start,
+        "seen_cols": packed["seen_cols"][lo:hi]
+    }
+
+
+def catalog_metrics(sims, flesch, targets, seen_rows, seen_cols, params, relevant_gap=10.0, alive=None):
+    """
+    NDCG@k, precision@k e documenti raccomandati per un blocco di utenti,
+    calcolati in forma vettoriale sull'intero catalogo
+    
+    La rilevanza graduata di ogni candidato è quella di compute_relevance_from_flesch
+    (1 - distanza / distanza massima fra i candidati dell'utente), un documento è
+    rilevante per la precision se dista al più relevant_gap dal target.
+    Le similarità non dipendono da zeta, alpha e tol: possono essere calcolate una
+    volta e riusate per più configurazioni (vedi src/eval/sweep.py).
+    
+    Args:
+        sims (np.ndarray): similarità U x N fra utenti e documenti
+        flesch (np.ndarray): punteggi flesch degli N documenti
+        targets (np.ndarray): target readability degli U utenti
+        seen_rows, seen_cols (np.ndarray): coppie (utente, documento) già lette
+        params (ScoringParams): parametri dello score
+        relevant_gap (float): distanza flesch massima perché un documento sia rilevante
+        alive (np.ndarray, optional): False per i documenti rimossi dall'indice
+        
+    Returns:
+        dict[str, np.ndarray]: ndcg, precision e candidati per utente, posizioni dei top k (U x k, -1 se mancanti)
+    """
+    k = params.k
+    users, n_docs = sims.shape
+    diff = flesch[None, :] - targets[:, None]
+    dist = np.abs(diff)
+    
+    mask = dist <= params.tol
+    if alive is not None:
+        mask &= alive[None, :]
+    mask[seen_rows, seen_cols] = False
+    n_candidates = mask.sum(axis=1)
+    
+    scores = params.eta * sims - params.zeta * dist * np.where(diff > 0, 1 + params.alpha, 1)
+    scores = np.where(mask, scores, -np.inf)
+    
+    kk = min(k, n_docs)
+    top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk] if kk < n_docs else np.tile(np.arange(n_docs), (users, 1))
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.lexsort((top, -top_scores), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    valid = np.isfinite(np.take_along_axis(scores, top, axis=1))
+    
+    max_dist = np.where(mask, dist, 0).max(axis=1)
+    relevance = np.where(mask, 1 - dist / np.where(max_dist > 0, max_dist, 1)[:, None], 0)
+    
+    discounts = 1 / np.log2(np.arange(2, kk + 2))
+    dcg = (np.take_along_axis(relevance, top, axis=1) * valid * discounts).sum(axis=1)
+    ideal = -np.partition(-relevance, kk - 1, axis=1)[:, :kk] if kk < n_docs else relevance.copy()
+    ideal = -np.sort(-ideal, axis=1)
+    idcg = (ideal * discounts).sum(axis=1)
+    ndcg = np.divide(dcg, idcg, out=np.zeros(users), where=idcg > 0)
+    
+    relevant = np.take_along_axis(dist, top, axis=1) <= relevant_gap
+    precision = (relevant & valid).sum(axis=1) / k
+    
+    return {
+        "ndcg": ndcg,
+        "precision": precision,
+        "candidates": n_candidates,
+        "top": np.where(valid, top, -1)
+    }
+
+
+def _evaluate_block(index, packed, params, relevant_gap, chunk_size):
+    ndcg, precision, candidates = [], [], []
+    hits = np.zeros(len(index), dtype=np.int64)
+    for start in range(0, len(packed["targets"]), chunk_size):
+        chunk = slice_users(packed, start, start + chunk_size)
+        sims = chunk["vectors"] @ index.unit_embedding.T
+        metrics = catalog_metrics(
+            sims, index.flesch, chunk["targets"], chunk["seen_rows"], chunk["seen_cols"],
+            params, relevant_gap, index.alive
+        )
+        ndcg.append(metrics["ndcg"])
+        precision.append(metrics["precision"])
+        candidates.append(metrics["candidates"])
+        top = metrics["top"]
+        hits += np.bincount(top[top >= 0], minlength=len(index))
+    
+    empty = np.zeros(0)
+    return (np.concatenate(ndcg) if ndcg else empty, np.concatenate(precision) if precision else empty,
+            np.concatenate(candidates) if candidates else empty, hits)
+
+
+def _evaluate_shard(corpus_dir, packed, params, relevant_gap, chunk_size):
+    index = CorpusIndex.open_arrays(corpus_dir)
+    return _evaluate_block(index, packed, ScoringParams(*params), relevant_gap, chunk_size)
+
+
+def evaluate_full_catalog(index, users, params, relevant_gap=10.0, chunk_size=1024, workers=None, shard_size=5000):
+    """
+    Valutazione offline di tutti gli utenti sull'intero catalogo dei candidati
+    
+    Per blocchi di chunk_size utenti le similarità con tutti i documenti si
+    ottengono con un prodotto matriciale e le metriche con operazioni vettoriali
+    (catalog_metrics). Con workers > 1 gli utenti vengono divisi in blocchi di
+    shard_size valutati da un pool di processi che aprono l'indice in memory map.
+    
+    Args:
+        index (CorpusIndex): indice del corpus
+        users (list[dict]): profili utente
+        params (ScoringParams): parametri dello score (params.k = k delle metriche)
+        relevant_gap (float): distanza flesch massima perché un documento sia rilevante
+        chunk_size (int): utenti per prodotto matriciale
+        workers (int, optional): processi worker (None o 1 = nessun processo)
+        shard_size (int): utenti per blocco inviato ai worker
+        
+    Returns:
+        dict: ndcg, precision (medie), coverage (quota del catalogo raccomandata
+              ad almeno un utente), user_coverage (quota di utenti con almeno un
+              candidato), metriche per utente e secondi impiegati
+    """
+    start = time.perf_counter()
+    packed = pack_users(users, index)
+    
+    if workers and workers > 1 and len(users) > shard_size:
+        with tempfile.TemporaryDirectory() as corpus_dir:
+            index.save_arrays(corpus_dir)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(_evaluate_shard, corpus_dir, slice_users(packed, lo, lo + shard_size),
+                                    tuple(params), relevant_gap, chunk_size)
+                    for lo in range(0, len(users), shard_size)
+                ]
+                parts = [future.result() for future in futures]
+        ndcg, precision, candidates = (np.concatenate([part[i] for part in parts]) for i in range(3))
+        hits = sum(part[3] for part in parts)
+    else:
+        ndcg, precision, candidates, hits = _evaluate_block(index, packed, params, relevant_gap, chunk_size)
+    
+    n_docs = len(index) if index.alive is None else int(index.alive.sum())
+    return {
+        "users": len(users),
+        "ndcg": float(ndcg.mean()) if len(ndcg) else 0.0,
+        "precision": float(precision.mean()) if len(precision) else 0.0,
+        "coverage": float(np.count_nonzero(hits)) / n_docs if n_docs else 0.0,
+        "user_coverage": float(np.count_nonzero(candidates)) / len(users) if len(users) else 0.0,
+        "ndcg_per_user": ndcg,
+        "precision_per_user": precision,
+        "seconds": round(time.perf_counter() - start, 3)
+    }
+
 if __name__ == "__main__":
     import json
     import os
     import pandas as pd
     from utils.data_loader import load_features_df, load_embedding
+    from src.recommender.recommender_engine import RecommenderEngine
     config = load_yaml()
     
     configuration = {
@@ -76,19 +281,23 @@ if __name__ == "__main__":
 
     df = load_features_df()
     embedding = load_embedding()  
-    rel_profile_path = config['paths']['user_json']
-    profile_path = os.path.join(PROJECT_ROOT, rel_profile_path)
-    user_ids = [f.replace(".json","") for f in os.listdir(profile_path) if f.endswith(".json")]
-    
-    users = []
-    for uid in user_ids:
-        with open(os.path.join(profile_path, f"{uid}.json"), "r") as f:
-            users.append(json.load(f))
+    from src.user.model_user import get_profile_store
+    store = get_profile_store()
+    users = list(store.load_many(store.user_ids()).values())
 
-    recommender = RecommenderEngine(df, embedding, configuration, user_id=None, profile_path=profile_path)
+    recommender = RecommenderEngine(df, embedding, configuration, user_id=None, profile_path=None)
 
     evaluator = RecommenderEvaluation(k=configuration['k'])
-    final_ndcg = evaluator.evaluate_users(recommender, users)
+    
+    if "--full-catalog" in sys.argv:
+        workers = os.cpu_count() if "--workers" in sys.argv else None
+        report = evaluator.evaluate_full_catalog(recommender, users, workers=workers)
+        print(f"Utenti: {report['users']} in {report['seconds']}s")
+        print("NDCG@k medio (catalogo completo):", round(report['ndcg'], 4))
+        print("Precision@k media:", round(report['precision'], 4))
+        print("Coverage del catalogo:", round(report['coverage'], 4), "- utenti con candidati:", round(report['user_coverage'], 4))
+    else:
+        final_ndcg = evaluator.evaluate_users(recommender, users)
 
-    print("NDCG medio su tutti gli utenti:", round(final_ndcg, 4))
-    print("Valori NDCG per ogni utente:", evaluator.ndcg_history)
+        print("NDCG medio su tutti gli utenti:", round(final_ndcg, 4))
+        print("Valori NDCG per ogni utente:", evaluator.ndcg_history)
@@ -0,0 +1,214 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.user.history import DocHistory
+from src.user.model_user import apply_feedback, update_user_model, save_users
+
+
+def simulated_difficulty(level, flesch, band=5.0, noise=0.0, rng=None):
+    """Difficoltà (1-5) percepita da uno studente con livello di lettura level
+
+    Un flesch più basso del livello indica un testo più difficile: entro band
+    punti il testo è adeguato (3), entro 3 * band difficile o facile (4 / 2),
+    oltre molto difficile o molto facile (5 / 1).
+
+    Args:
+        level (np.ndarray): livello di lettura nascosto (scala flesch) di ogni studente
+        flesch (np.ndarray): punteggio flesch del testo letto da ogni studente
+        band (float): ampiezza della fascia di testi adeguati
+        noise (float): deviazione standard del rumore sulla percezione (punti flesch)
+        rng (np.random.Generator, optional): generatore per il rumore
+
+    Returns:
+        np.ndarray: difficoltà intere da 1 a 5
+    """
+    gap = np.asarray(level, dtype=np.float64) - np.asarray(flesch, dtype=np.float64)
+    if noise and rng is not None:
+        gap = gap + rng.normal(0, noise, size=gap.shape)
+    return np.digitize(gap, [-3 * band, -band, band, 3 * band], right=True) + 1
+
+
+class StudentSimulator:
+    """Studenti simulati per test di carico e di convergenza del ciclo di feedback
+
+    Ogni studente ha un livello di lettura (scala flesch) e un argomento
+    preferito nascosti. A ogni giro tutti gli studenti chiedono le
+    raccomandazioni al motore in blocco (rank_top_k_batch), scelgono un testo
+    fra i top k in base all'argomento preferito e danno un feedback di
+    difficoltà che aggiorna il profilo (update_user_model con persist, altrimenti
+    lo stesso aggiornamento in memoria con apply_feedback).
+    """
+    def __init__(self, engine, users=1000, band=5.0, noise=0.0, temperature=0.05,
+                 start_readability=60, persist=False, first_user_id=10 ** 9, seed=0):
+        """Crea gli studenti simulati e i loro profili iniziali
+
+        Args:
+            engine (RecommenderEngine): motore di raccomandazione
+            users (int): numero di studenti
+            band (float): ampiezza della fascia di testi adeguati (vedi simulated_difficulty)
+            noise (float): rumore sulla difficoltà percepita (punti flesch)
+            temperature (float): temperatura della scelta del testo (più bassa = più legata all'argomento)
+            start_readability (float): target readability iniziale dei profili
+            persist (bool): se True i profili sono salvati e aggiornati con update_user_model
+            first_user_id (int): id del primo studente (lontano dagli utenti reali)
+            seed (int): seme del generatore casuale
+        """
+        self.engine = engine
+        self.band = band
+        self.noise = noise
+        self.temperature = temperature
+        self.persist = persist
+        self.rng = np.random.default_rng(seed)
+
+        index = engine.index
+        emb = np.asarray(index.unit_embedding)
+        alive = np.ones(len(index), dtype=bool) if index.alive is None else np.asarray(index.alive)
+        low, high = np.percentile(index.flesch[alive], [10, 90])
+
+        # livello e argomento nascosti: l'argomento è un documento del corpus perturbato
+        self.levels = self.rng.uniform(low, high, size=users)
+        topics = emb[self.rng.choice(np.flatnonzero(alive), size=users)]
+        topics = topics + self.rng.normal(0, 0.5 / np.sqrt(emb.shape[1]), size=topics.shape)
+        self.topics = topics / np.linalg.norm(topics, axis=1, keepdims=True)
+
+        centroid = emb[alive].mean(axis=0)
+        centroid = (centroid / np.linalg.norm(centroid)).tolist()
+        self.profiles = [
+            {
+                "user_id": first_user_id + i,
+                "target_readability": start_readability,
+                "topic_vector": list(centroid),
+                "history": DocHistory()
+            }
+            for i in range(users)
+        ]
+        if persist:
+            save_users(self.profiles)
+
+        self.converged_at = np.full(users, -1)
+        self.rounds = 0
+        self.recommend_seconds = 0.0
+        self.feedback_seconds = 0.0
+        self.recommendations = 0
+        self.feedbacks = 0
+        self.error_by_round = []
+
+
+    def step(self):
+        """Un giro di raccomandazione e feedback per tutti gli studenti
+
+        Returns:
+            float: errore medio |target_readability - livello nascosto| dopo il giro
+        """
+        engine = self.engine
+        start = time.perf_counter()
+        results = engine.rank_top_k_batch(self.profiles)
+        self.recommend_seconds += time.perf_counter() - start
+        self.recommendations += len(results)
+
+        start = time.perf_counter()
+        index = engine.index
+        for i, (user, (titles, _, _, _)) in enumerate(zip(self.profiles, results)):
+            positions = [index.position(title) for title in titles]
+            choices = [j for j, pos in enumerate(positions) if pos is not None]
+            if not choices:
+                continue
+            affinity = index.unit_embedding[[positions[j] for j in choices]] @ self.topics[i]
+            weights = np.exp((affinity - affinity.max()) / self.temperature)
+            j = choices[self.rng.choice(len(choices), p=weights / weights.sum())]
+
+            doc_id, pos = titles[j], positions[j]
+            doc_readability = float(index.flesch[pos])
+            difficulty = int(simulated_difficulty(self.levels[i], doc_readability, self.band, self.noise, self.rng))
+            if self.persist:
+                update_user_model(user, doc_id, doc_readability, difficulty, doc_embedding=index.unit_embedding[pos])
+            else:
+                apply_feedback(user, doc_id, index.unit_embedding[pos], doc_readability, difficulty)
+            engine.observe_feedback(user, doc_id, difficulty)
+            self.feedbacks += 1
+        self.feedback_seconds += time.perf_counter() - start
+
+        errors = self.errors()
+        self.converged_at[(self.converged_at < 0) & (errors <= self.band)] = self.rounds
+        self.rounds += 1
+        self.error_by_round.append(float(errors.mean()))
+        return self.error_by_round[-1]
+
+
+    def errors(self):
+        """Distanza fra target readability dei profili e livello nascosto degli studenti
+
+        Returns:
+            np.ndarray: errore assoluto per studente
+        """
+        targets = np.asarray([user["target_readability"] for user in self.profiles], dtype=np.float64)
+        return np.abs(targets - self.levels)
+
+
+    def run(self, rounds=10, progress=None):
+        """Esegue più giri di raccomandazione e feedback
+
+        Args:
+            rounds (int): numero di giri
+            progress (callable, optional): funzione (giro, errore medio) chiamata dopo ogni giro
+
+        Returns:
+            dict: report (vedi report())
+        """
+        for _ in range(rounds):
+            error = self.step()
+            if progress is not None:
+                progress(self.rounds, error)
+        return self.report()
+
+
+    def report(self):
+        """Throughput e convergenza della simulazione
+
+        Returns:
+            dict: studenti, giri, raccomandazioni e feedback al secondo, errore medio
+                  per giro, quota di studenti entro band dal livello alla fine e
+                  mediana dei giri necessari per entrarci la prima volta
+        """
+        errors = self.errors()
+        reached = self.converged_at[self.converged_at >= 0]
+        return {
+            "users": len(self.profiles),
+            "rounds": self.rounds,
+            "recommendations_per_s": self.recommendations / self.recommend_seconds if self.recommend_seconds else 0.0,
+            "feedback_per_s": self.feedbacks / self.feedback_seconds if self.feedback_seconds else 0.0,
+            "error_by_round": self.error_by_round,
+            "final_error": float(errors.mean()) if len(errors) else 0.0,
+            "converged": float(np.mean(errors <= self.band)) if len(errors) else 0.0,
+            "median_rounds_to_converge": float(np.median(reached)) + 1 if len(reached) else None
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulazione di studenti per test di carico e convergenza")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--band", type=float, default=5.0)
+    parser.add_argument("--noise", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--persist", action="store_true", help="salva i profili simulati con update_user_model")
+    args = parser.parse_args()
+
+    from main import build_engine
+    simulator = StudentSimulator(
+        build_engine(), users=args.users, band=args.band, noise=args.noise, persist=args.persist, seed=args.seed
+    )
+    report = simulator.run(args.rounds, progress=lambda done, error: print(f" giro {done}: errore medio {error:.2f}"))
+
+    print(f" {report['users']} studenti, {report['rounds']} giri")
+    print(f" raccomandazioni/s: {report['recommendations_per_s']:.0f} - feedback/s: {report['feedback_per_s']:.0f}")
+    print(f" errore finale: {report['final_error']:.2f} - studenti entro {args.band} punti: {report['converged']:.1%}"
+          f" - giri mediani per convergere: {report['median_rounds_to_converge']}")
@@ -0,0 +1,218 @@
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from utils.io_utils import load_yaml, save_csv
+from src.recommender.corpus_index import CorpusIndex
+from src.recommender.scorer import ScoringParams
+from src.eval.evaluation import pack_users, slice_users, catalog_metrics
+
+
+# stato di ogni processo worker, creato una volta da _init_worker
+_worker = {}
+
+
+def parameter_grid(grid, defaults):
+    """Tutte le combinazioni dei valori indicati per ogni parametro
+
+    Args:
+        grid (dict[str, list]): valori da provare per eta, zeta, alpha, tol e k
+        defaults (ScoringParams): valori dei parametri non presenti nella griglia
+
+    Returns:
+        list[ScoringParams]: configurazioni da valutare
+    """
+    fields = ScoringParams._fields
+    values = [list(grid.get(field, [getattr(defaults, field)])) for field in fields]
+    return [ScoringParams(*combo)._replace(k=int(combo[-1])) for combo in itertools.product(*values)]
+
+
+def random_configurations(ranges, defaults, samples, seed=0):
+    """Configurazioni estratte a caso da intervalli uniformi o liste di valori
+
+    Args:
+        ranges (dict[str, tuple or list]): intervallo (min, max) oppure lista di valori fra cui scegliere
+        defaults (ScoringParams): valori dei parametri non presenti negli intervalli
+        samples (int): numero di configurazioni
+        seed (int): seme del generatore casuale
+
+    Returns:
+        list[ScoringParams]: configurazioni da valutare (k intero)
+    """
+    rng = np.random.default_rng(seed)
+    configurations = []
+    for _ in range(samples):
+        values = {}
+        for field in ScoringParams._fields:
+            if field in ranges and isinstance(ranges[field], tuple):
+                low, high = ranges[field]
+                values[field] = int(rng.integers(low, high + 1)) if field == "k" else float(rng.uniform(low, high))
+            elif field in ranges:
+                values[field] = ranges[field][rng.integers(len(ranges[field]))]
+            else:
+                values[field] = getattr(defaults, field)
+        configurations.append(ScoringParams(**values))
+    return configurations
+
+
+def _init_worker(work_dir, relevant_gap, chunk_size):
+    _worker["index"] = CorpusIndex.open_arrays(os.path.join(work_dir, "corpus"))
+    _worker["sims"] = np.load(os.path.join(work_dir, "sims.npy"), mmap_mode="r")
+    _worker["users"] = {
+        name: np.load(os.path.join(work_dir, f"{name}.npy"))
+        for name in ("targets", "seen_rows", "seen_cols")
+    }
+    _worker["relevant_gap"] = relevant_gap
+    _worker["chunk_size"] = chunk_size
+
+
+def evaluate_configuration(params):
+    """Metriche di una configurazione sulle similarità precalcolate (eseguito nel processo worker)
+
+    Args:
+        params (tuple): parametri dello score (eta, zeta, alpha, tol, k)
+
+    Returns:
+        dict: parametri, ndcg, precision, coverage, user_coverage e secondi impiegati
+    """
+    start = time.perf_counter()
+    params = ScoringParams(*params)
+    index, sims, users = _worker["index"], _worker["sims"], _worker["users"]
+    chunk_size = _worker["chunk_size"]
+
+    total = len(users["targets"])
+    ndcg = precision = 0.0
+    with_candidates = 0
+    hits = np.zeros(len(index), dtype=bool)
+    for lo in range(0, total, chunk_size):
+        chunk = slice_users({"vectors": sims, **users}, lo, lo + chunk_size)
+        metrics = catalog_metrics(
+            np.asarray(chunk["vectors"]), index.flesch, chunk["targets"], chunk["seen_rows"], chunk["seen_cols"],
+            params, _worker["relevant_gap"], index.alive
+        )
+        ndcg += metrics["ndcg"].sum()
+        precision += metrics["precision"].sum()
+        with_candidates += np.count_nonzero(metrics["candidates"])
+        top = metrics["top"]
+        hits[top[top >= 0]] = True
+
+    n_docs = len(index) if index.alive is None else int(index.alive.sum())
+    return {
+        **params._asdict(),
+        "ndcg": ndcg / total if total else 0.0,
+        "precision": precision / total if total else 0.0,
+        "coverage": np.count_nonzero(hits) / n_docs if n_docs else 0.0,
+        "user_coverage": with_candidates / total if total else 0.0,
+        "seconds": round(time.perf_counter() - start, 3)
+    }
+
+
+def run_sweep(index, users, configurations, relevant_gap=10.0, chunk_size=1024, workers=None, progress=None):
+    """Valuta più configurazioni dello score sugli stessi utenti
+
+    Le similarità utente-documento dipendono solo dai topic vector: vengono
+    calcolate una volta, salvate in un file .npy e aperte in memory map dai
+    processi worker, che per ogni configurazione ricalcolano solo il termine
+    di leggibilità e le metriche (vedi catalog_metrics).
+
+    Args:
+        index (CorpusIndex): indice del corpus
+        users (list[dict]): profili utente
+        configurations (list[ScoringParams]): configurazioni da valutare
+        relevant_gap (float): distanza flesch massima perché un documento sia rilevante
+        chunk_size (int): utenti per blocco di metriche
+        workers (int, optional): processi worker (default numero di CPU)
+        progress (callable, optional): funzione (completate, totale) chiamata dopo ogni configurazione
+
+    Returns:
+        pd.DataFrame: una riga per configurazione, ordinata per ndcg decrescente
+    """
+    packed = pack_users(users, index)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        index.save_arrays(os.path.join(work_dir, "corpus"))
+        sims = np.lib.format.open_memmap(
+            os.path.join(work_dir, "sims.npy"), mode="w+", dtype=np.float32, shape=(len(users), len(index))
+        )
+        for lo in range(0, len(users), chunk_size):
+            sims[lo:lo + chunk_size] = packed["vectors"][lo:lo + chunk_size] @ index.unit_embedding.T
+        sims.flush()
+        del sims
+        for name in ("targets", "seen_rows", "seen_cols"):
+            np.save(os.path.join(work_dir, f"{name}.npy"), packed[name])
+
+        rows = []
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(work_dir, relevant_gap, chunk_size)
+        ) as executor:
+            futures = [executor.submit(evaluate_configuration, tuple(params)) for params in configurations]
+            for future in as_completed(futures):
+                rows.append(future.result())
+                if progress is not None:
+                    progress(len(rows), len(futures))
+
+    table = pd.DataFrame(rows, columns=list(ScoringParams._fields) + ["ndcg", "precision", "coverage", "user_coverage", "seconds"])
+    return table.sort_values("ndcg", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def _print_progress(done, total):
+    print(f"\r {done}/{total} configurazioni", end="" if done < total else "\n", flush=True)
+
+
+def _parse_values(text, cast=float):
+    # "0.5,1,2" -> valori della griglia, "0.1:2" -> intervallo per l'estrazione casuale
+    if ":" in text:
+        low, high = text.split(":", 1)
+        return (cast(low), cast(high))
+    return [cast(value) for value in text.split(",")]
+
+
+if __name__ == "__main__":
+    config = load_yaml()
+
+    parser = argparse.ArgumentParser(description="Ricerca dei parametri dello score di raccomandazione")
+    for name in ("eta", "zeta", "alpha", "tol"):
+        parser.add_argument(f"--{name}", help="valori separati da virgola (griglia) oppure min:max (--samples)")
+    parser.add_argument("--k", help="valori separati da virgola (griglia) oppure min:max (--samples)")
+    parser.add_argument("--samples", type=int, default=None, help="numero di configurazioni casuali negli intervalli min:max")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--relevant-gap", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=os.path.join(PROJECT_ROOT, config['paths'].get('sweep_results', "data/sweep_results.csv")))
+    args = parser.parse_args()
+
+    defaults = ScoringParams.from_config(config)
+    specs = {
+        name: _parse_values(getattr(args, name), int if name == "k" else float)
+        for name in ScoringParams._fields if getattr(args, name) is not None
+    }
+    if args.samples:
+        configurations = random_configurations(specs, defaults, args.samples, args.seed)
+    else:
+        if any(isinstance(value, tuple) for value in specs.values()):
+            parser.error("gli intervalli min:max richiedono --samples")
+        configurations = parameter_grid(specs, defaults)
+
+    from utils.data_loader import load_features_df, load_embedding
+    from src.user.model_user import get_profile_store
+    store = get_profile_store()
+    users = list(store.load_many(store.user_ids()).values())
+    index = CorpusIndex.from_frame(load_features_df()[["id", "flesch_score"]], load_embedding())
+
+    start = time.perf_counter()
+    table = run_sweep(index, users, configurations, relevant_gap=args.relevant_gap, workers=args.workers, progress=_print_progress)
+    save_csv(table, args.output)
+
+    print(table.head(20).to_string(index=False))
+    print(f" {len(configurations)} configurazioni su {len(users)} utenti in {time.perf_counter() - start:.1f}s -> {args.output}")
@@ -10,6 +10,7 @@ import matplotlib.pyplot as plt
 from collections import Counter
 import sys
 import os 
+from functools import lru_cache
 from umap import UMAP
 from hdbscan import HDBSCAN
 from loguru import logger
@@ -73,6 +74,20 @@ def sentences_embedding(sentences, model):
 #save_pickle('doc_embedding.pickle', embedding)
 
 
+@lru_cache(maxsize=1)
+def document_positions():
+    """Mappa id documento -> posizione nel DataFrame delle feature (e negli embedding)
+    
+    Returns:
+        dict[str, int]: posizione di ogni documento (prima occorrenza)
+    """
+    df = load_features_df()
+    positions = {}
+    for pos, doc_id in enumerate(df["id"].astype(str)):
+        positions.setdefault(doc_id, pos)
+    return positions
+
+
 def get_document_embedding(doc_id):
     """Estrae l'embedding di un documento specifico
     
@@ -82,15 +97,34 @@ def get_document_embedding(doc_id):
     Returns:
         list: embedding del documento specifico
     """
-    df = load_features_df()
     emb = load_embedding()
     
-    idx_array = df.index[df["id"] == doc_id].tolist()
+    idx = document_positions().get(str(doc_id))
     
-    if len(idx_array) == 0:
+    if idx is None:
         raise ValueError(f"documento non trovato: {doc_id}")
     
-    idx = idx_array[0]
     return emb[idx].tolist()
 
 
+def get_document_embeddings(doc_ids):
+    """Estrae gli embedding di più documenti con un'unica indicizzazione
+    
+    Args:
+        doc_ids (list[str]): ID dei documenti
+    
+    Returns:
+        np.ndarray: matrice len(doc_ids) x D degli embedding, nello stesso ordine
+    
+    Raises:
+        ValueError: se uno dei documenti non esiste
+    """
+    positions = document_positions()
+    idx = [positions.get(str(doc_id)) for doc_id in doc_ids]
+    missing = [doc_id for doc_id, pos in zip(doc_ids, idx) if pos is None]
+    if missing:
+        raise ValueError(f"documenti non trovati: {missing}")
+    
+    return np.asarray(load_embedding())[idx]
+
+
@@ -0,0 +1,181 @@
+import hashlib
+import os
+import sys
+
+import pandas as pd
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from utils.io_utils import load_csv, save_csv, load_yaml
+from src.features.preprocessing import preprocessing
+
+# va incrementata ogni volta che cambia il calcolo delle feature in preprocessing():
+# tutti i documenti con una versione diversa vengono ricalcolati
+FEATURE_VERSION = 1
+
+MANIFEST_COLUMNS = ["id", "text_hash", "feature_version"]
+
+
+def text_hash(text):
+    """Calcola l'impronta (sha1) del testo di un documento
+
+    Args:
+        text (str): testo del documento
+
+    Returns:
+        str: digest esadecimale del testo
+    """
+    return hashlib.sha1(str(text).encode("utf-8")).hexdigest()
+
+
+def load_manifest(path):
+    """Carica il manifest delle feature se esiste
+
+    Args:
+        path (str): percorso del manifest csv
+
+    Returns:
+        pd.DataFrame: manifest con colonne id, text_hash, feature_version
+                      (vuoto se il file non esiste)
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=MANIFEST_COLUMNS)
+    manifest = load_csv(path)
+    manifest["id"] = manifest["id"].astype(str)
+    return manifest
+
+
+def diff_corpus(raw_df, manifest, feature_version=FEATURE_VERSION):
+    """Confronta il corpus grezzo con il manifest
+
+    Args:
+        raw_df (pd.DataFrame): corpus grezzo con colonne id e testo
+        manifest (pd.DataFrame): manifest della build precedente
+        feature_version (int): versione corrente delle feature
+
+    Returns:
+        tuple[pd.Series, list[str], list[str]]:
+            - impronte dei testi del corpus grezzo (indicizzate come raw_df)
+            - id dei documenti nuovi o modificati da ricalcolare
+            - id dei documenti eliminati dal corpus
+    """
+    ids = raw_df["id"].astype(str)
+    hashes = raw_df["testo"].map(text_hash)
+
+    previous = dict(zip(
+        manifest["id"],
+        zip(manifest["text_hash"], manifest["feature_version"].astype(int))
+    ))
+
+    changed = []
+    for doc_id, digest in zip(ids, hashes):
+        if previous.get(doc_id) != (digest, feature_version):
+            changed.append(doc_id)
+
+    deleted = list(set(previous) - set(ids))
+    return hashes, changed, deleted
+
+
+def build_features_incremental(raw_df, features_path, manifest_path, feature_version=FEATURE_VERSION):
+    """Costruisce il file delle feature ricalcolando solo i documenti nuovi o modificati
+
+    I documenti invariati (stessa impronta del testo e stessa versione delle feature)
+    vengono presi dal file delle feature esistente, quelli eliminati dal corpus
+    vengono scartati. L'ordine delle righe segue quello di raw_df, in modo che
+    gli embedding restino allineati per posizione.
+
+    Args:
+        raw_df (pd.DataFrame): corpus grezzo con colonne id e testo
+        features_path (str): percorso del csv delle feature (letto e sovrascritto)
+        manifest_path (str): percorso del manifest (letto e sovrascritto)
+        feature_version (int): versione corrente delle feature
+
+    Returns:
+        tuple[pd.DataFrame, dict]:
+            - DataFrame completo delle feature
+            - statistiche della build (documenti totali, ricalcolati, riusati, eliminati)
+
+    Raises:
+        ValueError: se raw_df contiene id ripetuti
+    """
+    raw_df = raw_df.reset_index(drop=True).copy()
+    raw_df["id"] = raw_df["id"].astype(str)
+
+    # corpus vuoto: tutti i documenti sono stati eliminati, feature e manifest restano con le sole colonne
+    if raw_df.empty:
+        deleted = len(load_manifest(manifest_path))
+        columns = list(raw_df.columns)
+        if os.path.exists(features_path) and os.path.getsize(features_path) > 0:
+            columns = list(load_csv(features_path).columns)
+        dataframe = pd.DataFrame(columns=columns)
+        save_csv(dataframe, features_path)
+        save_csv(pd.DataFrame(columns=MANIFEST_COLUMNS), manifest_path)
+        return dataframe, {"total": 0, "recomputed": 0, "reused": 0, "deleted": deleted}
+
+    duplicated = raw_df["id"][raw_df["id"].duplicated()].unique()
+    if len(duplicated) > 0:
+        raise ValueError(f"id ripetuti nel corpus: {', '.join(duplicated[:10])}")
+
+    manifest = load_manifest(manifest_path)
+    if not os.path.exists(features_path):
+        manifest = manifest.iloc[0:0]
+
+    hashes, changed, deleted = diff_corpus(raw_df, manifest, feature_version)
+    changed_set = set(changed)
+
+    existing = None
+    if len(changed_set) < len(raw_df):
+        existing = load_csv(features_path)
+        existing["id"] = existing["id"].astype(str)
+        existing = existing.drop_duplicates("id", keep="last")
+        # documenti nel manifest ma assenti dal file delle feature: vanno ricalcolati
+        missing = set(raw_df["id"]) - changed_set - set(existing["id"])
+        changed_set |= missing
+
+    to_compute = raw_df[raw_df["id"].isin(changed_set)]
+    if len(to_compute) > 0:
+        features = to_compute["testo"].apply(preprocessing)
+        computed = pd.concat([to_compute, features], axis=1)
+    else:
+        computed = None
+
+    parts = []
+    if existing is not None:
+        kept_ids = raw_df.loc[~raw_df["id"].isin(changed_set), "id"]
+        parts.append(existing[existing["id"].isin(set(kept_ids))])
+    if computed is not None:
+        parts.append(computed)
+
+    merged = pd.concat(parts, ignore_index=True).set_index("id")
+    dataframe = merged.loc[raw_df["id"]].reset_index()
+
+    save_csv(dataframe, features_path)
+    save_csv(pd.DataFrame({
+        "id": raw_df["id"],
+        "text_hash": hashes,
+        "feature_version": feature_version
+    }), manifest_path)
+
+    stats = {
+        "total": len(raw_df),
+        "recomputed": len(changed_set),
+        "reused": len(raw_df) - len(changed_set),
+        "deleted": len(deleted)
+    }
+    return dataframe, stats
+
+
+if __name__ == "__main__":
+    config = load_yaml()
+    paths = config['paths']
+    raw_path = os.path.join(PROJECT_ROOT, paths.get('interim_csv', "data/interim/onestop_texts.csv"))
+    features_path = os.path.join(PROJECT_ROOT, paths['features_csv'])
+    manifest_path = os.path.join(PROJECT_ROOT, paths.get('features_manifest', "data/processed/features_manifest.csv"))
+
+    dataframe, stats = build_features_incremental(load_csv(raw_path), features_path, manifest_path)
+
+    print(f" Feature aggiornate: {stats['recomputed']} ricalcolati, "
+          f"{stats['reused']} riusati, {stats['deleted']} eliminati")
+    print(f"File: {features_path}")
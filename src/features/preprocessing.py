@@ -1,13 +1,13 @@
 import nltk
+import numpy as np
 import pandas as pd
 import os 
+import re
+from functools import lru_cache
 from nltk.tokenize import sent_tokenize, word_tokenize
 
-input_df = "./ingest/data/interim/onestop_texts.csv"
-dataframe = pd.read_csv(input_df)
-dataframe.head()
-
 
+@lru_cache(maxsize=65536)
 def count_syllables(word):
     """Conteggio sillabe in una parola
     
@@ -124,6 +124,76 @@ def preprocessing(text):
         "flesch_score": flesch_score
     })
 
+PARAGRAPH_RE = re.compile(r"[^\n]+")
+
+
+def paragraph_segments(text, min_words=20):
+    """Calcola il punteggio flesch di ogni paragrafo di un testo
+
+    I paragrafi sono le righe non vuote del testo; quelli con meno di min_words
+    parole (titoli, didascalie) vengono scartati.
+
+    Args:
+        text (str): testo da analizzare
+        min_words (int): numero minimo di parole alfabetiche per paragrafo
+
+    Returns:
+        list[tuple[int, int, float]]: offset di inizio e fine (in caratteri) e
+            punteggio flesch di ogni paragrafo
+    """
+    segments = []
+    for match in PARAGRAPH_RE.finditer(text):
+        paragraph = match.group()
+        if not paragraph.strip():
+            continue
+
+        words = [word for word in word_tokenize(paragraph) if word.isalpha()]
+        if len(words) < min_words:
+            continue
+
+        num_sentences = len(sent_tokenize(paragraph))
+        num_syllables = sum(count_syllables(word) for word in words)
+        flesch = flesch_ease_reading(len(words), num_sentences, num_syllables)
+        segments.append((match.start(), match.end(), flesch))
+
+    return segments
+
+
+def build_segment_index(texts, min_words=20):
+    """Costruisce l'indice compatto dei paragrafi di un corpus
+
+    I paragrafi sono ordinati per punteggio flesch, in modo che la finestra di
+    tolleranza di un utente si trovi con una ricerca binaria.
+
+    Args:
+        texts (iterable[str]): testi del corpus nell'ordine del DataFrame delle feature
+        min_words (int): numero minimo di parole alfabetiche per paragrafo
+
+    Returns:
+        dict[str, np.ndarray]: array paralleli
+            doc (int32): posizione del documento nel corpus
+            start (int32): offset di inizio del paragrafo nel testo
+            end (int32): offset di fine del paragrafo nel testo
+            flesch (float32): punteggio flesch del paragrafo (ordinato)
+    """
+    docs, starts, ends, scores = [], [], [], []
+    for pos, text in enumerate(texts):
+        for start, end, flesch in paragraph_segments(str(text), min_words):
+            docs.append(pos)
+            starts.append(start)
+            ends.append(end)
+            scores.append(flesch)
+
+    flesch = np.array(scores, dtype=np.float32)
+    order = np.argsort(flesch, kind="stable")
+    return {
+        "doc": np.array(docs, dtype=np.int32)[order],
+        "start": np.array(starts, dtype=np.int32)[order],
+        "end": np.array(ends, dtype=np.int32)[order],
+        "flesch": flesch[order]
+    }
+
+
 """
 text_length (numero di parole)
 – avg_sentence_length
@@ -132,6 +202,10 @@ text_length (numero di parole)
 """
     
 """
+input_df = "./ingest/data/interim/onestop_texts.csv"
+dataframe = pd.read_csv(input_df)
+dataframe.head()
+
 features = dataframe["testo"].apply(preprocessing)
 dataframe = pd.concat([dataframe, features], axis=1)
 
@@ -0,0 +1,148 @@
+import os
+import re
+import sys
+from typing import NamedTuple
+
+import numpy as np
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.features.preprocessing import count_syllables, flesch_ease_reading, sent_tokenize, word_tokenize
+
+# tokenizzazione veloce: parole alfabetiche e frasi delimitate da . ! ? seguiti da spazio
+# e da una parola non minuscola (o dalla fine del testo), come sent_tokenize di nltk:
+# decimali (3.5), ellissi e abbreviazioni seguite da minuscola non chiudono la frase
+WORD_RE = re.compile(r"[^\W\d_]+")
+SENTENCE_END_RE = re.compile(r"[.!?]+[\"')\]]*(?=\s+[^\sa-z]|\s*$)")
+PRECEDING_TOKEN_RE = re.compile(r"[\w.]+$")
+# abbreviazioni seguite da un nome proprio (Dr. Smith) che non chiudono la frase
+ABBREVIATIONS = frozenset({"mr", "mrs", "ms", "dr", "prof", "st", "jr", "sr", "vs", "e.g", "i.e", "fig", "no"})
+
+
+def _is_abbreviation(text, end):
+    token = PRECEDING_TOKEN_RE.search(text, 0, end)
+    if token is None:
+        return False
+    token = token.group().lower()
+    # iniziali (J. Smith) e abbreviazioni note
+    return (len(token) == 1 and token.isalpha()) or token in ABBREVIATIONS
+
+
+def split_sentences(text):
+    """Divide un testo in frasi con espressioni regolari (approssima sent_tokenize di nltk)
+
+    Args:
+        text (str): testo da dividere
+
+    Returns:
+        list[str]: frasi del testo (può contenere parti senza parole)
+    """
+    sentences = []
+    start = 0
+    for match in SENTENCE_END_RE.finditer(text):
+        if text[match.start()] == "." and _is_abbreviation(text, match.start()):
+            continue
+        sentences.append(text[start:match.end()])
+        start = match.end()
+    sentences.append(text[start:])
+    return sentences
+
+
+class ReadabilityScore(NamedTuple):
+    """Statistiche di leggibilità di un testo"""
+    num_sentences: int
+    num_words: int
+    num_syllables: int
+    avg_sentence_length: float
+    avg_word_length: float
+    perc_long_words: float
+    flesch_score: float
+
+
+SCORE_DTYPE = np.dtype([
+    ("num_sentences", np.int32),
+    ("num_words", np.int32),
+    ("num_syllables", np.int32),
+    ("avg_sentence_length", np.float32),
+    ("avg_word_length", np.float32),
+    ("perc_long_words", np.float32),
+    ("flesch_score", np.float32),
+])
+
+
+def tokenize(text, exact=False):
+    """Divide un testo in frasi e parole alfabetiche
+
+    Args:
+        text (str): testo da analizzare
+        exact (bool): se True usa i tokenizer nltk di preprocessing() (più lento,
+                      stessi risultati delle feature del corpus), altrimenti espressioni regolari
+
+    Returns:
+        tuple[int, list[str]]: numero di frasi e lista delle parole alfabetiche
+    """
+    if exact:
+        words = [word for word in word_tokenize(text) if word.isalpha()]
+        return len(sent_tokenize(text)), words
+
+    words = WORD_RE.findall(text)
+    num_sentences = 0
+    for part in split_sentences(text):
+        if WORD_RE.search(part):
+            num_sentences += 1
+    return num_sentences, words
+
+
+def score_text(text, exact=False):
+    """Calcola le statistiche di leggibilità di un singolo testo senza passare da pandas
+
+    Args:
+        text (str): testo da analizzare
+        exact (bool): se True usa i tokenizer nltk (vedi tokenize)
+
+    Returns:
+        ReadabilityScore: statistiche e punteggio flesch del testo
+    """
+    num_sentences, words = tokenize(text, exact)
+    num_words = len(words)
+    if num_words == 0:
+        return ReadabilityScore(num_sentences, 0, 0, 0.0, 0.0, 0.0, 0.0)
+
+    total_length = 0
+    long_words = 0
+    num_syllables = 0
+    for word in words:
+        length = len(word)
+        total_length += length
+        if length > 6:
+            long_words += 1
+        num_syllables += count_syllables(word)
+
+    return ReadabilityScore(
+        num_sentences,
+        num_words,
+        num_syllables,
+        num_words / num_sentences if num_sentences > 0 else 0.0,
+        total_length / num_words,
+        long_words / num_words * 100,
+        float(flesch_ease_reading(num_words, num_sentences, num_syllables))
+    )
+
+
+def score_texts(texts, as_array=False, exact=False):
+    """Calcola le statistiche di leggibilità di un insieme di testi
+
+    Args:
+        texts (iterable[str]): testi da analizzare
+        as_array (bool): se True restituisce un array strutturato numpy (SCORE_DTYPE)
+        exact (bool): se True usa i tokenizer nltk (vedi tokenize)
+
+    Returns:
+        list[ReadabilityScore] or np.ndarray: statistiche di ogni testo nello stesso ordine
+    """
+    scores = [score_text(text, exact) for text in texts]
+    if as_array:
+        return np.array(scores, dtype=SCORE_DTYPE)
+    return scores
@@ -1,49 +1,277 @@
+import argparse
+import hashlib
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
-# questo script estrae i testi dal OneStopEnglish Corpus,
-# li etichetta per livello di difficoltà e li salva in formato csv
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
 
-levels = {
+from utils.io_utils import load_yaml
+
+# questo script estrae i testi dal OneStopEnglish Corpus (o da qualunque corpus
+# organizzato in cartelle per livello), li etichetta per livello di difficoltà
+# e li salva in formato csv
+
+DEFAULT_LEVELS = {
     "Ele-Txt": "easy",
     "Int-Txt": "medium",
     "Adv-Txt": "hard"
 }
 
-base_dir = r"C:\Users\checc\OneDrive\Desktop\readability-navigator\data\raw\Texts-SeparatedByReadingLevel"
-
-
-articles = []
-
-#per ogni livello, verifica che la cartella esista e processa i file di testo
-for level_code, level_name in levels.items():
-    folder = os.path.join(base_dir, level_code)
-    if not os.path.exists(folder):
-        print(f" Cartella mancante: {folder}")
-        continue
-    
-    #lettura del contenuto del file
-    for file in os.listdir(folder):
-        if file.endswith(".txt"):
-            title = file.replace(".txt", "").replace("_", " ").title()
-            with open(os.path.join(folder, file), "r", encoding="utf-8") as f:
-                text = f.read().strip()
-
-            articles.append({
-                "id": f"{title}_{level_name}",
-                "titolo": title,
-                "livello": level_name,
-                "testo": text,
-                "lingua": "en"
-            })
-
-
-df = pd.DataFrame(articles)
-#salvataggio csv finale
-os.makedirs("./data/interim", exist_ok=True)
-output_path = "data/interim/onestop_texts.csv"
-df.to_csv(output_path, index=False, encoding="utf-8")
-
-print(f" Salvati {len(df)} articoli dal OneStopEnglish Corpus")
-print(f"File: {output_path}")
-print(df.head())
+ARTICLE_COLUMNS = ["id", "titolo", "livello", "testo", "lingua"]
+MANIFEST_COLUMNS = ["path", "id", "mtime", "size", "hash"]
+
+
+def iter_corpus_files(roots, levels):
+    """Scorre le cartelle dei livelli di ogni radice del corpus
+
+    Args:
+        roots (list[str]): cartelle radice del corpus
+        levels (dict): mappa nome cartella -> livello di difficoltà
+
+    Yields:
+        tuple[str, str, float, int]: path del file, livello, mtime e dimensione
+    """
+    for root in roots:
+        for level_code, level_name in levels.items():
+            folder = os.path.join(root, level_code)
+            if not os.path.exists(folder):
+                print(f" Cartella mancante: {folder}")
+                continue
+
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith(".txt"):
+                        stat = entry.stat()
+                        yield entry.path, level_name, stat.st_mtime, stat.st_size
+
+
+def article_id(path, level_name):
+    """Costruisce titolo e id di un articolo a partire dal nome del file
+
+    Args:
+        path (str): path del file di testo
+        level_name (str): livello di difficoltà del file
+
+    Returns:
+        tuple[str, str]: titolo e id dell'articolo
+    """
+    title = os.path.basename(path).replace(".txt", "").replace("_", " ").title()
+    return title, f"{title}_{level_name}"
+
+
+def read_article(path, level_name):
+    """Lettura di un file di testo del corpus
+
+    Args:
+        path (str): path del file di testo
+        level_name (str): livello di difficoltà del file
+
+    Returns:
+        tuple[dict, str]: riga dell'articolo e impronta sha1 del contenuto
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    title, doc_id = article_id(path, level_name)
+    row = {
+        "id": doc_id,
+        "titolo": title,
+        "livello": level_name,
+        "testo": raw.decode("utf-8").strip(),
+        "lingua": "en"
+    }
+    return row, hashlib.sha1(raw).hexdigest()
+
+
+def load_ingest_manifest(path):
+    """Carica il manifest dell'ultima ingestione
+
+    Args:
+        path (str): path del manifest csv
+
+    Returns:
+        dict: mappa path -> riga del manifest (vuota se il file non esiste);
+              ogni riga contiene anche "row", la sua posizione nel manifest
+              (uguale a quella dell'articolo nel csv di output)
+    """
+    if not os.path.exists(path):
+        return {}
+    # round_trip: gli mtime riletti devono coincidere esattamente con quelli di os.stat
+    manifest = pd.read_csv(path, encoding="utf-8", float_precision="round_trip")
+    return {row["path"]: {**row, "row": i} for i, row in enumerate(manifest.to_dict("records"))}
+
+
+def _aligned(previous, output_path):
+    # il csv degli articoli e il manifest devono avere le stesse righe nello stesso
+    # ordine: solo così le righe invariate possono essere copiate per posizione
+    ids = pd.read_csv(output_path, encoding="utf-8", usecols=["id"])["id"].astype(str).tolist()
+    expected = [None] * len(previous)
+    for row in previous.values():
+        expected[row["row"]] = str(row["id"])
+    return ids == expected
+
+
+class _RowCursor:
+    """Lettura in avanti delle righe del csv precedente, a blocchi"""
+    def __init__(self, path, chunksize=10000):
+        self.path = path
+        self.chunksize = chunksize
+        self._rewind()
+
+    def _rewind(self):
+        self._chunks = pd.read_csv(self.path, encoding="utf-8", chunksize=self.chunksize)
+        self._chunk = None
+        self._start = 0
+
+    def rows(self, positions):
+        """Righe nelle posizioni indicate (in qualunque ordine)
+
+        Args:
+            positions (iterable[int]): posizioni delle righe nel csv
+
+        Returns:
+            dict[int, dict]: riga di ogni posizione
+        """
+        # posizioni ordinate: i blocchi già superati non vengono riletti; se una posizione
+        # precede il blocco corrente (csv scritto in un altro ordine) si riparte dall'inizio
+        positions = sorted(set(positions))
+        if positions and positions[0] < self._start:
+            self._rewind()
+        rows = {}
+        for position in positions:
+            while self._chunk is None or position >= self._start + len(self._chunk):
+                if self._chunk is not None:
+                    self._start += len(self._chunk)
+                self._chunk = next(self._chunks)
+            rows[position] = self._chunk.iloc[position - self._start].to_dict()
+        return rows
+
+
+def _batched(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _append_csv(rows, columns, f, header):
+    pd.DataFrame(rows, columns=columns).to_csv(f, header=header, index=False)
+
+
+def ingest_corpus(roots, levels, output_path, manifest_path, workers=8, batch_size=256):
+    """Ingestione incrementale del corpus in un unico csv
+
+    I file invariati rispetto al manifest (stessi mtime e dimensione) non vengono
+    riletti: le loro righe sono copiate dal csv precedente in base al path. I file
+    nuovi o modificati vengono letti in parallelo con un pool di thread. Le righe
+    sono scritte a blocchi in ordine di path, senza tenere in memoria l'intero
+    corpus, quindi l'output non cambia ordine fra un'esecuzione e l'altra.
+    Output e manifest vengono sostituiti solo a ingestione completata.
+
+    Args:
+        roots (list[str]): cartelle radice del corpus
+        levels (dict): mappa nome cartella -> livello di difficoltà
+        output_path (str): path del csv degli articoli
+        manifest_path (str): path del manifest (path, mtime, size, hash)
+        workers (int): numero di thread di lettura
+        batch_size (int): numero di file letti e scritti per blocco
+
+    Returns:
+        dict: statistiche dell'ingestione (file totali, letti, riusati, eliminati)
+
+    Raises:
+        FileNotFoundError: se non viene trovato nessun file e l'output esistente non è vuoto
+    """
+    previous = load_ingest_manifest(manifest_path)
+    if not os.path.exists(output_path):
+        previous = {}
+    elif previous and not _aligned(previous, output_path):
+        print(" Manifest non allineato al csv degli articoli: tutti i file vengono riletti")
+        previous = {}
+
+    files = sorted(iter_corpus_files(roots, levels))
+    if not files and os.path.exists(output_path) and os.path.getsize(output_path) > 0 \
+            and len(pd.read_csv(output_path, encoding="utf-8", usecols=["id"], nrows=1)) > 0:
+        raise FileNotFoundError("nessun file trovato nelle cartelle del corpus: l'output esistente non viene sostituito")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    tmp_output = output_path + ".tmp"
+    tmp_manifest = manifest_path + ".tmp"
+
+    reused = 0
+    cursor = _RowCursor(output_path) if previous else None
+    with open(tmp_output, "w", encoding="utf-8", newline="") as out, \
+         open(tmp_manifest, "w", encoding="utf-8", newline="") as man, \
+         ThreadPoolExecutor(max_workers=workers) as executor:
+        _append_csv([], ARTICLE_COLUMNS, out, header=True)
+        _append_csv([], MANIFEST_COLUMNS, man, header=True)
+
+        for batch in _batched(files, batch_size):
+            to_read = []
+            for path, level_name, mtime, size in batch:
+                old = previous.get(path)
+                if old is None or old["mtime"] != mtime or old["size"] != size:
+                    to_read.append((path, level_name))
+
+            #lettura parallela dei file nuovi o modificati
+            results = dict(zip(
+                [path for path, _ in to_read],
+                executor.map(lambda item: read_article(item[0], item[1]), to_read)
+            ))
+
+            #righe dei file invariati copiate dal csv precedente
+            copied = cursor.rows(previous[path]["row"] for path, _, _, _ in batch if path not in results) \
+                if cursor is not None else {}
+
+            articles, entries = [], []
+            for path, level_name, mtime, size in batch:
+                if path in results:
+                    row, digest = results[path]
+                else:
+                    old = previous[path]
+                    row, digest = copied[old["row"]], old["hash"]
+                    reused += 1
+                articles.append(row)
+                entries.append({"path": path, "id": row["id"], "mtime": mtime, "size": size, "hash": digest})
+
+            _append_csv(articles, ARTICLE_COLUMNS, out, header=False)
+            _append_csv(entries, MANIFEST_COLUMNS, man, header=False)
+
+    os.replace(tmp_output, output_path)
+    os.replace(tmp_manifest, manifest_path)
+
+    current = {path for path, _, _, _ in files}
+    return {
+        "total": len(files),
+        "read": len(files) - reused,
+        "reused": reused,
+        "deleted": len(set(previous) - current)
+    }
+
+
+if __name__ == "__main__":
+    config = load_yaml()
+    ingest_config = config.get('ingest', {})
+    paths = config['paths']
+
+    parser = argparse.ArgumentParser(description="Ingestione dei testi del corpus in formato csv")
+    parser.add_argument("roots", nargs="*", default=ingest_config.get('roots', []),
+                        help="cartelle radice del corpus (default: ingest.roots in configurazione)")
+    parser.add_argument("--output", default=paths.get('interim_csv', "data/interim/onestop_texts.csv"))
+    parser.add_argument("--manifest", default=paths.get('ingest_manifest', "data/interim/ingest_manifest.csv"))
+    parser.add_argument("--workers", type=int, default=ingest_config.get('workers', 8))
+    args = parser.parse_args()
+
+    roots = [os.path.join(PROJECT_ROOT, root) for root in args.roots]
+    levels = ingest_config.get('levels', DEFAULT_LEVELS)
+    output_path = os.path.join(PROJECT_ROOT, args.output)
+    manifest_path = os.path.join(PROJECT_ROOT, args.manifest)
+
+    stats = ingest_corpus(roots, levels, output_path, manifest_path, workers=args.workers)
+
+    print(f" Salvati {stats['total']} articoli ({stats['read']} letti, "
+          f"{stats['reused']} invariati, {stats['deleted']} rimossi)")
+    print(f"File: {output_path}")
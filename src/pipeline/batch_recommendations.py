@@ -0,0 +1,248 @@
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from utils.io_utils import load_csv, load_json, load_pickle, load_yaml, save_json, save_npz, load_npz
+from src.recommender.corpus_index import CorpusIndex
+from src.recommender.scorer import Scorer, ScoringParams
+from src.user.profile_store import ProfileStore
+
+
+# stato di ogni processo worker, creato una volta da _init_worker
+_worker = {}
+
+
+def _init_worker(corpus_dir, params, db_path):
+    _worker["scorer"] = Scorer(CorpusIndex.open_arrays(corpus_dir), ScoringParams(*params))
+    _worker["store"] = ProfileStore(db_path)
+
+
+def score_shard(shard, user_ids, shard_path, k, chunk_size=256):
+    """Calcola i top k documenti per un blocco di utenti (eseguito nel processo worker)
+
+    Args:
+        shard (int): numero del blocco
+        user_ids (list[int]): utenti del blocco
+        shard_path (str): path del file npz del blocco
+        k (int): documenti per utente
+        chunk_size (int): utenti per prodotto matriciale
+
+    Returns:
+        tuple[int, int]: numero del blocco e utenti valutati
+    """
+    scorer = _worker["scorer"]
+    profiles = _worker["store"].load_many(user_ids)
+    users = [profiles[user_id] for user_id in user_ids if user_id in profiles]
+
+    doc_pos = np.full((len(users), k), -1, dtype=np.int32)
+    scores = np.full((len(users), k), np.nan, dtype=np.float32)
+    counts = np.zeros(len(users), dtype=np.int16)
+    for i, (positions, user_scores) in enumerate(scorer.top_k_batch(users, k, chunk_size)):
+        doc_pos[i, :len(positions)] = positions
+        scores[i, :len(positions)] = user_scores
+        counts[i] = len(positions)
+
+    tmp_path = shard_path + ".tmp"
+    save_npz(tmp_path, {
+        "user_id": np.asarray([user["user_id"] for user in users], dtype=np.int64),
+        "doc_pos": doc_pos,
+        "score": scores,
+        "count": counts
+    })
+    os.replace(tmp_path, shard_path)
+    return shard, len(users)
+
+
+def _job_key(user_ids, profiles_version, index, params, shard_size):
+    digest = hashlib.sha1()
+    digest.update(np.asarray(user_ids, dtype=np.int64).tobytes())
+    digest.update(str(profiles_version).encode("utf-8"))
+    digest.update(index.ids.astype(str).tobytes())
+    digest.update(np.ascontiguousarray(index.flesch).tobytes())
+    digest.update(repr((tuple(params), shard_size)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _print_progress(done, total, users, elapsed):
+    rate = users / elapsed if elapsed else 0.0
+    eta = (total - done) * elapsed / done if done else 0.0
+    print(f" blocchi {done}/{total}  utenti {users}  {rate:.0f} utenti/s  ETA {eta:.0f}s", flush=True)
+
+
+def run_batch_recommendations(index, db_path, output_dir, params, shard_size=1000,
+                              workers=None, resume=True, progress=_print_progress):
+    """Precalcola i top k documenti di tutti gli utenti dell'archivio dei profili
+
+    Gli utenti sono divisi in blocchi valutati da un pool di processi; l'indice
+    del corpus è salvato una volta in file .npy che ogni worker apre in memory
+    map, quindi i processi condividono le stesse pagine invece di copiarle.
+    Ogni blocco viene scritto appena pronto (file npz in output_dir/shards): se il
+    job viene interrotto, rieseguendolo con gli stessi utenti, profili (versione
+    dell'archivio), corpus e parametri i blocchi già scritti vengono saltati.
+    Dopo l'unione i blocchi vengono eliminati, quindi un job completato non viene
+    mai ripreso. Alla fine i blocchi sono uniti in un
+    unico file colonnare output_dir/recommendations.npz con le colonne
+        user_id (U), doc_id (U x k), score (U x k), flesch (U x k), count (U)
+    dove le righe con meno di k candidati sono completate da "" / NaN.
+
+    I profili sono letti dagli snapshot dell'archivio: con il log degli eventi
+    attivo va eseguito dopo compact_event_log (nel processo proprietario del log).
+
+    Args:
+        index (CorpusIndex): indice del corpus
+        db_path (str): path del database dei profili
+        output_dir (str): cartella di output del job
+        params (ScoringParams): parametri dello score (params.k documenti per utente)
+        shard_size (int): utenti per blocco
+        workers (int, optional): processi worker (default numero di CPU)
+        resume (bool): se True riusa i blocchi già calcolati da un'esecuzione interrotta
+        progress (callable, optional): funzione (blocchi fatti, blocchi totali, utenti, secondi)
+
+    Returns:
+        dict: utenti, blocchi calcolati e riusati, secondi e path del file di output
+    """
+    start = time.perf_counter()
+    store = ProfileStore(db_path)
+    user_ids = store.user_ids()
+    profiles_version = store.version()
+    store.close()
+
+    shards = [user_ids[i:i + shard_size] for i in range(0, len(user_ids), shard_size)]
+    shard_dir = os.path.join(output_dir, "shards")
+    corpus_dir = os.path.join(output_dir, "corpus")
+    job_path = os.path.join(output_dir, "job.json")
+
+    key = _job_key(user_ids, profiles_version, index, params, shard_size)
+    previous = load_json(job_path) if os.path.exists(job_path) else {}
+    if not resume or previous.get("key") != key:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+    os.makedirs(shard_dir, exist_ok=True)
+    index.save_arrays(corpus_dir)
+    save_json({"key": key, "shards": len(shards), "users": len(user_ids)}, job_path)
+
+    shard_paths = [os.path.join(shard_dir, f"shard_{i:05d}.npz") for i in range(len(shards))]
+    todo = [i for i, path in enumerate(shard_paths) if not os.path.exists(path)]
+    done = len(shards) - len(todo)
+    users_done = 0
+
+    if todo:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(corpus_dir, tuple(params), db_path)
+        ) as executor:
+            futures = [executor.submit(score_shard, i, shards[i], shard_paths[i], params.k) for i in todo]
+            for future in as_completed(futures):
+                _, count = future.result()
+                done += 1
+                users_done += count
+                if progress is not None:
+                    progress(done, len(shards), users_done, time.perf_counter() - start)
+
+    output_path = os.path.join(output_dir, "recommendations.npz")
+    merge_shards(shard_paths, index, output_path)
+    # job completato: l'esecuzione successiva ricalcola tutto
+    os.remove(job_path)
+    shutil.rmtree(shard_dir, ignore_errors=True)
+
+    return {
+        "users": len(user_ids),
+        "shards_run": len(todo),
+        "shards_reused": len(shards) - len(todo),
+        "seconds": round(time.perf_counter() - start, 2),
+        "output": output_path
+    }
+
+
+def merge_shards(shard_paths, index, output_path):
+    """Unisce i blocchi in un unico file colonnare con id e flesch dei documenti
+
+    Args:
+        shard_paths (list[str]): path dei blocchi in ordine
+        index (CorpusIndex): indice del corpus usato per calcolarli
+        output_path (str): path del file npz di output
+    """
+    parts = [load_npz(path) for path in shard_paths]
+    if parts:
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    else:
+        columns = {
+            "user_id": np.zeros(0, dtype=np.int64),
+            "doc_pos": np.zeros((0, 0), dtype=np.int32),
+            "score": np.zeros((0, 0), dtype=np.float32),
+            "count": np.zeros(0, dtype=np.int16)
+        }
+
+    doc_pos = columns.pop("doc_pos")
+    missing = doc_pos < 0
+    ids = index.ids.astype(str)
+    columns["doc_id"] = np.where(missing, "", ids[np.where(missing, 0, doc_pos)]) if len(ids) else doc_pos.astype(str)
+    columns["flesch"] = np.where(missing, np.nan, index.flesch[np.where(missing, 0, doc_pos)]).astype(np.float32)
+
+    tmp_path = output_path + ".tmp"
+    save_npz(tmp_path, columns)
+    os.replace(tmp_path, output_path)
+
+
+def load_batch_recommendations(path):
+    """Carica le raccomandazioni precalcolate come dizionario user_id -> top k
+
+    Args:
+        path (str): path di recommendations.npz
+
+    Returns:
+        dict[int, tuple[list[str], list[float], list[float]]]: id, score e flesch dei documenti per utente
+    """
+    data = load_npz(path)
+    result = {}
+    for i, user_id in enumerate(data["user_id"].tolist()):
+        n = int(data["count"][i])
+        result[user_id] = (
+            data["doc_id"][i, :n].tolist(),
+            data["score"][i, :n].tolist(),
+            data["flesch"][i, :n].tolist()
+        )
+    return result
+
+
+if __name__ == "__main__":
+    config = load_yaml()
+
+    parser = argparse.ArgumentParser(description="Precalcolo notturno delle raccomandazioni di tutti gli utenti")
+    parser.add_argument("--output", default=os.path.join(PROJECT_ROOT, config['paths'].get('batch_recommendations', "data/batch_recommendations")))
+    parser.add_argument("--shard-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--restart", action="store_true", help="ignora i blocchi di un'esecuzione interrotta")
+    args = parser.parse_args()
+
+    if config.get('event_log', {}).get('enabled', False):
+        from src.user import model_user
+        from src.user.event_log import EventLogLockedError
+        try:
+            model_user.enable_event_log()
+            model_user.compact_event_log()
+        except EventLogLockedError:
+            # il log appartiene al servizio in esecuzione, che lo compatta periodicamente
+            print(" Log dei feedback in uso da un altro processo: si usano gli snapshot dell'ultima compattazione")
+
+    df = load_csv(os.path.join(PROJECT_ROOT, config['paths']['features_csv']))
+    embedding = load_pickle(os.path.join(PROJECT_ROOT, config['paths']['embeddings_pickle']))
+    index = CorpusIndex.from_frame(df[["id", "flesch_score"]], embedding)
+    db_path = os.path.join(PROJECT_ROOT, config['paths'].get('user_db', "data/profiles.db"))
+
+    report = run_batch_recommendations(
+        index, db_path, args.output, ScoringParams.from_config(config),
+        shard_size=args.shard_size, workers=args.workers, resume=not args.restart
+    )
+    print(f" {report['users']} utenti in {report['seconds']}s "
+          f"({report['shards_run']} blocchi calcolati, {report['shards_reused']} riusati) -> {report['output']}")
@@ -0,0 +1,334 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from utils.io_utils import load_csv, load_json, load_pickle, load_yaml, save_json, save_pickle, save_npz, hash_file
+
+
+class Stage:
+    """Passo della pipeline offline con input e output dichiarati
+
+    Un passo dipende da un altro se uno dei suoi input è fra gli output dell'altro.
+    """
+    def __init__(self, name, func, inputs, outputs, params=None):
+        """Inizializza il passo
+
+        Args:
+            name (str): nome univoco del passo
+            func (callable): funzione senza argomenti che produce gli output
+            inputs (list[str]): path di file o cartelle letti dal passo
+            outputs (list[str]): path dei file scritti dal passo
+            params (dict, optional): parametri del passo, inclusi nell'impronta degli input
+        """
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+
+
+def fingerprint(path):
+    """Impronta del contenuto di un input
+
+    Per i file è lo sha1 del contenuto; per le cartelle è lo sha1 dell'elenco
+    (path relativo, mtime, dimensione) dei file contenuti, per non dover rileggere
+    corpus molto grandi.
+
+    Args:
+        path (str): path del file o della cartella
+
+    Returns:
+        str or None: impronta esadecimale oppure None se il path non esiste
+    """
+    if os.path.isfile(path):
+        return hash_file(path)
+    if not os.path.isdir(path):
+        return None
+
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            stat = os.stat(full)
+            digest.update(f"{os.path.relpath(full, path)}|{stat.st_mtime_ns}|{stat.st_size}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _params_hash(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class PipelineRunner:
+    """Esecuzione dei passi della pipeline come DAG con cache sulle impronte degli input
+
+    Un passo viene saltato se le impronte dei suoi input e dei suoi parametri sono
+    uguali a quelle dell'ultima esecuzione riuscita e tutti i suoi output esistono.
+    I passi indipendenti vengono eseguiti in parallelo.
+    """
+    def __init__(self, stages, state_path, max_workers=4):
+        """Inizializza il runner
+
+        Args:
+            stages (list[Stage]): passi della pipeline
+            state_path (str): path del file json con lo stato delle esecuzioni
+            max_workers (int): numero massimo di passi eseguiti in parallelo
+
+        Raises:
+            ValueError: se i nomi dei passi non sono univoci o le dipendenze formano un ciclo
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Nomi dei passi duplicati")
+        self.state_path = state_path
+        self.max_workers = max_workers
+        self.dependencies = self._dependencies()
+        self._check_acyclic()
+
+
+    def _dependencies(self):
+        producers = {}
+        for stage in self.stages.values():
+            for output in stage.outputs:
+                producers[os.path.abspath(output)] = stage.name
+
+        return {
+            stage.name: {
+                producers[os.path.abspath(path)]
+                for path in stage.inputs
+                if os.path.abspath(path) in producers and producers[os.path.abspath(path)] != stage.name
+            }
+            for stage in self.stages.values()
+        }
+
+
+    def _check_acyclic(self):
+        done = set()
+        remaining = dict(self.dependencies)
+        while remaining:
+            ready = [name for name, deps in remaining.items() if deps <= done]
+            if not ready:
+                raise ValueError(f"Dipendenze cicliche fra i passi: {sorted(remaining)}")
+            for name in ready:
+                done.add(name)
+                del remaining[name]
+
+
+    def load_state(self):
+        """Carica lo stato delle esecuzioni precedenti
+
+        Returns:
+            dict: stato per passo (impronte degli input, tempi, esito)
+        """
+        if not os.path.exists(self.state_path):
+            return {}
+        return load_json(self.state_path)
+
+
+    def _input_fingerprints(self, stage):
+        prints = {path: fingerprint(path) for path in stage.inputs}
+        prints["__params__"] = _params_hash(stage.params)
+        return prints
+
+
+    def _run_stage(self, stage, previous, force):
+        inputs = self._input_fingerprints(stage)
+        outputs_exist = all(os.path.exists(path) for path in stage.outputs)
+
+        if not force and previous is not None and previous.get("inputs") == inputs and outputs_exist:
+            return {
+                "status": "skipped",
+                "inputs": inputs,
+                "seconds": 0.0,
+                "last_run_seconds": previous.get("last_run_seconds", previous.get("seconds", 0.0)),
+                "finished_at": previous.get("finished_at")
+            }
+
+        start = time.perf_counter()
+        stage.func()
+        seconds = time.perf_counter() - start
+
+        return {
+            "status": "run",
+            "inputs": inputs,
+            "seconds": round(seconds, 4),
+            "last_run_seconds": round(seconds, 4),
+            "finished_at": time.time()
+        }
+
+
+    def run(self, force=()):
+        """Esegue la pipeline
+
+        Args:
+            force (iterable[str]): nomi dei passi da rieseguire comunque
+
+        Returns:
+            dict: report per passo con esito ("run", "skipped", "failed",
+                  "blocked") e durata in secondi
+
+        Raises:
+            RuntimeError: se almeno un passo fallisce (lo stato dei passi riusciti viene comunque salvato)
+        """
+        force = set(force)
+        state = self.load_state()
+        report = {}
+        errors = {}
+
+        pending = dict(self.dependencies)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                finished = {name for name, entry in report.items() if entry["status"] in ("run", "skipped")}
+                failed = {name for name, entry in report.items() if entry["status"] in ("failed", "blocked")}
+
+                for name, deps in list(pending.items()):
+                    if deps & failed:
+                        report[name] = {"status": "blocked", "seconds": 0.0}
+                        del pending[name]
+                    elif deps <= finished:
+                        future = executor.submit(self._run_stage, self.stages[name], state.get(name), name in force)
+                        running[future] = name
+                        del pending[name]
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        entry = future.result()
+                    except Exception as e:
+                        errors[name] = e
+                        report[name] = {"status": "failed", "seconds": 0.0, "error": repr(e)}
+                        continue
+                    report[name] = entry
+                    state[name] = entry
+
+        save_json(state, self.state_path)
+
+        if errors:
+            raise RuntimeError(f"Passi falliti: {', '.join(sorted(errors))}") from next(iter(errors.values()))
+        return report
+
+
+
+def build_corpus_index(features_path, embeddings_path, index_path):
+    """Salva l'indice del corpus pronto per lo scoring: id, punteggi flesch
+    ed embedding normalizzati in float32
+
+    Args:
+        features_path (str): path del csv delle feature
+        embeddings_path (str): path del pickle degli embedding
+        index_path (str): path del file npz da scrivere
+    """
+    df = load_csv(features_path)
+    emb = np.asarray(load_pickle(embeddings_path), dtype=np.float32)
+    norms = np.linalg.norm(emb, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    save_npz(index_path, {
+        "ids": df["id"].astype(str).to_numpy(dtype=str),
+        "flesch": df["flesch_score"].to_numpy(dtype=np.float32),
+        "embedding": emb / norms
+    })
+
+
+def build_segments(features_path, segments_path, min_words=20):
+    """Salva l'indice dei paragrafi del corpus ordinato per punteggio flesch
+
+    Args:
+        features_path (str): path del csv delle feature
+        segments_path (str): path del file npz da scrivere
+        min_words (int): numero minimo di parole per paragrafo
+    """
+    from src.features.preprocessing import build_segment_index
+    df = load_csv(features_path)
+    save_npz(segments_path, build_segment_index(df["testo"], min_words=min_words))
+
+
+def build_default_stages(config):
+    """Dichiarazione dei passi ingest -> features -> embeddings -> index,
+    con l'indice dei paragrafi costruito in parallelo agli embedding
+
+    Args:
+        config (dict): configurazione del progetto
+
+    Returns:
+        list[Stage]: passi della pipeline
+    """
+    paths = config['paths']
+    ingest_config = config.get('ingest', {})
+
+    def absolute(rel):
+        return os.path.join(PROJECT_ROOT, rel)
+
+    roots = [absolute(root) for root in ingest_config.get('roots', [])]
+    interim_csv = absolute(paths.get('interim_csv', "data/interim/onestop_texts.csv"))
+    ingest_manifest = absolute(paths.get('ingest_manifest', "data/interim/ingest_manifest.csv"))
+    features_csv = absolute(paths['features_csv'])
+    features_manifest = absolute(paths.get('features_manifest', "data/processed/features_manifest.csv"))
+    embeddings_pickle = absolute(paths['embeddings_pickle'])
+    corpus_index = absolute(paths.get('corpus_index', "data/processed/corpus_index.npz"))
+    segment_index = absolute(paths.get('segment_index', "data/processed/segment_index.npz"))
+    min_words = config.get('segment_min_words', 20)
+
+    def ingest():
+        from src.ingest.data_ingestion import ingest_corpus, DEFAULT_LEVELS
+        ingest_corpus(roots, ingest_config.get('levels', DEFAULT_LEVELS), interim_csv, ingest_manifest,
+                      workers=ingest_config.get('workers', 8))
+
+    def features():
+        from src.features.feature_builder import build_features_incremental
+        build_features_incremental(load_csv(interim_csv), features_csv, features_manifest)
+
+    def embeddings():
+        from src.features.embeddings import model_embedding, sentences_embedding
+        df = load_csv(features_csv)
+        save_pickle(embeddings_pickle, sentences_embedding(df['testo'].tolist(), model_embedding()))
+
+    def index():
+        build_corpus_index(features_csv, embeddings_pickle, corpus_index)
+
+    def segments():
+        build_segments(features_csv, segment_index, min_words=min_words)
+
+    from src.features.feature_builder import FEATURE_VERSION
+
+    return [
+        Stage("ingest", ingest, roots, [interim_csv, ingest_manifest],
+              params={"levels": ingest_config.get('levels')}),
+        Stage("features", features, [interim_csv], [features_csv, features_manifest],
+              params={"feature_version": FEATURE_VERSION}),
+        Stage("embeddings", embeddings, [features_csv], [embeddings_pickle]),
+        Stage("index", index, [features_csv, embeddings_pickle], [corpus_index]),
+        Stage("segments", segments, [features_csv], [segment_index],
+              params={"min_words": min_words, "feature_version": FEATURE_VERSION}),
+    ]
+
+
+if __name__ == "__main__":
+    config = load_yaml()
+
+    parser = argparse.ArgumentParser(description="Esecuzione della pipeline offline con cache dei passi")
+    parser.add_argument("--force", nargs="*", default=[], help="passi da rieseguire comunque")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    state_path = os.path.join(PROJECT_ROOT, config['paths'].get('pipeline_state', "data/pipeline_state.json"))
+    runner = PipelineRunner(build_default_stages(config), state_path, max_workers=args.workers)
+    report = runner.run(force=args.force)
+
+    for name, entry in report.items():
+        print(f" {name:<12} {entry['status']:<8} {entry['seconds']:.2f}s")
@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from src.user.history import DocHistory
+
+
+class MicroBatchScheduler:
+    """Raggruppa le richieste di ranking concorrenti in micro-batch
+
+    Le richieste che arrivano entro una finestra di tempo (o fino a max_batch)
+    vengono valutate insieme: le similarità di tutti gli utenti del batch si
+    ottengono con un unico prodotto matrice corpus x matrice utenti, poi per
+    ogni utente si applicano filtro e top k e si risolve il suo Future.
+    """
+    def __init__(self, scorer, window=0.002, max_batch=64):
+        """Inizializza lo scheduler e avvia il thread di scoring
+
+        Args:
+            scorer (Scorer): scorer condiviso (indice del corpus e parametri)
+            window (float): secondi di attesa dalla prima richiesta prima di valutare il batch
+            max_batch (int): numero massimo di richieste per batch (il batch parte subito se raggiunto)
+        """
+        self.scorer = scorer
+        self.window = window
+        self.max_batch = max_batch
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.total_wait = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="micro-batch", daemon=True)
+        self._thread.start()
+
+
+    def submit(self, user, k=None, scorer=None):
+        """Accoda una richiesta di ranking
+
+        Args:
+            user (dict): dati dell'utente (topic vector e history vengono copiati)
+            k (int, optional): numero di documenti (default params.k)
+            scorer (Scorer, optional): scorer da usare per questa richiesta (default self.scorer),
+                                       es. quello del motore corrente dopo un cambio di corpus
+
+        Returns:
+            concurrent.futures.Future: risolto con (posizioni, score) dei top k documenti
+        """
+        snapshot = {
+            "user_id": user.get("user_id"),
+            "topic_vector": np.asarray(user["topic_vector"], dtype=np.float32),
+            "target_readability": user["target_readability"],
+            "history": DocHistory(user.get("history", ()))
+        }
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("scheduler chiuso")
+            self._queue.append((snapshot, k, future, time.perf_counter(), scorer or self.scorer))
+            self.requests += 1
+            self._cond.notify()
+        return future
+
+
+    def rank_top_k(self, user, k=None, timeout=None):
+        """Ranking bloccante nello stesso formato di RecommenderEngine.rank_top_k
+
+        Args:
+            user (dict): dati dell'utente
+            k (int, optional): numero di documenti
+            timeout (float, optional): secondi massimi di attesa
+
+        Returns:
+            tuple[list[str], list[float], list[str], list[float]]: id, score, testi e flesch dei documenti
+        """
+        positions, scores = self.submit(user, k).result(timeout=timeout)
+        return self.scorer.to_rank(positions, scores)
+
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return None
+
+            deadline = self._queue[0][3] + self.window
+            while len(self._queue) < self.max_batch and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            size = min(len(self._queue), self.max_batch)
+            return [self._queue.popleft() for _ in range(size)]
+
+
+    def _score(self, batch):
+        # un prodotto matriciale per ogni scorer presente nel batch (di norma uno solo)
+        groups = {}
+        for request in batch:
+            groups.setdefault(id(request[4]), []).append(request)
+
+        for group in groups.values():
+            scorer = group[0][4]
+            vectors = np.vstack([request[0]["topic_vector"] for request in group])
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            sims = scorer.index.unit_embedding @ vectors.T
+
+            now = time.perf_counter()
+            for j, (user, k, future, submitted, _) in enumerate(group):
+                self.total_wait += now - submitted
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(scorer.top_k(user, k, sims[:, j]))
+                except Exception as e:
+                    future.set_exception(e)
+
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, len(batch))
+            try:
+                self._score(batch)
+            except Exception as e:
+                for _, _, future, _, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+
+    def stats(self):
+        """Metriche dello scheduler
+
+        Returns:
+            dict: profondità della coda, richieste, batch, dimensione media e massima
+                  dei batch, attesa media in coda (ms)
+        """
+        with self._cond:
+            scored = self.requests - len(self._queue)
+            return {
+                "queue_depth": len(self._queue),
+                "requests": self.requests,
+                "batches": self.batches,
+                "mean_batch_size": scored / self.batches if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "mean_wait_ms": 1000 * self.total_wait / scored if scored else 0.0
+            }
+
+
+    def close(self):
+        """Valuta le richieste in coda e ferma il thread di scoring"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
@@ -0,0 +1,191 @@
+import os
+from types import MappingProxyType
+
+import numpy as np
+
+from utils.io_utils import load_npz
+from src.user.history import as_history
+
+
+def _readonly(array):
+    # vista in sola lettura: non copia i dati (es. array in memory map) e non
+    # cambia i flag dell'array del chiamante
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class CorpusIndex:
+    """Indice immutabile del corpus condiviso da tutte le richieste
+
+    Contiene id, punteggi flesch, testi ed embedding normalizzati dei documenti
+    come array in sola lettura e la mappa id -> posizione: viene costruito una
+    volta sola e può essere letto da più thread senza lock e senza copie.
+    Un indice può avere documenti rimossi (alive = False, vedi LiveCorpusIndex):
+    sono esclusi dai candidati e da position().
+    """
+    def __init__(self, ids, flesch, unit_embedding, testi=None, alive=None):
+        """Inizializza l'indice
+
+        Args:
+            ids (array-like[str]): id dei documenti
+            flesch (array-like[float]): punteggi flesch dei documenti
+            unit_embedding (np.ndarray): matrice N x D degli embedding a norma unitaria
+            testi (array-like[str], optional): testi dei documenti
+            alive (array-like[bool], optional): False per i documenti rimossi
+        """
+        ids = np.asarray(ids).astype(str).astype(object)
+        alive = None if alive is None else np.asarray(alive, dtype=bool)
+        positions = {}
+        for pos, doc_id in enumerate(ids):
+            if alive is None or alive[pos]:
+                positions.setdefault(doc_id, pos)
+
+        self._set(ids, flesch, unit_embedding, testi, alive, positions)
+
+        if len(self.flesch) != len(ids) or len(self.unit_embedding) != len(ids):
+            raise ValueError("id, flesch ed embedding devono avere lo stesso numero di documenti")
+
+
+    def _set(self, ids, flesch, unit_embedding, testi, alive, positions):
+        object.__setattr__(self, "ids", _readonly(ids))
+        object.__setattr__(self, "flesch", _readonly(np.asarray(flesch, dtype=np.float64)))
+        object.__setattr__(self, "unit_embedding", _readonly(np.asarray(unit_embedding, dtype=np.float32)))
+        object.__setattr__(self, "testi", None if testi is None else _readonly(np.asarray(testi, dtype=object)))
+        object.__setattr__(self, "alive", None if alive is None else _readonly(alive))
+        object.__setattr__(self, "positions", positions if isinstance(positions, MappingProxyType) else MappingProxyType(positions))
+
+
+    @classmethod
+    def _wrap(cls, ids, flesch, unit_embedding, testi, alive, positions):
+        # costruzione senza copie né ricostruzione della mappa (usata da LiveCorpusIndex):
+        # positions può contenere posizioni oltre la fine dell'indice, che vengono ignorate
+        index = object.__new__(cls)
+        index._set(ids, flesch, unit_embedding, testi, alive, positions)
+        return index
+
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CorpusIndex è in sola lettura")
+
+
+    def __len__(self):
+        return len(self.ids)
+
+
+    @classmethod
+    def from_frame(cls, df, embedding):
+        """Crea l'indice dal DataFrame delle feature e dagli embedding (il DataFrame non viene modificato)
+
+        Args:
+            df (pd.DataFrame): DataFrame dei contenuti (id, flesch_score, testo)
+            embedding (object): embedding dei documenti, nello stesso ordine del DataFrame
+
+        Returns:
+            CorpusIndex: indice del corpus
+        """
+        emb = np.asarray(embedding, dtype=np.float32)
+        norms = np.linalg.norm(emb, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        testi = df["testo"].to_numpy(copy=True) if "testo" in df else None
+        return cls(df["id"].to_numpy(), df["flesch_score"].to_numpy(dtype=np.float64, copy=True), emb / norms, testi)
+
+
+    @classmethod
+    def load(cls, index_path, testi=None):
+        """Carica l'indice salvato dalla pipeline (build_corpus_index)
+
+        Args:
+            index_path (str): path del file npz con ids, flesch ed embedding normalizzati
+            testi (array-like[str], optional): testi dei documenti, nello stesso ordine
+
+        Returns:
+            CorpusIndex: indice del corpus
+        """
+        data = load_npz(index_path)
+        return cls(data["ids"], data["flesch"], data["embedding"], testi)
+
+
+    def save_arrays(self, directory):
+        """Salva id, flesch ed embedding come file .npy separati, apribili in memory map
+
+        Args:
+            directory (str): cartella di destinazione
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "ids.npy"), self.ids.astype(str))
+        np.save(os.path.join(directory, "flesch.npy"), self.flesch)
+        np.save(os.path.join(directory, "embedding.npy"), self.unit_embedding)
+        alive_path = os.path.join(directory, "alive.npy")
+        if self.alive is not None:
+            np.save(alive_path, self.alive)
+        elif os.path.exists(alive_path):
+            os.remove(alive_path)
+
+
+    @classmethod
+    def open_arrays(cls, directory, testi=None):
+        """Apre in memory map l'indice salvato con save_arrays: più processi che
+            aprono gli stessi file condividono le pagine in memoria invece di copiarle
+
+        Args:
+            directory (str): cartella con ids.npy, flesch.npy ed embedding.npy (e alive.npy)
+            testi (array-like[str], optional): testi dei documenti, nello stesso ordine
+
+        Returns:
+            CorpusIndex: indice del corpus
+        """
+        alive_path = os.path.join(directory, "alive.npy")
+        return cls(
+            np.load(os.path.join(directory, "ids.npy")),
+            np.load(os.path.join(directory, "flesch.npy"), mmap_mode="r"),
+            np.load(os.path.join(directory, "embedding.npy"), mmap_mode="r"),
+            testi,
+            np.load(alive_path) if os.path.exists(alive_path) else None
+        )
+
+
+    def position(self, doc_id):
+        """Posizione di un documento nel corpus
+
+        Args:
+            doc_id (str): id del documento
+
+        Returns:
+            int or None: posizione del documento oppure None se non esiste
+        """
+        pos = self.positions.get(str(doc_id))
+        if pos is None or pos >= len(self.ids) or (self.alive is not None and not self.alive[pos]):
+            return None
+        return pos
+
+
+    def history_positions(self, history):
+        """Posizioni nel corpus dei documenti di una history
+
+        Args:
+            history (iterable[str]): documenti già letti dall'utente
+
+        Returns:
+            np.ndarray: posizioni (int64) dei documenti presenti nel corpus
+        """
+        positions = as_history(history).positions(self.positions)
+        return positions[positions < len(self.ids)]
+
+
+    def candidates(self, target, tol, history=()):
+        """Documenti con leggibilità entro la tolleranza dal target e non ancora letti
+
+        Args:
+            target (float): target readability dell'utente
+            tol (float): tolleranza sul punteggio flesch
+            history (iterable[str]): documenti già letti dall'utente
+
+        Returns:
+            np.ndarray: posizioni dei documenti candidati in ordine crescente
+        """
+        keep = np.abs(self.flesch - target) <= tol
+        if self.alive is not None:
+            keep &= self.alive
+        keep[self.history_positions(history)] = False
+        return np.flatnonzero(keep)
@@ -0,0 +1,250 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+def artifact_signature(paths):
+    """Impronta economica degli artefatti del corpus (mtime e dimensione di ogni file)
+
+    Args:
+        paths (list[str]): path degli artefatti (es. csv delle feature, pickle degli embedding)
+
+    Returns:
+        tuple: (path, mtime_ns, dimensione) per ogni file, None per i file mancanti
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            signature.append((path, None))
+            continue
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class _Generation:
+    def __init__(self, number, engine, signature):
+        self.number = number
+        self.engine = engine
+        self.signature = signature
+        self.inflight = 0
+        self.loaded_at = time.time()
+
+
+class EngineRegistry:
+    """Motore di raccomandazione corrente con sostituzione a caldo del corpus
+
+    Un thread in background controlla l'impronta degli artefatti; quando cambia
+    costruisce il nuovo motore senza bloccare le richieste e lo rende corrente
+    con un solo scambio di riferimento. Le richieste già iniziate (acquire)
+    terminano sul motore con cui sono partite; il motore precedente resta in
+    memoria per il rollback, quelli più vecchi vengono rilasciati appena le
+    loro richieste in corso sono terminate.
+    """
+    def __init__(self, builder, signature_fn, on_swap=None, poll_interval=30.0):
+        """Costruisce il primo motore
+
+        Args:
+            builder (callable): funzione senza argomenti che costruisce un RecommenderEngine
+            signature_fn (callable): funzione senza argomenti che restituisce l'impronta degli artefatti
+            on_swap (callable, optional): funzione engine -> None chiamata dopo ogni cambio di motore
+                                          (es. per svuotare le cache dei loader)
+            poll_interval (float): secondi fra due controlli del thread di sorveglianza
+        """
+        self.builder = builder
+        self.signature_fn = signature_fn
+        self.on_swap = on_swap
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Condition()
+        self._build_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._numbers = 0
+        self._seen = None
+        self._failed = None
+
+        self._current = self._build(self.signature_fn())
+        self._previous = None
+        self._retired = []
+
+        self.swaps = 0
+        self.rollbacks = 0
+        self.failed_builds = 0
+        self.last_error = None
+
+
+    def _build(self, signature):
+        self._numbers += 1
+        return _Generation(self._numbers, self.builder(), signature)
+
+
+    def current(self):
+        """Motore corrente (per usi brevi; per una richiesta usare acquire)
+
+        Returns:
+            RecommenderEngine: motore corrente
+        """
+        return self._current.engine
+
+
+    @contextmanager
+    def acquire(self):
+        """Motore corrente per la durata di una richiesta
+
+        Yields:
+            RecommenderEngine: motore su cui completare la richiesta anche se nel frattempo viene sostituito
+        """
+        with self._lock:
+            generation = self._current
+            generation.inflight += 1
+        try:
+            yield generation.engine
+        finally:
+            with self._lock:
+                generation.inflight -= 1
+                self._release_drained()
+                self._lock.notify_all()
+
+
+    def _release_drained(self):
+        # da chiamare con il lock acquisito
+        self._retired = [generation for generation in self._retired if generation.inflight > 0]
+
+
+    def _swap(self, generation):
+        with self._lock:
+            if self._previous is not None:
+                self._retired.append(self._previous)
+            self._previous = self._current
+            self._current = generation
+            self._release_drained()
+        if self.on_swap is not None:
+            self.on_swap(generation.engine)
+
+
+    def refresh(self, force=False):
+        """Costruisce e attiva un nuovo motore se gli artefatti sono cambiati
+
+        Senza force una nuova impronta viene usata solo se è uguale a quella del
+        controllo precedente, per non caricare artefatti ancora in scrittura.
+
+        Args:
+            force (bool): se True ricostruisce subito, anche se l'impronta non è cambiata
+
+        Returns:
+            bool: True se il motore è stato sostituito
+        """
+        with self._build_lock:
+            signature = self.signature_fn()
+            if not force:
+                if signature in (self._current.signature, self._failed):
+                    return False
+                seen, self._seen = self._seen, signature
+                if seen != signature:
+                    return False
+            try:
+                generation = self._build(signature)
+            except Exception as e:
+                # artefatti incompleti o corrotti: si resta sul motore corrente fino a una nuova pubblicazione
+                self.failed_builds += 1
+                self.last_error = repr(e)
+                self._failed = signature
+                return False
+            self._swap(generation)
+            self.swaps += 1
+            return True
+
+
+    def rollback(self):
+        """Torna al motore precedente (che diventa di nuovo corrente)
+
+        Returns:
+            bool: True se esisteva un motore precedente
+
+        Note:
+            il thread di sorveglianza non ricostruisce il motore annullato finché
+            l'impronta degli artefatti non cambia di nuovo
+        """
+        with self._build_lock:
+            with self._lock:
+                if self._previous is None:
+                    return False
+                previous = self._previous
+                self._previous = None
+                # il motore annullato mantiene l'impronta attuale, così non viene ricostruito subito
+                previous.signature, self._current.signature = self._current.signature, previous.signature
+                self._retired.append(self._current)
+                self._current = previous
+                self._release_drained()
+            self.rollbacks += 1
+        if self.on_swap is not None:
+            self.on_swap(previous.engine)
+        return True
+
+
+    def drain(self, timeout=None):
+        """Attende che le richieste in corso sui motori sostituiti siano terminate
+
+        Args:
+            timeout (float, optional): secondi massimi di attesa
+
+        Returns:
+            bool: True se non restano motori sostituiti con richieste in corso
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self._retired:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._lock.wait(remaining)
+        return True
+
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.refresh()
+
+
+    def start(self):
+        """Avvia il thread che controlla periodicamente gli artefatti
+
+        Returns:
+            EngineRegistry: il registro stesso
+        """
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name="engine-watch", daemon=True)
+            self._watcher.start()
+        return self
+
+
+    def stop(self):
+        """Ferma il thread di sorveglianza"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+
+    def stats(self):
+        """Stato del registro
+
+        Returns:
+            dict: generazione corrente e precedente, richieste in corso, motori in attesa
+                  di rilascio, sostituzioni, rollback e build fallite
+        """
+        with self._lock:
+            return {
+                "generation": self._current.number,
+                "loaded_at": self._current.loaded_at,
+                "inflight": self._current.inflight,
+                "previous": self._previous.number if self._previous is not None else None,
+                "retired": len(self._retired),
+                "swaps": self.swaps,
+                "rollbacks": self.rollbacks,
+                "failed_builds": self.failed_builds,
+                "last_error": self.last_error
+            }
@@ -0,0 +1,216 @@
+import threading
+
+import numpy as np
+
+from src.recommender.corpus_index import CorpusIndex
+
+
+class LiveCorpusIndex:
+    """Indice del corpus aggiornabile online: inserimento e rimozione di documenti
+
+    I documenti sono tenuti in buffer con capacità che raddoppia quando si
+    riempie (inserimento a costo ammortizzato costante); ogni modifica pubblica
+    un nuovo CorpusIndex immutabile che vede i buffer senza copiarli. Le righe
+    nuove sono scritte oltre la fine degli indici già pubblicati, quindi chi sta
+    usando uno snapshot precedente continua a vedere dati coerenti. La mappa
+    id -> posizione è copiata a ogni modifica (copy-on-write): ogni snapshot
+    tiene la propria e non vede sostituzioni o rimozioni successive.
+    La rimozione segna il documento con una tombstone (escluso dai candidati);
+    quando le tombstone superano compact_ratio dei documenti i buffer vengono
+    compattati e le posizioni rinumerate.
+    """
+    def __init__(self, index, compact_ratio=0.25, min_capacity=1024):
+        """Inizializza i buffer dall'indice corrente
+
+        Args:
+            index (CorpusIndex): indice di partenza
+            compact_ratio (float): quota di documenti rimossi oltre la quale si compatta
+            min_capacity (int): capacità minima dei buffer
+        """
+        self.compact_ratio = compact_ratio
+        self.min_capacity = min_capacity
+        self._lock = threading.Lock()
+
+        self.compactions = 0
+        self._load(index.ids, index.flesch, index.unit_embedding, index.testi,
+                   index.alive if index.alive is not None else np.ones(len(index), dtype=bool))
+
+
+    def _load(self, ids, flesch, unit_embedding, testi, alive):
+        size = len(ids)
+        capacity = max(self.min_capacity, size)
+        self._ids = np.empty(capacity, dtype=object)
+        self._flesch = np.zeros(capacity, dtype=np.float64)
+        self._emb = np.zeros((capacity, unit_embedding.shape[1]), dtype=np.float32)
+        self._testi = None if testi is None else np.empty(capacity, dtype=object)
+        self._alive = np.zeros(capacity, dtype=bool)
+
+        self._ids[:size] = ids
+        self._flesch[:size] = flesch
+        self._emb[:size] = unit_embedding
+        if self._testi is not None:
+            self._testi[:size] = testi
+        self._alive[:size] = alive
+
+        self._size = size
+        self._dead = int(size - np.count_nonzero(alive))
+        self._positions = {}
+        for pos in np.flatnonzero(alive):
+            self._positions.setdefault(ids[pos], int(pos))
+        self._publish()
+
+
+    def _publish(self):
+        # l'array alive viene copiato e la mappa delle posizioni non viene più modificata
+        # (add/remove ne creano una nuova): gli snapshot già pubblicati non cambiano
+        n = self._size
+        self._snapshot = CorpusIndex._wrap(
+            self._ids[:n], self._flesch[:n], self._emb[:n],
+            None if self._testi is None else self._testi[:n],
+            self._alive[:n].copy(), self._positions
+        )
+        return self._snapshot
+
+
+    def _grow(self, needed):
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        capacity = max(needed, 2 * capacity)
+        n = self._size
+
+        # buffer nuovi: gli snapshot pubblicati continuano a usare quelli vecchi
+        ids = np.empty(capacity, dtype=object)
+        ids[:n] = self._ids[:n]
+        flesch = np.zeros(capacity, dtype=np.float64)
+        flesch[:n] = self._flesch[:n]
+        emb = np.zeros((capacity, self._emb.shape[1]), dtype=np.float32)
+        emb[:n] = self._emb[:n]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:n] = self._alive[:n]
+        if self._testi is not None:
+            testi = np.empty(capacity, dtype=object)
+            testi[:n] = self._testi[:n]
+            self._testi = testi
+
+        self._ids, self._flesch, self._emb, self._alive = ids, flesch, emb, alive
+
+
+    def snapshot(self):
+        """Indice corrente (immutabile)
+
+        Returns:
+            CorpusIndex: ultimo indice pubblicato
+        """
+        return self._snapshot
+
+
+    def add_documents(self, ids, flesch, embeddings, testi=None):
+        """Aggiunge documenti all'indice (un id già presente viene sostituito)
+
+        Args:
+            ids (list[str]): id dei documenti
+            flesch (array-like[float]): punteggi flesch dei documenti
+            embeddings (array-like): matrice M x D degli embedding (vengono normalizzati)
+            testi (list[str], optional): testi dei documenti
+
+        Returns:
+            CorpusIndex: nuovo indice pubblicato
+
+        Raises:
+            ValueError: se le dimensioni non coincidono o gli id sono ripetuti
+        """
+        ids = [str(doc_id) for doc_id in ids]
+        flesch = np.asarray(flesch, dtype=np.float64)
+        emb = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        if len(flesch) != len(ids) or emb.shape[1] != self._emb.shape[1]:
+            raise ValueError("id, flesch ed embedding non coerenti con l'indice")
+        if len(set(ids)) != len(ids):
+            raise ValueError("id ripetuti fra i documenti da aggiungere")
+        norms = np.linalg.norm(emb, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+
+        with self._lock:
+            positions = dict(self._positions)
+            for doc_id in ids:
+                old = positions.get(doc_id)
+                if old is not None:
+                    self._alive[old] = False
+                    self._dead += 1
+
+            start, end = self._size, self._size + len(ids)
+            self._grow(end)
+            self._ids[start:end] = ids
+            self._flesch[start:end] = flesch
+            self._emb[start:end] = emb / norms
+            if self._testi is not None:
+                self._testi[start:end] = testi if testi is not None else ""
+            self._alive[start:end] = True
+            for pos, doc_id in enumerate(ids, start=start):
+                positions[doc_id] = pos
+            self._positions = positions
+            self._size = end
+            return self._maybe_compact()
+
+
+    def remove_documents(self, ids):
+        """Rimuove documenti dall'indice (tombstone)
+
+        Args:
+            ids (list[str]): id dei documenti
+
+        Returns:
+            CorpusIndex: nuovo indice pubblicato
+        """
+        with self._lock:
+            positions = dict(self._positions)
+            for doc_id in ids:
+                pos = positions.pop(str(doc_id), None)
+                if pos is not None:
+                    self._alive[pos] = False
+                    self._dead += 1
+            self._positions = positions
+            return self._maybe_compact()
+
+
+    def _maybe_compact(self):
+        if self._dead and self._dead > self.compact_ratio * self._size:
+            return self._compact()
+        return self._publish()
+
+
+    def _compact(self):
+        keep = np.flatnonzero(self._alive[:self._size])
+        self.compactions += 1
+        # _load crea buffer e mappa nuovi: gli snapshot precedenti restano validi
+        self._load(
+            self._ids[keep], self._flesch[keep], self._emb[keep],
+            None if self._testi is None else self._testi[keep],
+            np.ones(len(keep), dtype=bool)
+        )
+        return self._snapshot
+
+
+    def compact(self):
+        """Elimina dai buffer i documenti rimossi e rinumera le posizioni
+
+        Returns:
+            CorpusIndex: nuovo indice pubblicato
+        """
+        with self._lock:
+            return self._compact()
+
+
+    def stats(self):
+        """Stato dei buffer
+
+        Returns:
+            dict: documenti, documenti rimossi non ancora compattati, capacità e compattazioni
+        """
+        with self._lock:
+            return {
+                "size": self._size,
+                "tombstones": self._dead,
+                "capacity": len(self._ids),
+                "compactions": self.compactions
+            }
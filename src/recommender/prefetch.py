@@ -0,0 +1,127 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from src.user.profile_cache import copy_profile
+
+
+def profile_key(user):
+    """Chiave che identifica lo stato di un profilo
+
+    Usa la versione assegnata dalla cache dei profili; se assente ricade su
+    target readability e lunghezza della history.
+
+    Args:
+        user (dict): dati dell'utente
+
+    Returns:
+        tuple: chiave dello stato del profilo
+    """
+    version = user.get("version")
+    if version is not None:
+        return ("version", version)
+    return ("state", user["target_readability"], len(user.get("history", ())))
+
+
+class RecommendationPrefetcher:
+    """Calcolo in background delle prossime raccomandazioni di un utente
+
+    Dopo un feedback schedule() avvia la classificazione su un pool di thread;
+    alla richiesta successiva get() restituisce il risultato già pronto se il
+    profilo non è cambiato nel frattempo.
+    """
+    def __init__(self, rank_fn, max_workers=2, max_results=1000):
+        """Inizializza il pool di calcolo
+
+        Args:
+            rank_fn (callable): funzione user -> raccomandazioni (es. main.main)
+            max_workers (int): numero di thread di calcolo
+            max_results (int): numero massimo di risultati tenuti in cache (LRU)
+        """
+        self.rank_fn = rank_fn
+        self.max_results = max_results
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.scheduled = 0
+        self.hits = 0
+        self.misses = 0
+
+
+    def schedule(self, user):
+        """Avvia in background il calcolo delle raccomandazioni per il profilo corrente
+
+        Args:
+            user (dict): dati dell'utente (viene copiato)
+
+        Returns:
+            concurrent.futures.Future: calcolo in corso
+        """
+        snapshot = copy_profile(user)
+        key = profile_key(user)
+
+        future = self._executor.submit(self.rank_fn, snapshot)
+        with self._lock:
+            self.scheduled += 1
+            self._results[user["user_id"]] = (key, future)
+            self._results.move_to_end(user["user_id"])
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        return future
+
+
+    def get(self, user, timeout=0):
+        """Restituisce le raccomandazioni precalcolate per il profilo corrente
+
+        Args:
+            user (dict): dati dell'utente
+            timeout (float): secondi di attesa se il calcolo è ancora in corso
+
+        Returns:
+            object or None: risultato di rank_fn oppure None se non disponibile
+                            (profilo cambiato, calcolo non pronto o fallito)
+        """
+        with self._lock:
+            entry = self._results.get(user["user_id"])
+
+        if entry is None or entry[0] != profile_key(user):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            result = entry[1].result(timeout=timeout)
+        except TimeoutError:
+            result = None
+        except Exception:
+            with self._lock:
+                self._results.pop(user["user_id"], None)
+            result = None
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+
+    def stats(self):
+        """Statistiche del prefetcher
+
+        Returns:
+            dict: calcoli avviati, risultati usati, richieste senza risultato pronto
+        """
+        with self._lock:
+            return {
+                "scheduled": self.scheduled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "cached": len(self._results)
+            }
+
+
+    def shutdown(self):
+        """Ferma il pool di calcolo"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
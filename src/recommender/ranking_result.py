@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+
+
+class RankingResult:
+    """Classifica dei documenti di un utente calcolata una volta e letta a pagine
+
+    Contiene solo posizioni e score dei candidati: l'ordinamento viene esteso
+    solo fino alla profondità richiesta (la prima pagina costa una selezione,
+    non un ordinamento completo) e i testi vengono letti dall'indice del corpus
+    solo quando si accede a un documento. Sfogliare le pagine non ricalcola il
+    ranking e non copia i testi degli articoli.
+    L'ordine è lo stesso di rank_top_k (score decrescente, a parità di score
+    posizione nel corpus crescente).
+    """
+    def __init__(self, index, candidates, scores, page_size=10):
+        """Inizializza il risultato
+
+        Args:
+            index (CorpusIndex): indice del corpus
+            candidates (np.ndarray): posizioni dei documenti candidati in ordine crescente
+            scores (np.ndarray): score dei candidati
+            page_size (int): documenti per pagina di default
+        """
+        self.index = index
+        self.page_size = page_size
+        self._candidates = np.asarray(candidates)
+        self._scores = np.asarray(scores)
+        self._order = np.zeros(0, dtype=np.int64)
+
+
+    def __len__(self):
+        return len(self._candidates)
+
+
+    def _ranked(self, depth):
+        # estende l'ordinamento ai primi depth candidati (raddoppiando per ammortizzare)
+        depth = min(depth, len(self._candidates))
+        if depth > len(self._order):
+            depth = min(max(depth, 2 * len(self._order)), len(self._candidates))
+            neg = -self._scores
+            kth = np.partition(neg, depth - 1)[depth - 1]
+            chosen = np.flatnonzero(neg <= kth)
+            order = chosen[np.lexsort((chosen, neg[chosen]))]
+            self._order = order[:depth]
+        return self._order
+
+
+    def positions(self, start=0, stop=None):
+        """Posizioni nel corpus dei documenti in classifica da start a stop
+
+        Args:
+            start (int): primo rango (0 = migliore)
+            stop (int, optional): rango finale escluso (default fine della pagina di start)
+
+        Returns:
+            np.ndarray: posizioni dei documenti
+        """
+        stop = start + self.page_size if stop is None else stop
+        return self._candidates[self._ranked(stop)[start:stop]]
+
+
+    def scores(self, start=0, stop=None):
+        """Score dei documenti in classifica da start a stop
+
+        Args:
+            start (int): primo rango (0 = migliore)
+            stop (int, optional): rango finale escluso (default fine della pagina di start)
+
+        Returns:
+            np.ndarray: score dei documenti
+        """
+        stop = start + self.page_size if stop is None else stop
+        return self._scores[self._ranked(stop)[start:stop]]
+
+
+    def page_count(self, page_size=None):
+        """Numero di pagine della classifica
+
+        Args:
+            page_size (int, optional): documenti per pagina (default self.page_size)
+
+        Returns:
+            int: numero di pagine
+        """
+        page_size = page_size or self.page_size
+        return -(-len(self) // page_size)
+
+
+    def page(self, number, page_size=None, with_text=False):
+        """Pagina della classifica come DataFrame
+
+        Args:
+            number (int): numero della pagina (0 = prima)
+            page_size (int, optional): documenti per pagina (default self.page_size)
+            with_text (bool): se True include il testo dei documenti
+
+        Returns:
+            pd.DataFrame: title, score, flesch_score (e testo) dei documenti della pagina
+        """
+        page_size = page_size or self.page_size
+        return self.to_df(number * page_size, (number + 1) * page_size, with_text)
+
+
+    def iter_pages(self, page_size=None, with_text=False):
+        """Itera sulle pagine della classifica (ognuna estende l'ordinamento solo quanto serve)
+
+        Args:
+            page_size (int, optional): documenti per pagina (default self.page_size)
+            with_text (bool): se True include il testo dei documenti
+
+        Yields:
+            pd.DataFrame: pagina della classifica
+        """
+        for number in range(self.page_count(page_size)):
+            yield self.page(number, page_size, with_text)
+
+
+    def to_df(self, start=0, stop=None, with_text=False):
+        """Documenti in classifica da start a stop come DataFrame
+
+        Args:
+            start (int): primo rango (0 = migliore)
+            stop (int, optional): rango finale escluso (default fine della pagina di start)
+            with_text (bool): se True include il testo dei documenti
+
+        Returns:
+            pd.DataFrame: title, score, flesch_score (e testo) dei documenti
+        """
+        positions = self.positions(start, stop)
+        columns = {
+            "title": self.index.ids[positions].tolist(),
+            "score": np.round(self.scores(start, stop), 6),
+            "flesch_score": np.round(self.index.flesch[positions], 2)
+        }
+        if with_text:
+            columns["testo"] = self.index.testi[positions].tolist()
+        return pd.DataFrame(columns)
+
+
+    def top_k(self, k):
+        """Primi k documenti nel formato di RecommenderEngine.rank_top_k
+
+        Args:
+            k (int): numero di documenti
+
+        Returns:
+            tuple[list[str], list[float], list[str], list[float]]: id, score, testi e flesch dei documenti
+        """
+        positions = self.positions(0, k)
+        return (
+            self.index.ids[positions].tolist(),
+            np.round(self.scores(0, k), 6),
+            self.index.testi[positions].tolist(),
+            [round(float(value), 2) for value in self.index.flesch[positions]]
+        )
+
+
+    def document(self, doc_id):
+        """Dati completi di un documento della classifica, testo incluso
+
+        Args:
+            doc_id (str): id del documento
+
+        Returns:
+            dict: title, score, flesch_score e testo del documento
+
+        Raises:
+            ValueError: se il documento non è fra i candidati della classifica
+        """
+        pos = self.index.position(doc_id)
+        i = np.searchsorted(self._candidates, pos) if pos is not None else len(self._candidates)
+        if i >= len(self._candidates) or self._candidates[i] != pos:
+            raise ValueError(f"Documento non in classifica: {doc_id}")
+        return {
+            "title": self.index.ids[pos],
+            "score": float(round(self._scores[i], 6)),
+            "flesch_score": round(float(self.index.flesch[pos]), 2),
+            "testo": self.index.testi[pos]
+        }
@@ -1,8 +1,14 @@
 import os
+import threading
 import pandas as pd
 import numpy as np 
 from sklearn.metrics.pairwise import cosine_similarity
-from src.user.model_user import load_user_model
+from src.user.model_user import load_user, difficulty_to_alpha
+from src.recommender.similarity_tracker import SimilarityTracker
+from src.recommender.corpus_index import CorpusIndex
+from src.recommender.scorer import Scorer, ScoringParams
+from src.recommender.ranking_result import RankingResult
+from src.recommender.live_index import LiveCorpusIndex
 
 
 
@@ -10,37 +16,77 @@ class RecommenderEngine():
     """Classe per il motore di raccomandazione dei contenuti
 
     questa classe gestisce i dati, gli embeddings dei documenti e il profilo utente
-    per generare raccomandazioni personalizzate
+    per generare raccomandazioni personalizzate.
+    Lo stato condiviso è l'indice immutabile del corpus (CorpusIndex) e lo score
+    è calcolato da uno Scorer senza stato: il profilo utente arriva come argomento
+    di ogni metodo, quindi un solo motore può servire richieste concorrenti.
+    add_documents / remove_documents pubblicano un nuovo indice: indice, scorer e
+    tracker delle similarità vengono sostituiti insieme con un solo assegnamento.
     """
-    def __init__(self, df, embedding, config, user_id, profile_path):
+    def __init__(self, df, embedding, config, user_id=None, profile_path=None, index=None, segments=None):
         """Inizializza il motore di raccomandazione con i dati e le configurazioni
 
         Args:
-            df (pd.DataFrame): DataFrame dei contenuti
+            df (pd.DataFrame): DataFrame dei contenuti (non viene modificato)
             embedding (object): embeddings dei documenti
             config (dict): parametri di configurazione
-            user_id (str): identificativo dell'utente corrente
-            profile_path (str): percorso dei profili utente
+            user_id (str, optional): utente di default per profile() (compatibilità)
+            profile_path (str, optional): percorso dei profili utente (non usato, compatibilità)
+            index (CorpusIndex, optional): indice del corpus già costruito (es. CorpusIndex.load)
+            segments (dict[str, np.ndarray], optional): indice dei paragrafi dello stesso corpus
+                                                        (build_segment_index), usato da rank_segments
         """
         self.df = df
         self.embedding = embedding
         self.config = config
         self.user_id = user_id
         self.profile_path = profile_path
+        self.segments = segments
+        self._live = None
+        # id del corpus di partenza sostituiti online: i loro paragrafi nell'indice dei segmenti sono vecchi
+        self._replaced = frozenset()
+        self._update_lock = threading.Lock()
+        self._params = ScoringParams.from_config(config)
+        self._base_index = index if index is not None else CorpusIndex.from_frame(df, embedding)
+        self._set_index(self._base_index)
+
+
+    def _set_index(self, index):
+        tracker = None
+        if self.config.get('incremental_similarity', False):
+            tracker = SimilarityTracker(index.unit_embedding)
+        self._state = (index, Scorer(index, self._params), tracker)
+
+
+    @property
+    def index(self):
+        """Indice corrente del corpus (CorpusIndex)"""
+        return self._state[0]
+
+
+    @property
+    def scorer(self):
+        """Scorer sull'indice corrente"""
+        return self._state[1]
+
+
+    @property
+    def similarity_tracker(self):
+        """Tracker delle similarità sull'indice corrente (None se non attivo)"""
+        return self._state[2]
 
         
     
-    def profile(self):
-        """Carica il file json relativo a un utente se trovato
+    def profile(self, user_id=None):
+        """Carica il profilo dell'utente dall'archivio dei profili se trovato
+        
+        Args:
+            user_id (int, optional): identificativo dell'utente (default self.user_id)
         
         Returns:
             dict or None: dati dell'utente se esiste oppure None    
         """
-        try:
-            filename = f"user{self.user_id}.json"
-            return load_user_model(filename, self.profile_path)
-        except FileNotFoundError:
-            return None
+        return load_user(self.user_id if user_id is None else user_id)
     
     
       
@@ -58,15 +104,41 @@ class RecommenderEngine():
         Returns:
             pd.DataFrame: catalogo filtrato dei contenuti
         """
-        self.df["id"] = self.df["id"].astype(str)
-        tol = self.config["tol"]
-        target = profile["target_readability"]
-        history = set(profile["history"])
-        df = self.df[~self.df["id"].isin(history)]
-        df = df[np.abs(df["flesch_score"] - target) <= tol]
+        index = self.index
+        candidates = index.candidates(profile["target_readability"], self.config["tol"], profile["history"])
+        if self._live is None:
+            df = self.df.iloc[candidates]
+        else:
+            # dopo aggiornamenti online le posizioni non corrispondono più alle righe di self.df
+            df = pd.DataFrame({
+                "id": index.ids[candidates],
+                "flesch_score": index.flesch[candidates],
+                "testo": index.testi[candidates] if index.testi is not None else None
+            })
         
           
         return df
+    
+    
+    def document_positions(self):
+        """Mappa id documento -> posizione nel DataFrame (calcolata una sola volta)
+        
+        Returns:
+            Mapping[str, int]: posizione di ogni documento (in sola lettura)
+        """
+        return self.index.positions
+    
+    
+    def history_positions(self, profile):
+        """Posizioni nel corpus dei documenti già letti dall'utente
+        
+        Args:
+            profile (dict): dati utente
+        
+        Returns:
+            np.ndarray: posizioni dei documenti della history (costo proporzionale alla history)
+        """
+        return self.index.history_positions(profile["history"])
 
     
     
@@ -81,14 +153,57 @@ class RecommenderEngine():
         Returns:
             tuple [str, list[list[float]]]: 
                 -testo del documento
-                -embedding del testo sottoforma di lista di vettori
+                -embedding del testo (normalizzato) sottoforma di vettore
         """
-        idx = self.df.index[self.df["id"] == doc_id][0]
-        testo = self.df.loc[idx, "testo"]
-        emb = self.embedding[idx]
+        index = self.index
+        idx = index.position(doc_id)
+        if idx is None:
+            raise ValueError("Documento non trovato")
+        testo = index.testi[idx] if index.testi is not None else self.df["testo"].iloc[idx]
+        emb = np.asarray(index.unit_embedding[idx])
         return testo, emb
     
 
+    def get_document_embedding(self, doc_id):
+        """Embedding (normalizzato) di un documento dell'indice corrente
+            (compresi i documenti aggiunti o sostituiti online)
+        
+        Args:
+            doc_id (str): identificativo del documento
+        
+        Returns:
+            np.ndarray: embedding del documento
+        
+        Raises:
+            ValueError: se il documento non esiste
+        """
+        index = self.index
+        idx = index.position(doc_id)
+        if idx is None:
+            raise ValueError(f"documento non trovato: {doc_id}")
+        return np.asarray(index.unit_embedding[idx])
+    
+    
+    def get_document_embeddings(self, doc_ids):
+        """Embedding (normalizzati) di più documenti dell'indice corrente con un'unica indicizzazione
+        
+        Args:
+            doc_ids (list[str]): identificativi dei documenti
+        
+        Returns:
+            np.ndarray: matrice len(doc_ids) x D degli embedding, nello stesso ordine
+        
+        Raises:
+            ValueError: se uno dei documenti non esiste
+        """
+        index = self.index
+        idx = [index.position(doc_id) for doc_id in doc_ids]
+        missing = [doc_id for doc_id, pos in zip(doc_ids, idx) if pos is None]
+        if missing:
+            raise ValueError(f"documenti non trovati: {missing}")
+        return np.asarray(index.unit_embedding[idx])
+    
+
     def get_flesch(self, doc_id):
         """Prendere il punteggio flesch di un testo dato il suo id
         
@@ -101,10 +216,10 @@ class RecommenderEngine():
         Raises:
             ValueError: se il valore dell'id del documento passato come parametro non coincide/esiste nel file
         """
-        idx = self.df.index[self.df["id"] == doc_id]
-        if len(idx) == 0:
+        idx = self.index.position(doc_id)
+        if idx is None:
             raise ValueError("Documento non trovato")
-        return float(self.df.loc[idx[0], "flesch_score"])
+        return float(self.index.flesch[idx])
     
 
     def gap_readability(self, user, flesch):
@@ -197,47 +312,231 @@ class RecommenderEngine():
         return score, flesch        
 
 
+    def similarity_scores(self, user, scorer=None):
+        """Similarità coseno fra il topic vector dell'utente e tutti i documenti
+            (mantenute in modo incrementale se il tracker delle similarità è attivo)
+        
+        Args:
+            user(dict): dizionario contenente i dati dell'utente
+            scorer(Scorer, optional): scorer con cui verranno usate (default quello corrente);
+                                      le similarità sono calcolate sullo stesso indice
+        
+        Returns:
+            np.ndarray: vettore N delle similarità
+        """
+        index, current, tracker = self._state
+        if scorer is None:
+            scorer = current
+        if tracker is not None and scorer is current:
+            return tracker.similarities(user)
+        return scorer.similarities(user)
+    
+    
+    def observe_feedback(self, user, doc_id, difficulty):
+        """Aggiorna le similarità tracciate dopo update_user_model
+        
+        Args:
+            user(dict): dizionario contenente i dati dell'utente già aggiornati
+            doc_id(str): identificativo del documento letto
+            difficulty(int): difficoltà espressa dall'utente (1-5)
+        
+        Returns:
+            bool: True se le similarità sono state aggiornate in modo incrementale
+        """
+        index, _, tracker = self._state
+        if tracker is None:
+            return False
+        pos = index.position(doc_id)
+        if pos is None:
+            return False
+        return tracker.update(user, pos, difficulty_to_alpha(difficulty))
+    
+    
     def rank_top_k(self, user):
         """Raccomandare e classificare i top k documenti 
+            lo score è lo stesso di recommender() calcolato in forma vettoriale su tutto il catalogo
         
         Args:
             user(dict): dizionario contenente i dati dell'utente
             
         Returns:
-            tuple[list[str], list[float], list[str]]: 
+            tuple[list[str], list[float], list[str], list[float]]: 
             - lista degli ID dei documenti migliori
             - lista dei punteggi di raccomandazione corrispondenti, arrotondati a 6 decimali
             - lista dei testi dei documenti raccomandati
+            - lista dei punteggi flesch dei documenti raccomandati
         """
-        config = self.config
-        k = config['k']
-        profile = user
-        catalog = self.catalog(profile)
+        scorer = self.scorer
+        positions, scores = scorer.top_k(user, sims=self.similarity_scores(user, scorer))
+        return scorer.to_rank(positions, scores)
+    
+    
+    def rank(self, user):
+        """Classifica completa dei documenti candidati, da leggere a pagine
+            lo score è calcolato una sola volta, ordinamento e testi sono letti solo su richiesta
         
-        scores = []
-        titles = []
-        testi = []
-
+        Args:
+            user(dict): dizionario contenente i dati dell'utente
+            
+        Returns:
+            RankingResult: classifica con pagine di config['k'] documenti
+        """
+        scorer = self.scorer
+        candidates, scores = scorer.score(user, sims=self.similarity_scores(user, scorer))
+        return RankingResult(scorer.index, candidates, scores, page_size=self.config['k'])
+    
+    
+    def rank_top_k_batch(self, users):
+        """Raccomandare e classificare i top k documenti per più utenti
+            le similarità sono calcolate a blocchi con un unico prodotto matriciale
+        
+        Args:
+            users(list[dict]): dati degli utenti
+            
+        Returns:
+            list[tuple]: risultato di rank_top_k per ogni utente, nello stesso ordine
+        """
+        scorer = self.scorer
+        return [scorer.to_rank(positions, scores) for positions, scores in scorer.top_k_batch(list(users))]
+    
+    
+    
+    def unit_embedding(self):
+        """Matrice degli embedding dei documenti normalizzati (calcolata una sola volta)
+        
+        Returns:
+            np.ndarray: matrice N x D float32 con righe a norma unitaria (in sola lettura)
+        """
+        return self.index.unit_embedding
+    
+    
+    def add_documents(self, ids, flesch, embeddings, testi=None):
+        """Aggiunge (o sostituisce) documenti nell'indice senza ricostruirlo
         
-        for doc_id in catalog['id'].tolist():
-            score, flesch = self.recommender(user, doc_id)
-            scores.append((doc_id, score, flesch))
-                               
-        scores.sort(key=lambda x: x[1], reverse=True)
-        top_scores = scores[:k]
+        Args:
+            ids(list[str]): id dei documenti
+            flesch(array-like[float]): punteggi flesch dei documenti
+            embeddings(array-like): matrice M x D degli embedding dei documenti
+            testi(list[str], optional): testi dei documenti
         
-        titles = [item[0] for item in top_scores]
-        scores_only = [item[1] for item in top_scores]
-        flesch_values = [round(item[2], 2) for item in top_scores]
-        scores_only = np.round(scores_only, 6)
+        Returns:
+            CorpusIndex: nuovo indice corrente
+        """
+        with self._update_lock:
+            if self._live is None:
+                self._live = LiveCorpusIndex(self.index)
+            # prima del nuovo indice: rank_segments non vede mai il documento nuovo con i paragrafi vecchi
+            replaced = {str(doc_id) for doc_id in ids if self._base_index.position(doc_id) is not None}
+            if replaced:
+                self._replaced = self._replaced | replaced
+            index = self._live.add_documents(ids, flesch, embeddings, testi)
+            self._set_index(index)
+        return index
+    
+    
+    def remove_documents(self, ids):
+        """Rimuove documenti dall'indice: non vengono più raccomandati
         
-        for doc_id in titles:
-            testo,_ = self.get_document(doc_id)
-            testi.append(testo)
+        Args:
+            ids(list[str]): id dei documenti
         
+        Returns:
+            CorpusIndex: nuovo indice corrente
+        """
+        with self._update_lock:
+            if self._live is None:
+                self._live = LiveCorpusIndex(self.index)
+            index = self._live.remove_documents(ids)
+            self._set_index(index)
+        return index
+    
+    
+    def compact_documents(self):
+        """Elimina dall'indice i documenti rimossi (avviene anche in automatico oltre una soglia)
         
-        return titles, scores_only, testi, flesch_values
+        Returns:
+            CorpusIndex: nuovo indice corrente
+        """
+        with self._update_lock:
+            if self._live is None:
+                return self.index
+            index = self._live.compact()
+            self._set_index(index)
+        return index
+    
     
+    def rank_segments(self, user, segments=None, k=None):
+        """Raccomandare e classificare i top k paragrafi
+            I paragrafi vengono presi dall'indice dei segmenti (ordinato per flesch)
+            con una ricerca binaria sulla finestra di tolleranza dell'utente, lo score
+            è lo stesso dei documenti interi usando l'embedding del documento di origine.
+            L'indice dei paragrafi si riferisce al corpus con cui è stato creato il motore:
+            i documenti rimossi o sostituiti online vengono esclusi, quelli aggiunti online non hanno paragrafi
+        
+        Args:
+            user(dict): dizionario contenente i dati dell'utente
+            segments(dict[str, np.ndarray], optional): indice dei paragrafi creato da build_segment_index
+                                                       (default quello passato al costruttore)
+            k(int, optional): numero di paragrafi da restituire (default config['k'])
+            
+        Returns:
+            tuple[list[str], list[float], list[str], list[float]]: 
+            - lista degli ID dei documenti di origine
+            - lista dei punteggi di raccomandazione, arrotondati a 6 decimali
+            - lista dei testi dei paragrafi
+            - lista dei punteggi flesch dei paragrafi
+        
+        Raises:
+            ValueError: se l'indice dei paragrafi non è disponibile
+        """
+        segments = self.segments if segments is None else segments
+        if segments is None:
+            raise ValueError("indice dei paragrafi non disponibile")
+        config = self.config
+        k = config['k'] if k is None else k
+        tol = config['tol']
+        target = user['target_readability']
+        
+        flesch = segments['flesch']
+        lo = np.searchsorted(flesch, target - tol, side="left")
+        hi = np.searchsorted(flesch, target + tol, side="right")
+        
+        base = self._base_index
+        ids = base.ids
+        docs = segments['doc'][lo:hi]
+        seen = np.zeros(len(ids), dtype=bool)
+        seen[base.history_positions(user["history"])] = True
+        if self._live is not None:
+            replaced, index = self._replaced, self.index
+            seen[[
+                doc for doc in np.unique(docs)
+                if str(ids[doc]) in replaced or index.position(ids[doc]) is None
+            ]] = True
+        keep = ~seen[docs]
+        rows = np.arange(lo, hi)[keep]
+        docs = docs[keep]
+        if len(rows) == 0:
+            return [], np.array([]), [], []
+        
+        topic_vector = np.asarray(user['topic_vector'], dtype=np.float32)
+        topic_vector = topic_vector / np.linalg.norm(topic_vector)
+        unique_docs, inverse = np.unique(docs, return_inverse=True)
+        sims = (base.unit_embedding[unique_docs] @ topic_vector)[inverse]
+        
+        seg_flesch = flesch[rows].astype(np.float64)
+        gap = np.abs(target - seg_flesch)
+        penalty = np.where(seg_flesch > target, 1 + config['alpha'], 1)
+        scores = config['eta'] * sims - config['zeta'] * gap * penalty
+        
+        top = np.argsort(-scores, kind="stable")[:k]
+        
+        titles = [ids[docs[i]] for i in top]
+        testi = []
+        for i in top:
+            testo = base.testi[docs[i]] if base.testi is not None else self.df["testo"].iloc[docs[i]]
+            testi.append(testo[segments['start'][rows[i]]:segments['end'][rows[i]]])
+        
+        return titles, np.round(scores[top], 6), testi, [round(float(seg_flesch[i]), 2) for i in top]
     
     
     def rank_to_df(self, user):
@@ -0,0 +1,141 @@
+from typing import NamedTuple
+
+import numpy as np
+
+
+class ScoringParams(NamedTuple):
+    """Parametri dello score di raccomandazione"""
+    eta: float
+    zeta: float
+    alpha: float
+    tol: float
+    k: int
+
+    @classmethod
+    def from_config(cls, config):
+        """Legge i parametri dalla configurazione
+
+        Args:
+            config (dict): parametri di configurazione (eta, zeta, alpha, tol, k)
+
+        Returns:
+            ScoringParams: parametri dello score
+        """
+        return cls(config['eta'], config['zeta'], config['alpha'], config['tol'], config['k'])
+
+
+class Scorer:
+    """Calcolo dello score di raccomandazione senza stato per richiesta
+
+    Legge solo l'indice immutabile del corpus e i parametri: il contesto
+    dell'utente (topic vector, target readability, history) arriva come
+    argomento, quindi la stessa istanza può servire richieste concorrenti.
+    Lo score è quello di RecommenderEngine.recommender():
+        eta * sim - zeta * |target - flesch| * (1 + alpha se flesch > target)
+    """
+    def __init__(self, index, params):
+        """Inizializza lo scorer
+
+        Args:
+            index (CorpusIndex): indice del corpus
+            params (ScoringParams): parametri dello score
+        """
+        self.index = index
+        self.params = params
+
+
+    def similarities(self, user):
+        """Similarità coseno fra il topic vector dell'utente e tutti i documenti
+
+        Args:
+            user (dict): dati dell'utente
+
+        Returns:
+            np.ndarray: vettore N delle similarità
+        """
+        topic_vector = np.asarray(user['topic_vector'], dtype=np.float32)
+        return self.index.unit_embedding @ (topic_vector / np.linalg.norm(topic_vector))
+
+
+    def score(self, user, sims=None):
+        """Score dei documenti candidati dell'utente
+
+        Args:
+            user (dict): dati dell'utente
+            sims (np.ndarray, optional): similarità già calcolate su tutto il corpus
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: posizioni dei candidati e relativi score
+        """
+        params = self.params
+        target = user['target_readability']
+        candidates = self.index.candidates(target, params.tol, user.get('history', ()))
+
+        if sims is None:
+            sims = self.similarities(user)
+        flesch = self.index.flesch[candidates]
+        gap = np.abs(target - flesch)
+        penalty = np.where(flesch > target, 1 + params.alpha, 1)
+        scores = params.eta * sims[candidates] - params.zeta * gap * penalty
+        return candidates, scores
+
+
+    def top_k(self, user, k=None, sims=None):
+        """Top k documenti per un utente
+
+        Args:
+            user (dict): dati dell'utente
+            k (int, optional): numero di documenti (default params.k)
+            sims (np.ndarray, optional): similarità già calcolate su tutto il corpus
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: posizioni e score dei documenti in ordine di score
+        """
+        k = self.params.k if k is None else k
+        candidates, scores = self.score(user, sims)
+        top = np.argsort(-scores, kind="stable")[:k]
+        return candidates[top], scores[top]
+
+
+    def top_k_batch(self, users, k=None, chunk_size=256):
+        """Top k documenti per più utenti, con le similarità calcolate a blocchi
+            da un unico prodotto matriciale invece di uno per utente
+
+        Args:
+            users (list[dict]): dati degli utenti
+            k (int, optional): numero di documenti (default params.k)
+            chunk_size (int): utenti per prodotto matriciale
+
+        Returns:
+            list[tuple[np.ndarray, np.ndarray]]: posizioni e score per ogni utente, nello stesso ordine
+        """
+        results = []
+        for start in range(0, len(users), chunk_size):
+            chunk = users[start:start + chunk_size]
+            vectors = np.asarray([user['topic_vector'] for user in chunk], dtype=np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            sims = self.index.unit_embedding @ vectors.T
+            for j, user in enumerate(chunk):
+                results.append(self.top_k(user, k, sims[:, j]))
+        return results
+
+
+    def to_rank(self, positions, scores):
+        """Converte posizioni e score nel formato di RecommenderEngine.rank_top_k
+
+        Args:
+            positions (np.ndarray): posizioni dei documenti
+            scores (np.ndarray): score dei documenti
+
+        Returns:
+            tuple[list[str], list[float], list[str], list[float]]:
+            - lista degli ID dei documenti
+            - lista dei punteggi arrotondati a 6 decimali
+            - lista dei testi dei documenti
+            - lista dei punteggi flesch dei documenti
+        """
+        index = self.index
+        titles = index.ids[positions].tolist()
+        testi = index.testi[positions].tolist() if index.testi is not None else [None] * len(positions)
+        flesch_values = [round(float(value), 2) for value in index.flesch[positions]]
+        return titles, np.round(scores, 6), testi, flesch_values
@@ -0,0 +1,142 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SimilarityTracker:
+    """Mantiene in modo incrementale le similarità coseno fra gli utenti attivi e il corpus
+
+    update_topic_vector calcola v' = normalize((1 - a) * v + a * e_d), quindi i prodotti
+    scalari con i documenti normalizzati X sono
+        X v' = ((1 - a) * X v + a * X e_d) / ||(1 - a) * v + a * e_d||
+    dove X e_d è la riga documento-documento di e_d (calcolata una volta e messa in cache)
+    e la norma si ricava da ||v||, dal prodotto scalare già noto v . e_d e da ||e_d|| = 1.
+    Dopo un feedback il vettore delle similarità si aggiorna in O(N) invece di O(N x D).
+    """
+    def __init__(self, unit_embedding, max_users=1000, max_rows=2048):
+        """Inizializza il tracker
+
+        Args:
+            unit_embedding (np.ndarray): matrice N x D degli embedding normalizzati del corpus
+            max_users (int): numero massimo di utenti tracciati (LRU)
+            max_rows (int): numero massimo di righe documento-documento in cache (LRU)
+        """
+        self.unit_embedding = unit_embedding
+        self.max_users = max_users
+        self.max_rows = max_rows
+
+        self._users = OrderedDict()
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.full_computations = 0
+        self.incremental_updates = 0
+
+
+    def _touch(self, cache, key, value, limit):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > limit:
+            cache.popitem(last=False)
+
+
+    def doc_row(self, doc_pos):
+        """Similarità fra un documento e tutto il corpus
+
+        Args:
+            doc_pos (int): posizione del documento nel corpus
+
+        Returns:
+            np.ndarray: vettore N delle similarità coseno documento-documento
+        """
+        with self._lock:
+            row = self._rows.get(doc_pos)
+            if row is not None:
+                self._rows.move_to_end(doc_pos)
+                return row
+
+        row = self.unit_embedding @ self.unit_embedding[doc_pos]
+        with self._lock:
+            self._touch(self._rows, doc_pos, row, self.max_rows)
+        return row
+
+
+    def similarities(self, user):
+        """Similarità coseno fra il topic vector dell'utente e tutti i documenti
+
+        Se il vettore dell'utente coincide con quello tracciato restituisce le
+        similarità mantenute, altrimenti le ricalcola sull'intera matrice.
+
+        Args:
+            user (dict): dati dell'utente (user_id, topic_vector)
+
+        Returns:
+            np.ndarray: vettore N delle similarità coseno
+        """
+        vector = np.asarray(user['topic_vector'], dtype=np.float64)
+        user_id = user['user_id']
+
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and np.array_equal(entry[0], vector):
+                self._users.move_to_end(user_id)
+                return entry[1] / np.linalg.norm(vector)
+
+        dots = (self.unit_embedding @ vector.astype(self.unit_embedding.dtype)).astype(np.float64)
+        with self._lock:
+            self.full_computations += 1
+            self._touch(self._users, user_id, (vector, dots), self.max_users)
+        return dots / np.linalg.norm(vector)
+
+
+    def update(self, user, doc_pos, alpha):
+        """Aggiorna le similarità tracciate dopo un feedback
+
+        Va chiamato dopo update_topic_vector con il profilo già aggiornato: se il
+        vettore ottenuto incrementalmente non coincide con quello del profilo (es.
+        utente non tracciato o aggiornato altrove) l'utente viene rimosso e le
+        similarità saranno ricalcolate alla prossima richiesta.
+
+        Args:
+            user (dict): dati dell'utente con il topic vector aggiornato
+            doc_pos (int): posizione nel corpus del documento letto
+            alpha (float): peso dell'aggiornamento (difficulty_to_alpha)
+
+        Returns:
+            bool: True se l'aggiornamento incrementale è riuscito
+        """
+        user_id = user['user_id']
+        with self._lock:
+            entry = self._users.pop(user_id, None)
+        if entry is None:
+            return False
+
+        old_vector, old_dots = entry
+        doc = self.unit_embedding[doc_pos].astype(np.float64)
+        mixed = (1 - alpha) * old_vector + alpha * doc
+        norm = np.linalg.norm(mixed)
+        new_vector = np.asarray(user['topic_vector'], dtype=np.float64)
+        if not np.allclose(mixed / norm, new_vector, atol=1e-5):
+            return False
+
+        dots = ((1 - alpha) * old_dots + alpha * self.doc_row(doc_pos)) / norm
+        with self._lock:
+            self.incremental_updates += 1
+            self._touch(self._users, user_id, (new_vector, dots), self.max_users)
+        return True
+
+
+    def stats(self):
+        """Statistiche del tracker
+
+        Returns:
+            dict: utenti tracciati, righe in cache, ricalcoli completi e aggiornamenti incrementali
+        """
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "rows": len(self._rows),
+                "full_computations": self.full_computations,
+                "incremental_updates": self.incremental_updates
+            }
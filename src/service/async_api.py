@@ -0,0 +1,187 @@
+import asyncio
+import os
+import sys
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.user import model_user
+
+
+class AsyncRecommender:
+    """API asyncio per raccomandazioni e feedback sopra il motore bloccante
+
+    Lo scoring (numpy, CPU) gira su un pool di thread limitato, le letture e
+    scritture dei profili (cache, SQLite, log degli eventi) su un pool separato:
+    l'event loop non si blocca mai e le connessioni inattive non occupano thread.
+    Se è presente un MicroBatchScheduler il ranking viene atteso direttamente sul
+    suo Future senza occupare thread.
+    """
+    def __init__(self, engine, cpu_workers=None, io_workers=8, batcher=None):
+        """Inizializza l'API
+
+        Args:
+            engine (RecommenderEngine): motore di raccomandazione già caricato
+            cpu_workers (int, optional): thread per lo scoring (default numero di CPU)
+            io_workers (int): thread per l'I/O dei profili
+            batcher (MicroBatchScheduler, optional): scheduler a micro-batch per il ranking
+        """
+        self.engine = engine
+        self.batcher = batcher
+        self._cpu = ThreadPoolExecutor(max_workers=cpu_workers or os.cpu_count() or 1, thread_name_prefix="async-cpu")
+        self._io = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="async-io")
+        self._user_locks = weakref.WeakValueDictionary()
+
+
+    async def _run_cpu(self, func, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._cpu, partial(func, *args, **kwargs))
+
+
+    async def _run_io(self, func, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._io, partial(func, *args, **kwargs))
+
+
+    def _user_lock(self, user_id):
+        # i lock asyncio sono legati all'event loop: creati e usati solo dal loop,
+        # rimossi automaticamente quando nessuna coroutine li usa più
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            lock = self._user_locks[user_id] = asyncio.Lock()
+        return lock
+
+
+    async def rank_top_k(self, user, k=None):
+        """Top k documenti per un utente (come RecommenderEngine.rank_top_k)
+
+        Args:
+            user (dict): dati dell'utente
+            k (int, optional): numero di documenti (default config['k'])
+
+        Returns:
+            tuple[list[str], list[float], list[str], list[float]]: id, score, testi e flesch dei documenti
+        """
+        scorer = self.engine.scorer
+        if self.batcher is not None:
+            positions, scores = await asyncio.wrap_future(self.batcher.submit(user, k, scorer=scorer))
+        else:
+            positions, scores = await self._run_cpu(
+                lambda: scorer.top_k(user, k, sims=self.engine.similarity_scores(user, scorer))
+            )
+        return scorer.to_rank(positions, scores)
+
+
+    async def rank_to_df(self, user):
+        """Top k documenti per un utente come pandas.DataFrame (come RecommenderEngine.rank_to_df)
+
+        Args:
+            user (dict): dati dell'utente
+
+        Returns:
+            pandas.DataFrame: title, score, testo e flesch_score dei documenti raccomandati
+        """
+        return await self._run_cpu(self.engine.rank_to_df, user)
+
+
+    async def load_user(self, user_id):
+        """Carica un profilo utente (model_user.load_user)
+
+        Args:
+            user_id (int): identificativo dell'utente
+
+        Returns:
+            dict or None: dati dell'utente oppure None se non esiste
+        """
+        return await self._run_io(model_user.load_user, user_id)
+
+
+    async def load_users(self, user_ids):
+        """Carica più profili utente (model_user.load_users)
+
+        Args:
+            user_ids (iterable[int]): identificativi degli utenti
+
+        Returns:
+            dict[int, dict]: profili trovati indicizzati per user_id
+        """
+        return await self._run_io(model_user.load_users, list(user_ids))
+
+
+    async def save_user(self, user):
+        """Salva un profilo utente (model_user.save_user)
+
+        Args:
+            user (dict): dati dell'utente
+        """
+        await self._run_io(model_user.save_user, user)
+
+
+    async def save_users(self, users):
+        """Salva più profili utente con un'unica scrittura (model_user.save_users)
+
+        Args:
+            users (iterable[dict]): profili degli utenti
+        """
+        await self._run_io(model_user.save_users, list(users))
+
+
+    async def update_user_model(self, user, doc_id, doc_readability, difficulty):
+        """Aggiorna il profilo con un feedback (model_user.update_user_model) e le similarità tracciate
+
+        I feedback dello stesso utente sono serializzati da un lock asyncio per utente.
+
+        Args:
+            user (dict): dati dell'utente
+            doc_id (str): identificativo del documento letto
+            doc_readability (float): punteggio flesch del documento
+            difficulty (int): difficoltà percepita (1-5)
+
+        Returns:
+            dict: profilo aggiornato
+        """
+        async with self._user_lock(user["user_id"]):
+            return await self._update(user, doc_id, doc_readability, difficulty)
+
+
+    async def _update(self, user, doc_id, doc_readability, difficulty):
+        # da chiamare con il lock dell'utente acquisito
+        # embedding dall'indice corrente del motore: vede i documenti aggiunti o sostituiti online
+        doc_embedding = self.engine.get_document_embedding(doc_id)
+        user = await self._run_io(model_user.update_user_model, user, doc_id, doc_readability, difficulty,
+                                  doc_embedding=doc_embedding)
+        # l'aggiornamento delle similarità tracciate è calcolo: fuori dall'event loop
+        await self._run_cpu(self.engine.observe_feedback, user, doc_id, difficulty)
+        return user
+
+
+    async def feedback(self, user_id, doc_id, difficulty):
+        """Registra un feedback a partire dagli identificativi di utente e documento
+
+        Args:
+            user_id (int): identificativo dell'utente
+            doc_id (str): identificativo del documento letto
+            difficulty (int): difficoltà percepita (1-5)
+
+        Returns:
+            dict: profilo aggiornato
+
+        Raises:
+            LookupError: se l'utente o il documento non esistono
+        """
+        if self.engine.index.position(doc_id) is None:
+            raise LookupError(f"documento non trovato: {doc_id}")
+        # il profilo è letto sotto il lock: due feedback concorrenti non partono dalla stessa versione
+        async with self._user_lock(user_id):
+            user = await self.load_user(user_id)
+            if user is None:
+                raise LookupError(f"utente non trovato: {user_id}")
+            return await self._update(user, str(doc_id), self.engine.get_flesch(doc_id), difficulty)
+
+
+    def close(self):
+        """Ferma i pool di thread"""
+        self._cpu.shutdown(wait=True)
+        self._io.shutdown(wait=True)
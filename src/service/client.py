@@ -0,0 +1,133 @@
+import argparse
+import http.client
+import json
+import time
+from urllib.parse import quote, urlencode
+
+
+class RecommendationClient:
+    """Client del server delle raccomandazioni su una connessione HTTP persistente
+
+    Una connessione serve una richiesta alla volta: usare un client per thread.
+    """
+    def __init__(self, host="127.0.0.1", port=8765, timeout=5.0):
+        """Inizializza il client
+
+        Args:
+            host (str): indirizzo del server
+            port (int): porta del server
+            timeout (float): timeout in secondi di ogni richiesta
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._conn = None
+
+
+    def _request(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                response = self._conn.getresponse()
+                data = json.loads(response.read() or b"null")
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # connessione keep-alive chiusa dal server: si riapre una volta
+                self.close()
+                if attempt:
+                    raise
+
+        if response.status != 200:
+            raise RuntimeError(f"{method} {path}: {response.status} {data.get('error') if data else ''}")
+        return data
+
+
+    def recommend(self, user_id, k=None, with_text=False):
+        """Top k documenti per un utente
+
+        Args:
+            user_id (int): identificativo dell'utente
+            k (int, optional): numero di documenti
+            with_text (bool): se True include il testo dei documenti
+
+        Returns:
+            dict: risposta del server (user_id, recommendations)
+        """
+        query = {"user_id": user_id}
+        if k is not None:
+            query["k"] = k
+        if with_text:
+            query["text"] = 1
+        return self._request("GET", "/recommend?" + urlencode(query))
+
+
+    def feedback(self, user_id, doc_id, difficulty):
+        """Invia il feedback di un utente su un documento
+
+        Args:
+            user_id (int): identificativo dell'utente
+            doc_id (str): identificativo del documento
+            difficulty (int): difficoltà percepita (1-5)
+
+        Returns:
+            dict: profilo aggiornato (user_id, target_readability, history)
+        """
+        return self._request("POST", "/feedback", {"user_id": user_id, "doc_id": doc_id, "difficulty": difficulty})
+
+
+    def document(self, doc_id):
+        """Testo di un documento
+
+        Args:
+            doc_id (str): identificativo del documento
+
+        Returns:
+            dict: id, flesch_score e testo del documento
+        """
+        return self._request("GET", "/documents/" + quote(str(doc_id), safe=""))
+
+
+    def health(self):
+        """Stato del server
+
+        Returns:
+            dict: stato e numero di documenti caricati
+        """
+        return self._request("GET", "/health")
+
+
+    def close(self):
+        """Chiude la connessione"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Client di prova del server delle raccomandazioni (localhost)")
+    parser.add_argument("user_id", type=int)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--requests", type=int, default=100)
+    args = parser.parse_args()
+
+    client = RecommendationClient(args.host, args.port)
+    print(client.health())
+
+    first = client.recommend(args.user_id)
+    for item in first["recommendations"]:
+        print(f" {item['id']:<40} {item['score']:.4f} {item['flesch_score']:.2f}")
+
+    latencies = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        client.recommend(args.user_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(f" {args.requests} richieste: p50 {latencies[len(latencies) // 2]:.2f} ms, p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f} ms")
+    client.close()
@@ -0,0 +1,431 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from utils.io_utils import load_yaml
+from src.user.model_user import load_user, update_user_model, enable_write_behind, enable_event_log
+from src.recommender.batch_scheduler import MicroBatchScheduler
+
+
+class RecommendationService:
+    """Operazioni esposte dal server sopra un unico motore di raccomandazione
+
+    Il motore (indice del corpus e scorer) è condiviso in sola lettura fra i
+    thread; i feedback dello stesso utente sono serializzati da un lock per
+    utente (a strisce) perché aggiornano lo stesso profilo in cache, e le
+    letture del profilo prendono lo stesso lock per non vederne uno a metà.
+    """
+    def __init__(self, engine=None, lock_stripes=64, batcher=None, registry=None):
+        """Inizializza il servizio
+
+        Args:
+            engine (RecommenderEngine, optional): motore di raccomandazione già caricato
+            lock_stripes (int): numero di lock usati per serializzare i feedback per utente
+            batcher (MicroBatchScheduler, optional): se presente le richieste di ranking
+                                                     vengono valutate in micro-batch
+            registry (EngineRegistry, optional): registro del motore corrente (al posto di engine),
+                                                 per servire un nuovo corpus senza riavviare
+        """
+        if (engine is None) == (registry is None):
+            raise ValueError("indicare engine oppure registry")
+        self._engine = engine
+        self.registry = registry
+        self.batcher = batcher
+        self._user_locks = [threading.Lock() for _ in range(lock_stripes)]
+
+
+    @property
+    def engine(self):
+        """Motore corrente"""
+        return self._engine if self.registry is None else self.registry.current()
+
+
+    def _acquire(self):
+        # con il registro la richiesta resta sul motore con cui è iniziata anche se viene sostituito
+        return nullcontext(self._engine) if self.registry is None else self.registry.acquire()
+
+
+    def _user_lock(self, user_id):
+        return self._user_locks[hash(user_id) % len(self._user_locks)]
+
+
+    def recommend(self, user_id, k=None, with_text=False):
+        """Top k documenti per un utente
+
+        Args:
+            user_id (int): identificativo dell'utente
+            k (int, optional): numero di documenti (default config['k'])
+            with_text (bool): se True include il testo dei documenti
+
+        Returns:
+            dict: user_id e lista dei documenti raccomandati (id, score, flesch_score[, testo])
+
+        Raises:
+            LookupError: se l'utente non esiste
+        """
+        with self._user_lock(user_id):
+            user = load_user(user_id)
+        if user is None:
+            raise LookupError(f"utente non trovato: {user_id}")
+
+        with self._acquire() as engine:
+            scorer = engine.scorer
+            if self.batcher is not None:
+                positions, scores = self.batcher.submit(user, k, scorer=scorer).result()
+            else:
+                positions, scores = scorer.top_k(user, k=k, sims=engine.similarity_scores(user, scorer))
+            titles, scores, testi, flesch = scorer.to_rank(positions, scores)
+
+        items = []
+        for i, title in enumerate(titles):
+            item = {"id": title, "score": float(scores[i]), "flesch_score": flesch[i]}
+            if with_text:
+                item["testo"] = testi[i]
+            items.append(item)
+        return {"user_id": user_id, "recommendations": items}
+
+
+    def segments(self, user_id, k=None):
+        """Top k paragrafi per un utente (indice dei paragrafi creato dalla pipeline)
+
+        Args:
+            user_id (int): identificativo dell'utente
+            k (int, optional): numero di paragrafi (default config['k'])
+
+        Returns:
+            dict: user_id e lista dei paragrafi raccomandati (id del documento, score, flesch_score, testo)
+
+        Raises:
+            LookupError: se l'utente non esiste o l'indice dei paragrafi non è disponibile
+        """
+        with self._user_lock(user_id):
+            user = load_user(user_id)
+        if user is None:
+            raise LookupError(f"utente non trovato: {user_id}")
+
+        with self._acquire() as engine:
+            if engine.segments is None:
+                raise LookupError("indice dei paragrafi non disponibile")
+            titles, scores, testi, flesch = engine.rank_segments(user, k=k)
+
+        items = [
+            {"id": title, "score": float(scores[i]), "flesch_score": flesch[i], "testo": testi[i]}
+            for i, title in enumerate(titles)
+        ]
+        return {"user_id": user_id, "segments": items}
+
+
+    def feedback(self, user_id, doc_id, difficulty):
+        """Registra il feedback di un utente su un documento e aggiorna il profilo
+
+        Args:
+            user_id (int): identificativo dell'utente
+            doc_id (str): identificativo del documento letto
+            difficulty (int): difficoltà percepita (1-5)
+
+        Returns:
+            dict: user_id, nuova target readability e lunghezza della history
+
+        Raises:
+            LookupError: se l'utente o il documento non esistono
+            ValueError: se la difficoltà non è fra 1 e 5
+        """
+        if difficulty not in (1, 2, 3, 4, 5):
+            raise ValueError(f"difficoltà non valida: {difficulty}")
+        with self._acquire() as engine, self._user_lock(user_id):
+            if engine.index.position(doc_id) is None:
+                raise LookupError(f"documento non trovato: {doc_id}")
+            user = load_user(user_id)
+            if user is None:
+                raise LookupError(f"utente non trovato: {user_id}")
+            doc_readability = engine.get_flesch(doc_id)
+            # embedding dal motore della richiesta: vede i documenti aggiunti o sostituiti online
+            update_user_model(user, str(doc_id), doc_readability, difficulty,
+                              doc_embedding=engine.get_document_embedding(doc_id))
+            engine.observe_feedback(user, doc_id, difficulty)
+            return {
+                "user_id": user_id,
+                "target_readability": user["target_readability"],
+                "history": len(user["history"])
+            }
+
+
+    def document(self, doc_id):
+        """Testo e punteggio flesch di un documento
+
+        Args:
+            doc_id (str): identificativo del documento
+
+        Returns:
+            dict: id, flesch_score e testo del documento
+
+        Raises:
+            LookupError: se il documento non esiste
+        """
+        index = self.engine.index
+        pos = index.position(doc_id)
+        if pos is None:
+            raise LookupError(f"documento non trovato: {doc_id}")
+        testo = index.testi[pos] if index.testi is not None else None
+        return {"id": index.ids[pos], "flesch_score": float(index.flesch[pos]), "testo": testo}
+
+
+    def health(self):
+        """Stato del servizio
+
+        Returns:
+            dict: stato, numero di documenti e metriche del micro-batching (se attivo)
+        """
+        status = {"status": "ok", "documents": len(self.engine.index)}
+        if self.registry is not None:
+            status["engine"] = self.registry.stats()
+        if self.batcher is not None:
+            status["micro_batch"] = self.batcher.stats()
+        return status
+
+
+class ThreadPoolMixIn:
+    """Serve ogni connessione su un pool di thread di dimensione fissa
+        (a differenza di socketserver.ThreadingMixIn che crea un thread per connessione)
+
+    Al massimo max_queue connessioni attendono un worker libero: le successive
+    ricevono subito 503 invece di accumularsi in una coda senza limite.
+    """
+    workers = 8
+    max_queue = 64
+    overloaded_response = (
+        b"HTTP/1.1 503 Service Unavailable\r\n"
+        b"Content-Type: application/json\r\n"
+        b"Content-Length: 31\r\n"
+        b"Retry-After: 1\r\n"
+        b"Connection: close\r\n\r\n"
+        b'{"error":"server sovraccarico"}'
+    )
+
+    def process_request_thread(self, request, client_address):
+        with self._queue_lock:
+            self._queued -= 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+    def process_request(self, request, client_address):
+        if getattr(self, "_pool", None) is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="http")
+            self._queue_lock = threading.Lock()
+            self._queued = 0
+        with self._queue_lock:
+            full = self._queued >= self.max_queue
+            if not full:
+                self._queued += 1
+        if full:
+            self._reject(request)
+            return
+        self._pool.submit(self.process_request_thread, request, client_address)
+
+
+    def _reject(self, request):
+        try:
+            request.sendall(self.overloaded_response)
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+
+    def busy(self):
+        """True se ci sono connessioni in attesa di un worker"""
+        return getattr(self, "_queued", 0) > 0
+
+
+    def server_close(self):
+        super().server_close()
+        pool = getattr(self, "_pool", None)
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+class RecommendationServer(ThreadPoolMixIn, HTTPServer):
+    """Server HTTP delle raccomandazioni con un pool di worker"""
+    allow_reuse_address = True
+
+    def __init__(self, address, service, workers=8, max_queue=64, idle_timeout=2.0):
+        """Inizializza il server
+
+        Args:
+            address (tuple[str, int]): host e porta (porta 0 = scelta dal sistema)
+            service (RecommendationService): operazioni esposte
+            workers (int): numero di thread che servono le connessioni
+            max_queue (int): connessioni in attesa di un worker oltre le quali si risponde 503
+            idle_timeout (float): secondi dopo cui una connessione keep-alive inattiva libera il worker
+        """
+        self.service = service
+        self.workers = workers
+        self.max_queue = max_queue
+        self.idle_timeout = idle_timeout
+        super().__init__(address, RecommendationHandler)
+
+
+class RecommendationHandler(BaseHTTPRequestHandler):
+    """Endpoint JSON:
+        GET  /recommend?user_id=<id>[&k=<k>][&text=1]
+        GET  /segments?user_id=<id>[&k=<k>]
+        POST /feedback  {"user_id": .., "doc_id": .., "difficulty": ..}
+        GET  /documents/<doc_id>
+        GET  /health
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        # ogni connessione keep-alive occupa un worker: se resta inattiva lo libera dopo idle_timeout
+        self.timeout = self.server.idle_timeout
+        super().setup()
+
+
+    def log_message(self, format, *args):
+        # nessun log per richiesta: a regime sarebbe il costo dominante
+        pass
+
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.server.busy():
+            # altre connessioni aspettano un worker: questa viene chiusa dopo la risposta
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def _dispatch(self, func, *args, **kwargs):
+        try:
+            self._send_json(200, func(*args, **kwargs))
+        except LookupError as e:
+            self._send_json(404, {"error": str(e)})
+        except (ValueError, TypeError, KeyError) as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        service = self.server.service
+
+        if url.path == "/recommend":
+            def recommend():
+                k = query.get("k")
+                return service.recommend(
+                    int(query["user_id"][0]),
+                    k=int(k[0]) if k else None,
+                    with_text=query.get("text", ["0"])[0] == "1"
+                )
+            self._dispatch(recommend)
+        elif url.path == "/segments":
+            k = query.get("k")
+            self._dispatch(lambda: service.segments(int(query["user_id"][0]), k=int(k[0]) if k else None))
+        elif url.path.startswith("/documents/"):
+            self._dispatch(service.document, unquote(url.path[len("/documents/"):]))
+        elif url.path == "/health":
+            self._dispatch(service.health)
+        else:
+            self._send_json(404, {"error": f"endpoint non trovato: {url.path}"})
+
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b""
+
+        if url.path != "/feedback":
+            self._send_json(404, {"error": f"endpoint non trovato: {url.path}"})
+            return
+
+        def feedback():
+            data = json.loads(raw or b"{}")
+            return self.server.service.feedback(int(data["user_id"]), str(data["doc_id"]), int(data["difficulty"]))
+        self._dispatch(feedback)
+
+
+def create_server(host="127.0.0.1", port=8765, workers=8, engine=None, micro_batch=None,
+                  max_queue=64, idle_timeout=2.0):
+    """Crea il server con un motore di raccomandazione già caricato
+
+    Args:
+        host (str): indirizzo di ascolto
+        port (int): porta di ascolto (0 = scelta dal sistema)
+        workers (int): numero di thread che servono le connessioni
+        engine (RecommenderEngine, optional): motore da usare (default il registro di main.get_registry(),
+                                              che segue i nuovi corpus pubblicati)
+        micro_batch (dict, optional): {"window": secondi, "max_batch": n} per attivare il micro-batching
+        max_queue (int): connessioni in attesa di un worker oltre le quali si risponde 503
+        idle_timeout (float): secondi dopo cui una connessione keep-alive inattiva viene chiusa
+
+    Returns:
+        RecommendationServer: server pronto per serve_forever()
+    """
+    registry = None
+    if engine is None:
+        from main import get_registry
+        registry = get_registry()
+    batcher = None
+    if micro_batch:
+        batcher = MicroBatchScheduler(
+            (engine or registry.current()).scorer,
+            window=micro_batch.get('window', 0.002),
+            max_batch=micro_batch.get('max_batch', 64)
+        )
+    service = RecommendationService(engine, batcher=batcher, registry=registry)
+    return RecommendationServer((host, port), service, workers=workers, max_queue=max_queue, idle_timeout=idle_timeout)
+
+
+if __name__ == "__main__":
+    config = load_yaml()
+    service_config = config.get('service', {})
+
+    parser = argparse.ArgumentParser(description="Server HTTP delle raccomandazioni")
+    parser.add_argument("--host", default=service_config.get('host', "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=service_config.get('port', 8765))
+    parser.add_argument("--workers", type=int, default=service_config.get('workers', 8))
+    args = parser.parse_args()
+
+    if config.get('write_behind', {}).get('enabled', False):
+        enable_write_behind(
+            flush_interval=config['write_behind'].get('flush_interval', 1.0),
+            max_batch=config['write_behind'].get('max_batch', 500)
+        )
+    if config.get('event_log', {}).get('enabled', False):
+        enable_event_log(compact_interval=config['event_log'].get('compact_interval', 300))
+
+    start = time.perf_counter()
+    micro_batch = config.get('micro_batch', {})
+    server = create_server(args.host, args.port, args.workers,
+                           micro_batch=micro_batch if micro_batch.get('enabled', False) else None,
+                           max_queue=service_config.get('max_queue', 64),
+                           idle_timeout=service_config.get('idle_timeout', 2.0))
+    print(f" Motore caricato in {time.perf_counter() - start:.2f}s, in ascolto su http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,77 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.pipeline.batch_recommendations import run_batch_recommendations, load_batch_recommendations
+from src.recommender.corpus_index import CorpusIndex
+from src.recommender.scorer import ScoringParams
+from src.user.profile_store import ProfileStore
+
+PARAMS = ScoringParams(eta=1, zeta=0.01, alpha=0.5, tol=30, k=2)
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(0)
+    ids = np.array([f"d{i}" for i in range(10)], dtype=object)
+    return CorpusIndex(ids, np.linspace(40, 80, 10), rng.normal(size=(10, 4)))
+
+
+@pytest.fixture
+def store(tmp_path, corpus):
+    store = ProfileStore(str(tmp_path / "profiles.db"))
+    store.save_many([
+        {"user_id": user_id, "target_readability": 60, "topic_vector": list(corpus.unit_embedding[user_id]), "history": []}
+        for user_id in range(3)
+    ])
+    yield store
+    store.close()
+
+
+def run(corpus, store, output_dir, progress=None):
+    return run_batch_recommendations(corpus, store.db_path, str(output_dir), PARAMS, shard_size=1, workers=1,
+                                     progress=progress)
+
+
+def test_rerun_after_profile_change_recomputes(tmp_path, corpus, store):
+    output_dir = tmp_path / "batch"
+    report = run(corpus, store, output_dir)
+    assert report["shards_run"] == 3
+    # job completato: nessun blocco da riprendere
+    assert not os.path.exists(output_dir / "shards")
+    assert not os.path.exists(output_dir / "job.json")
+    first = load_batch_recommendations(report["output"])
+
+    # l'utente legge i documenti raccomandati: non devono essere raccomandati di nuovo
+    user = store.load(0)
+    user["history"].extend(first[0][0])
+    store.save(user)
+
+    report = run(corpus, store, output_dir)
+    assert report["shards_run"] == 3
+    assert report["shards_reused"] == 0
+    second = load_batch_recommendations(report["output"])
+    assert not set(second[0][0]) & set(first[0][0])
+    assert second[1] == first[1]
+
+
+def test_interrupted_run_is_resumed(tmp_path, corpus, store):
+    output_dir = tmp_path / "batch"
+
+    def interrupt(done, total, users, elapsed):
+        raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        run(corpus, store, output_dir, progress=interrupt)
+    written = len(os.listdir(output_dir / "shards"))
+    assert written >= 1
+
+    report = run(corpus, store, output_dir)
+    assert report["shards_reused"] == written
+    assert report["shards_run"] == 3 - written
+    assert sorted(load_batch_recommendations(report["output"])) == [0, 1, 2]
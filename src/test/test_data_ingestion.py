@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pandas as pd
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.ingest import data_ingestion
+from src.ingest.data_ingestion import ingest_corpus, DEFAULT_LEVELS
+
+
+class SmallChunkCursor(data_ingestion._RowCursor):
+    # blocchi piccoli: le righe da copiare cadono in blocchi diversi
+    def __init__(self, path):
+        super().__init__(path, chunksize=2)
+
+
+def test_unchanged_rows_copied_from_output_in_any_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_ingestion, "_RowCursor", SmallChunkCursor)
+    root = tmp_path / "corpus"
+    for level in ("Ele-Txt", "Adv-Txt"):
+        (root / level).mkdir(parents=True)
+        for name in ("a", "b", "c"):
+            (root / level / f"{name}.txt").write_text(f"testo {level} {name}", encoding="utf-8")
+    output, manifest = str(tmp_path / "articles.csv"), str(tmp_path / "manifest.csv")
+    ingest_corpus([str(root)], DEFAULT_LEVELS, output, manifest, workers=2, batch_size=2)
+    expected = pd.read_csv(output)
+
+    # output e manifest allineati ma in ordine inverso (es. scritti da una versione precedente)
+    pd.read_csv(output)[::-1].to_csv(output, index=False)
+    pd.read_csv(manifest, float_precision="round_trip")[::-1].to_csv(manifest, index=False)
+
+    stats = ingest_corpus([str(root)], DEFAULT_LEVELS, output, manifest, workers=2, batch_size=2)
+    assert stats["reused"] == 6
+    assert pd.read_csv(output).equals(expected)
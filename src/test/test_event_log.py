@@ -0,0 +1,250 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.user.event_log import FeedbackEvent, FeedbackEventLog, EventLogLockedError
+from src.user.profile_store import ProfileStore
+
+
+def apply(user, doc_id, doc_embedding, doc_readability, difficulty):
+    # feedback semplificato: basta a verificare quali eventi sono applicati e in che ordine
+    user["history"].append(doc_id)
+    user["target_readability"] += difficulty
+
+
+def embedding(doc_id):
+    return [1.0, 0.0]
+
+
+def profile(user_id, target=60):
+    return {"user_id": user_id, "target_readability": target, "topic_vector": [1.0, 0.0], "history": []}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProfileStore(str(tmp_path / "profiles.db"))
+    store.save_many([profile(1)])
+    yield store
+    store.close()
+
+
+def current(log, store, user_id):
+    return log.read(lambda: store.load_many([user_id]), apply, embedding).get(user_id)
+
+
+def test_append_compact_replay(tmp_path, store):
+    log_dir = str(tmp_path / "log")
+    log = FeedbackEventLog(log_dir, store)
+    for i, difficulty in enumerate([4, 5, 2]):
+        log.append(1, f"d{i}", 50, difficulty)
+
+    before = current(log, store, 1)
+    assert list(before["history"]) == ["d0", "d1", "d2"]
+    assert before["target_readability"] == 71
+
+    assert log.compact(apply, embedding) == 3
+    assert log.pending_events(1) == []
+    assert store.load(1)["target_readability"] == 71
+    assert current(log, store, 1)["target_readability"] == 71
+    assert os.listdir(os.path.join(log_dir, "archive")) == ["events.0.log"]
+
+    # riaprendo il log gli eventi compattati non vengono riapplicati
+    log.append(1, "d3", 50, 1)
+    log.close()
+    log = FeedbackEventLog(log_dir, store)
+    after = current(log, store, 1)
+    assert list(after["history"]) == ["d0", "d1", "d2", "d3"]
+    assert after["target_readability"] == 72
+    log.close()
+
+
+def test_identical_feedbacks_are_kept_after_reopen(tmp_path, store):
+    log_dir = str(tmp_path / "log")
+    log = FeedbackEventLog(log_dir, store)
+    # stesso utente, documento e difficoltà nello stesso istante (es. update_user_models_bulk)
+    recorded = log.append_many([FeedbackEvent(1, "a", 50, 4, 100.0)] * 2)
+    log.append(1, "a", 50, 4, timestamp=100.0)
+    assert len({event.timestamp for event in recorded}) == 2
+    assert current(log, store, 1)["target_readability"] == 72
+
+    log.close()
+    log = FeedbackEventLog(log_dir, store)
+    assert len(log.pending_events(1)) == 3
+    assert current(log, store, 1)["target_readability"] == 72
+    log.close()
+
+
+def test_compaction_after_document_removed(tmp_path, store):
+    log = FeedbackEventLog(str(tmp_path / "log"), store)
+    log.append(1, "rimosso", 50, 4)
+    log.append(1, "a", 50, 5)
+    embeddings = []
+
+    def current_embedding(doc_id):
+        # il documento è stato tolto dall'indice dopo il feedback
+        if doc_id == "rimosso":
+            raise ValueError(f"documento non trovato: {doc_id}")
+        return [1.0, 0.0]
+
+    def apply_with_embedding(user, doc_id, doc_embedding, doc_readability, difficulty):
+        embeddings.append(doc_embedding)
+        apply(user, doc_id, doc_embedding, doc_readability, difficulty)
+
+    assert log.read(lambda: store.load_many([1]), apply_with_embedding, current_embedding)[1]["target_readability"] == 69
+    assert log.compact(apply_with_embedding, current_embedding) == 2
+    assert embeddings[-2:] == [None, [1.0, 0.0]]
+    assert log.unresolved == 2
+    assert list(store.load(1)["history"]) == ["rimosso", "a"]
+    assert store.load(1)["target_readability"] == 69
+    assert log.pending_events(1) == []
+    log.close()
+
+
+def test_events_of_users_without_snapshot_are_kept(tmp_path, store):
+    log_dir = str(tmp_path / "log")
+    log = FeedbackEventLog(log_dir, store)
+    log.append(1, "a", 50, 4)
+    log.append(99, "b", 50, 5)
+    log.append(99, "c", 50, 1)
+
+    assert log.compact(apply, embedding) == 1
+    assert [event.doc_id for event in log.pending_events(99)] == ["b", "c"]
+
+    log.close()
+    log = FeedbackEventLog(log_dir, store)
+    assert [event.doc_id for event in log.pending_events(99)] == ["b", "c"]
+
+    store.save_many([profile(99)])
+    assert log.compact(apply, embedding) == 2
+    assert list(store.load(99)["history"]) == ["b", "c"]
+    log.close()
+
+
+def test_failed_compaction_keeps_events_once(tmp_path, store):
+    log_dir = str(tmp_path / "log")
+    log = FeedbackEventLog(log_dir, store)
+    log.append(1, "a", 50, 4)
+    log.append(99, "b", 50, 5)
+
+    save_many = store.save_many
+    def fail(users, meta=None):
+        raise OSError("disco pieno")
+    store.save_many = fail
+    with pytest.raises(OSError):
+        log.compact(apply, embedding)
+    store.save_many = save_many
+
+    assert [event.doc_id for event in log.pending_events(1)] == ["a"]
+    assert [event.doc_id for event in log.pending_events(99)] == ["b"]
+
+    # gli eventi riportati nella nuova generazione sono anche in quella vecchia: letti una volta sola
+    log.close()
+    log = FeedbackEventLog(log_dir, store)
+    assert [event.doc_id for event in log.pending_events(1)] == ["a"]
+    assert [event.doc_id for event in log.pending_events(99)] == ["b"]
+    assert log.compact(apply, embedding) == 1
+    assert list(store.load(1)["history"]) == ["a"]
+    log.close()
+
+
+def test_compaction_with_concurrent_writer_and_reader(tmp_path, store):
+    log = FeedbackEventLog(str(tmp_path / "log"), store)
+    total = 400
+    expected = [f"d{i}" for i in range(total)]
+    errors = []
+    done = threading.Event()
+
+    def writer():
+        for doc_id in expected:
+            log.append(1, doc_id, 50, 3)
+        done.set()
+
+    def reader():
+        # ogni lettura deve vedere un prefisso degli eventi, senza duplicati né buchi
+        while not done.is_set():
+            user = current(log, store, 1)
+            history = list(user["history"])
+            if history != expected[:len(history)] or user["target_readability"] != 60 + 3 * len(history):
+                errors.append(history)
+                return
+
+    threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+    for thread in threads:
+        thread.start()
+    while not done.is_set():
+        log.compact(apply, embedding)
+    for thread in threads:
+        thread.join()
+    log.compact(apply, embedding)
+
+    assert errors == []
+    assert list(store.load(1)["history"]) == expected
+    assert store.load(1)["target_readability"] == 60 + 3 * total
+    assert log.pending_events(1) == []
+    log.close()
+
+
+def test_read_overlapping_compaction_commit(tmp_path, store):
+    log = FeedbackEventLog(str(tmp_path / "log"), store)
+    log.append(1, "a", 50, 4)
+    log.append(1, "b", 50, 5)
+
+    # la compattazione si ferma mentre applica gli eventi, prima di confermare gli snapshot
+    folding, release = threading.Event(), threading.Event()
+    def blocked_apply(user, doc_id, doc_embedding, doc_readability, difficulty):
+        folding.set()
+        assert release.wait(5)
+        apply(user, doc_id, doc_embedding, doc_readability, difficulty)
+    compaction = threading.Thread(target=log.compact, args=(blocked_apply, embedding))
+    compaction.start()
+    assert folding.wait(5)
+
+    reads = []
+    def read():
+        # snapshot letto prima della conferma, eventi letti dopo: la lettura va ripetuta
+        users = store.load_many([1])
+        if not reads:
+            release.set()
+            compaction.join()
+        reads.append(users)
+        return users
+
+    user = log.read(read, apply, embedding)[1]
+    assert len(reads) == 2
+    assert list(user["history"]) == ["a", "b"]
+    assert user["target_readability"] == 69
+    log.close()
+
+
+def test_second_process_cannot_open_the_log(tmp_path, store):
+    log_dir = str(tmp_path / "log")
+    log = FeedbackEventLog(log_dir, store)
+    code = (
+        "import sys; sys.path.insert(0, sys.argv[1])\n"
+        "from src.user.event_log import FeedbackEvent, FeedbackEventLog, EventLogLockedError\n"
+        "from src.user.profile_store import ProfileStore\n"
+        "try:\n"
+        "    FeedbackEventLog(sys.argv[2], ProfileStore(sys.argv[3]))\n"
+        "except EventLogLockedError:\n"
+        "    sys.exit(3)\n"
+    )
+    args = [sys.executable, "-c", code, PROJECT_ROOT, log_dir, store.db_path]
+    assert subprocess.run(args).returncode == 3
+
+    # rilasciato il lock, un altro processo può diventare proprietario
+    log.close()
+    assert subprocess.run(args).returncode == 0
+
+
+def test_second_open_in_same_process_is_rejected(tmp_path, store):
+    log = FeedbackEventLog(str(tmp_path / "log"), store)
+    with pytest.raises(EventLogLockedError):
+        FeedbackEventLog(str(tmp_path / "log"), store)
+    log.close()
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pandas as pd
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.features.feature_builder import build_features_incremental, text_hash, FEATURE_VERSION
+
+
+def test_empty_corpus_drops_previous_features(tmp_path):
+    features_path, manifest_path = str(tmp_path / "features.csv"), str(tmp_path / "manifest.csv")
+    texts = {"d1": "Primo testo.", "d2": "Secondo testo."}
+    pd.DataFrame({"id": list(texts), "testo": list(texts.values()), "flesch_score": [70.0, 65.0]}).to_csv(features_path, index=False)
+    pd.DataFrame({
+        "id": list(texts),
+        "text_hash": [text_hash(text) for text in texts.values()],
+        "feature_version": FEATURE_VERSION
+    }).to_csv(manifest_path, index=False)
+
+    dataframe, stats = build_features_incremental(pd.DataFrame(columns=["id", "testo"]), features_path, manifest_path)
+
+    assert dataframe.empty
+    assert stats == {"total": 0, "recomputed": 0, "reused": 0, "deleted": 2}
+    features = pd.read_csv(features_path)
+    assert features.empty
+    assert list(features.columns) == ["id", "testo", "flesch_score"]
+    assert pd.read_csv(manifest_path).empty
@@ -0,0 +1,129 @@
+import os
+import socket
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+# model_user carica il modello degli embedding all'import
+pytest.importorskip("sentence_transformers")
+
+from src.user import model_user
+from src.user.profile_store import ProfileStore
+from src.recommender.recommender_engine import RecommenderEngine
+from src.service.client import RecommendationClient
+from src.service.http_server import RecommendationService, RecommendationServer
+
+CONFIG = {"tol": 30, "eta": 1, "zeta": 0.01, "alpha": 0.5, "k": 3}
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "id": [f"d{i}" for i in range(20)],
+        "flesch_score": rng.uniform(20, 90, 20),
+        "testo": [f"testo {i}" for i in range(20)]
+    })
+    engine = RecommenderEngine(df=df, embedding=rng.normal(size=(20, 8)), config=CONFIG)
+
+    store = ProfileStore(str(tmp_path / "profiles.db"))
+    store.save_many([{"user_id": 1, "target_readability": 60, "topic_vector": list(rng.normal(size=8)), "history": []}])
+    monkeypatch.setattr(model_user, "_profile_store", store)
+    model_user._profile_cache.invalidate()
+    yield RecommendationService(engine)
+    model_user._profile_cache.invalidate()
+    store.close()
+
+
+def start(service, **kwargs):
+    server = RecommendationServer(("127.0.0.1", 0), service, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stop(server):
+    server.shutdown()
+    server.server_close()
+
+
+def test_recommend_and_errors(service):
+    server = start(service)
+    client = RecommendationClient(port=server.server_port)
+    try:
+        result = client.recommend(1, k=2, with_text=True)
+        assert result["user_id"] == 1
+        assert len(result["recommendations"]) == 2
+        assert result["recommendations"][0]["testo"].startswith("testo")
+        assert client.document("d3")["id"] == "d3"
+        with pytest.raises(RuntimeError, match="404"):
+            client.recommend(99)
+        assert client.health()["documents"] == 20
+    finally:
+        client.close()
+        stop(server)
+
+
+def test_full_queue_returns_503(service):
+    server = start(service, workers=1, max_queue=1, idle_timeout=5)
+    holder = RecommendationClient(port=server.server_port)
+    client = RecommendationClient(port=server.server_port)
+    waiting = None
+    try:
+        # il primo client tiene il solo worker con la connessione keep-alive, il secondo è in coda
+        holder.health()
+        waiting = socket.create_connection(("127.0.0.1", server.server_port))
+        with pytest.raises(RuntimeError, match="503"):
+            client.health()
+    finally:
+        holder.close()
+        if waiting is not None:
+            waiting.close()
+        client.close()
+        stop(server)
+
+
+def test_idle_connection_releases_worker(service):
+    server = start(service, workers=1, idle_timeout=0.2)
+    idle = RecommendationClient(port=server.server_port)
+    client = RecommendationClient(port=server.server_port, timeout=2)
+    try:
+        idle.health()
+        # la connessione inattiva viene chiusa dopo idle_timeout e il worker serve il secondo client
+        assert client.health()["status"] == "ok"
+    finally:
+        idle.close()
+        client.close()
+        stop(server)
+
+
+def test_feedback_uses_embedding_of_current_index(service):
+    engine = service.engine
+    user = model_user.load_user(1)
+    # documento aggiunto online (assente dagli embedding su disco) e documento sostituito
+    direction = np.zeros(8)
+    direction[0] = 1.0
+    engine.add_documents(["nuovo", "d0"], [60.0, 60.0], np.vstack([direction, -direction]))
+
+    server = start(service)
+    client = RecommendationClient(port=server.server_port)
+    try:
+        client.feedback(1, "nuovo", 3)
+        after_new = model_user.load_user(1)
+        client.feedback(1, "d0", 3)
+        after_replaced = model_user.load_user(1)
+    finally:
+        client.close()
+        stop(server)
+
+    expected = model_user.update_topic_vector(user, direction, 3)
+    assert np.allclose(after_new["topic_vector"], expected, atol=1e-6)
+    expected = model_user.update_topic_vector(after_new, -direction, 3)
+    assert np.allclose(after_replaced["topic_vector"], expected, atol=1e-6)
+    assert list(after_replaced["history"])[-2:] == ["nuovo", "d0"]
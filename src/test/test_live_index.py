@@ -0,0 +1,47 @@
+import os
+import sys
+
+import numpy as np
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.recommender.corpus_index import CorpusIndex
+from src.recommender.live_index import LiveCorpusIndex
+
+
+def live_index():
+    rng = np.random.default_rng(0)
+    index = CorpusIndex(np.array(["a", "b", "c"], dtype=object), np.array([30.0, 50.0, 70.0]), rng.normal(size=(3, 4)))
+    return LiveCorpusIndex(index, compact_ratio=1.0)
+
+
+def test_old_snapshot_keeps_removed_document():
+    live = live_index()
+    old = live.snapshot()
+
+    new = live.remove_documents(["b"])
+    assert new.position("b") is None
+    assert old.alive[1]
+    assert old.position("b") == 1
+
+
+def test_old_snapshot_keeps_replaced_document():
+    live = live_index()
+    old = live.snapshot()
+
+    new = live.add_documents(["c"], [40.0], np.ones((1, 4)))
+    assert new.position("c") == 3
+    assert new.flesch[new.position("c")] == 40.0
+    assert old.position("c") == 2
+    assert old.flesch[old.position("c")] == 70.0
+
+
+def test_added_document_is_not_visible_in_old_snapshot():
+    live = live_index()
+    old = live.snapshot()
+
+    new = live.add_documents(["d"], [60.0], np.ones((1, 4)))
+    assert old.position("d") is None
+    assert new.position("d") == 3
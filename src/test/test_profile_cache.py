@@ -0,0 +1,36 @@
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.user.profile_cache import ProfileCache
+
+
+def profile(user_id, target=60):
+    return {"user_id": user_id, "target_readability": target, "topic_vector": [1.0, 0.0], "history": []}
+
+
+def test_readers_do_not_see_unsaved_changes():
+    cache = ProfileCache(lambda user_id: profile(user_id), bulk_loader=lambda ids: {i: profile(i) for i in ids})
+    user = cache.get(1)
+    version = user["version"]
+
+    # aggiornamento in corso (come update_user_model) non ancora reinserito con put
+    user["target_readability"] = 75
+    user["topic_vector"][0] = 0.5
+    user["history"].append("d1")
+    for current in (cache.get(1), cache.get_many([1])[1]):
+        assert current["target_readability"] == 60
+        assert current["topic_vector"] == [1.0, 0.0]
+        assert list(current["history"]) == []
+        assert current["version"] == version
+
+    assert cache.put(user) > version
+    assert user["version"] == cache.version(1)
+    assert cache.get(1)["target_readability"] == 75
+
+    # modifiche successive al profilo inserito non arrivano alla cache
+    user["target_readability"] = 90
+    assert cache.get(1)["target_readability"] == 75
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.features.readability import tokenize
+
+TEXTS = [
+    "Dr. Smith paid 3.5 dollars for the book. He read it again and then... he slept! "
+    "Did he like it? Yes, e.g. the ending was good.",
+    "The rate rose to 2.75 percent in 2023. Mr. Brown said it was fine. Prices fell by 0.5 points.",
+    "Short one. Another one here! And a question?",
+]
+
+
+def test_decimals_and_abbreviations_do_not_split_sentences():
+    assert tokenize(TEXTS[0])[0] == 4
+    assert tokenize(TEXTS[1])[0] == 3
+    assert tokenize(TEXTS[2])[0] == 3
+
+
+def test_default_mode_matches_exact_mode():
+    # modalità nltk: richiede i dati del tokenizer punkt
+    nltk = pytest.importorskip("nltk")
+    try:
+        nltk.sent_tokenize("Prova.")
+    except LookupError:
+        pytest.skip("dati punkt di nltk non installati")
+
+    for text in TEXTS:
+        assert tokenize(text)[0] == tokenize(text, exact=True)[0]
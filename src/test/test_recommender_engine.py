@@ -0,0 +1,45 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+# il motore importa model_user, che carica il modello degli embedding all'import
+pytest.importorskip("sentence_transformers")
+
+from src.recommender.recommender_engine import RecommenderEngine
+
+CONFIG = {"tol": 100, "eta": 1, "zeta": 0.01, "alpha": 0.5, "k": 10}
+
+
+def test_rank_segments_skips_documents_replaced_or_removed_online():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "id": [f"d{i}" for i in range(6)],
+        "flesch_score": np.linspace(40, 80, 6),
+        "testo": [f"paragrafo {i}" for i in range(6)]
+    })
+    segments = {
+        "doc": np.arange(6, dtype=np.int32),
+        "start": np.zeros(6, dtype=np.int32),
+        "end": np.full(6, 11, dtype=np.int32),
+        "flesch": np.linspace(40, 80, 6).astype(np.float32)
+    }
+    engine = RecommenderEngine(df=df, embedding=rng.normal(size=(6, 4)), config=CONFIG, segments=segments)
+    user = {"user_id": 1, "target_readability": 60, "topic_vector": list(rng.normal(size=4)), "history": []}
+    assert sorted(engine.rank_segments(user)[0]) == [f"d{i}" for i in range(6)]
+
+    # d0 sostituito (nuovo testo ed embedding, nessun paragrafo nuovo) e d1 rimosso
+    engine.add_documents(["d0"], [60.0], np.ones((1, 4)), ["testo nuovo"])
+    engine.remove_documents(["d1"])
+    titles = engine.rank_segments(user)[0]
+    assert sorted(titles) == ["d2", "d3", "d4", "d5"]
+
+    # dopo la compattazione dell'indice live i documenti invariati restano
+    engine.compact_documents()
+    assert sorted(engine.rank_segments(user)[0]) == ["d2", "d3", "d4", "d5"]
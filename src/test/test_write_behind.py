@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+
+import pytest
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.user.profile_store import ProfileStore
+from src.user.write_behind import WriteBehindPersister
+
+
+class BlockingStore(ProfileStore):
+    """ProfileStore la cui save_many resta bloccata finché il test non la rilascia"""
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def save_many(self, users, meta=None):
+        users = list(users)
+        self.writing.set()
+        assert self.release.wait(5)
+        super().save_many(users, meta)
+
+
+def profile(user_id, target, history=()):
+    return {"user_id": user_id, "target_readability": target, "topic_vector": [1.0, 0.0], "history": list(history)}
+
+
+def test_pending_visible_while_batch_is_written(tmp_path):
+    store = BlockingStore(str(tmp_path / "profiles.db"))
+    ProfileStore.save_many(store, [profile(1, 60)])
+    persister = WriteBehindPersister(store, flush_interval=60)
+
+    persister.submit(profile(1, 75, ["d1"]))
+    writer = threading.Thread(target=persister.flush)
+    writer.start()
+    try:
+        assert store.writing.wait(5)
+        # la transazione non è ancora confermata: il profilo nuovo arriva da pending()
+        assert store.load(1)["target_readability"] == 60
+        user = persister.pending(1)
+        assert user is not None
+        assert user["target_readability"] == 75
+        assert list(user["history"]) == ["d1"]
+    finally:
+        store.release.set()
+        writer.join()
+        persister.close()
+
+    assert persister.pending(1) is None
+    assert store.load(1)["target_readability"] == 75
+
+
+def test_failed_write_is_requeued(tmp_path):
+    store = ProfileStore(str(tmp_path / "profiles.db"))
+    persister = WriteBehindPersister(store, flush_interval=60)
+
+    def fail(users, meta=None):
+        raise OSError("disco pieno")
+
+    store.save_many, save_many = fail, store.save_many
+    persister.submit(profile(2, 40))
+    with pytest.raises(OSError):
+        persister.flush()
+    assert persister.pending(2)["target_readability"] == 40
+
+    store.save_many = save_many
+    assert persister.flush() == 1
+    persister.close()
+    assert store.load(2)["target_readability"] == 40
+
+
+def test_load_user_during_write(tmp_path, monkeypatch):
+    # percorso completo di load_user: richiede il modello degli embedding e i dati del progetto
+    pytest.importorskip("sentence_transformers")
+    from src.user import model_user
+
+    store = BlockingStore(str(tmp_path / "profiles.db"))
+    ProfileStore.save_many(store, [profile(3, 60)])
+    monkeypatch.setattr(model_user, "_profile_store", store)
+    monkeypatch.setattr(model_user, "_persister", WriteBehindPersister(store, flush_interval=60))
+    model_user._profile_cache.invalidate()
+
+    model_user.save_user(profile(3, 80, ["d3"]))
+    writer = threading.Thread(target=model_user.flush_profiles)
+    writer.start()
+    try:
+        assert store.writing.wait(5)
+        # profilo non più in cache: load_user deve leggerlo dalla coda in scrittura
+        model_user._profile_cache.invalidate(3)
+        assert model_user.load_user(3)["target_readability"] == 80
+    finally:
+        store.release.set()
+        writer.join()
+        model_user._persister.close()
+        model_user._profile_cache.invalidate()
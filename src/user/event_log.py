@@ -0,0 +1,461 @@
+import argparse
+import math
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from typing import NamedTuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+# record: user_id (int64), doc_readability (float32), difficulty (uint8),
+# timestamp (float64), lunghezza doc_id (uint16), seguiti dai byte utf-8 di doc_id
+RECORD_HEADER = struct.Struct("<qfBdH")
+
+
+class FeedbackEvent(NamedTuple):
+    """Feedback di un utente su un documento"""
+    user_id: int
+    doc_id: str
+    doc_readability: float
+    difficulty: int
+    timestamp: float
+
+
+def encode_event(event):
+    """Codifica binaria di un evento
+
+    Args:
+        event (FeedbackEvent): evento da codificare
+
+    Returns:
+        bytes: record binario dell'evento
+    """
+    doc_id = str(event.doc_id).encode("utf-8")
+    return RECORD_HEADER.pack(
+        int(event.user_id), float(event.doc_readability), int(event.difficulty),
+        float(event.timestamp), len(doc_id)
+    ) + doc_id
+
+
+def decode_events(data):
+    """Decodifica una sequenza di record binari
+
+    Un eventuale record incompleto in coda (scrittura interrotta) viene ignorato.
+
+    Args:
+        data (bytes): contenuto del log
+
+    Returns:
+        tuple[list[FeedbackEvent], int]: eventi decodificati e byte consumati
+    """
+    events = []
+    offset = 0
+    size = RECORD_HEADER.size
+    while offset + size <= len(data):
+        user_id, readability, difficulty, timestamp, length = RECORD_HEADER.unpack_from(data, offset)
+        end = offset + size + length
+        if end > len(data):
+            break
+        doc_id = data[offset + size:end].decode("utf-8")
+        events.append(FeedbackEvent(user_id, doc_id, readability, difficulty, timestamp))
+        offset = end
+    return events, offset
+
+
+GENERATION_KEY = "event_log_generation"
+LOG_NAME_RE = re.compile(r"^events\.(\d+)\.log$")
+LOCK_NAME = "owner.lock"
+
+
+class EventLogLockedError(RuntimeError):
+    """Il log è già aperto da un altro processo"""
+
+
+def _lock_exclusive(f):
+    # lock esclusivo non bloccante sul file, rilasciato alla chiusura (anche se il processo termina)
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+class FeedbackEventLog:
+    """Log binario append-only dei feedback con snapshot e compattazione
+
+    Gli snapshot dei profili sono nell'archivio dei profili: un profilo aggiornato si
+    ottiene applicando allo snapshot gli eventi non ancora compattati. Il log è diviso
+    in generazioni (file events.<generazione>.log); l'archivio registra, nella stessa
+    transazione che salva gli snapshot, la prima generazione non ancora compattata,
+    così un'interruzione durante la compattazione non applica mai un evento due volte.
+    Il log ha un solo processo proprietario (lock esclusivo sul file owner.lock):
+    solo lui scrive gli eventi e li compatta, perché la generazione corrente e gli
+    eventi non compattati sono tenuti in memoria.
+    """
+    def __init__(self, directory, store, fsync=False):
+        """Apre (o crea) il log
+
+        Args:
+            directory (str): cartella del log
+            store (ProfileStore): archivio degli snapshot dei profili
+            fsync (bool): se True ogni append viene forzato su disco
+
+        Raises:
+            EventLogLockedError: se il log è già aperto da un altro processo
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.store = store
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._pending = {}
+        # eventi in compattazione: restano visibili a replay finché gli snapshot non sono confermati
+        self._folding = {}
+        self.compactions = 0
+        # eventi applicati senza embedding perché il documento non è più nel corpus
+        self.unresolved = 0
+
+        self._owner = open(os.path.join(directory, LOCK_NAME), "a+b")
+        if not _lock_exclusive(self._owner):
+            self._owner.close()
+            raise EventLogLockedError(f"log dei feedback già aperto da un altro processo: {directory}")
+
+        first = int(store.get_meta(GENERATION_KEY, 0))
+        generations = sorted(gen for gen in self._generations() if gen >= first)
+        for gen in self._generations():
+            if gen < first:
+                self._archive(gen)
+
+        # una compattazione fallita può lasciare gli eventi riportati nella generazione
+        # successiva anche in quella di origine: i record identici sono letti una volta sola
+        # (i timestamp strettamente crescenti di append_many distinguono i feedback ripetuti)
+        seen = set()
+        self._last_timestamp = -math.inf
+        for gen in generations:
+            path = self._path(gen)
+            with open(path, "rb") as f:
+                data = f.read()
+            events, valid = decode_events(data)
+            if valid < len(data):
+                # scarta il record incompleto lasciato da una scrittura interrotta
+                with open(path, "r+b") as f:
+                    f.truncate(valid)
+            for event in events:
+                if event not in seen:
+                    seen.add(event)
+                    self._pending.setdefault(event.user_id, []).append(event)
+                    self._last_timestamp = max(self._last_timestamp, event.timestamp)
+
+        self.generation = generations[-1] if generations else first
+        self._file = open(self._path(self.generation), "ab")
+
+
+    def _path(self, generation):
+        return os.path.join(self.directory, f"events.{generation}.log")
+
+
+    def _archive(self, generation):
+        archive_dir = os.path.join(self.directory, "archive")
+        os.makedirs(archive_dir, exist_ok=True)
+        os.replace(self._path(generation), os.path.join(archive_dir, f"events.{generation}.log"))
+
+
+    def _generations(self, directory=None):
+        directory = directory or self.directory
+        if not os.path.isdir(directory):
+            return []
+        generations = []
+        for name in os.listdir(directory):
+            match = LOG_NAME_RE.match(name)
+            if match:
+                generations.append(int(match.group(1)))
+        return generations
+
+
+    def close(self):
+        """Chiude il file del log e rilascia il lock del processo proprietario"""
+        with self._lock:
+            self._file.close()
+            self._owner.close()
+
+
+    def append(self, user_id, doc_id, doc_readability, difficulty, timestamp=None):
+        """Aggiunge un evento in coda al log
+
+        Args:
+            user_id (int): identificativo dell'utente
+            doc_id (str): identificativo del documento letto
+            doc_readability (float): leggibilità del documento
+            difficulty (int): difficoltà espressa dall'utente (1-5)
+            timestamp (float, optional): istante del feedback (default ora corrente)
+
+        Returns:
+            FeedbackEvent: evento registrato
+        """
+        event = FeedbackEvent(user_id, str(doc_id), float(doc_readability), int(difficulty),
+                              time.time() if timestamp is None else float(timestamp))
+        return self.append_many([event])[0]
+
+
+    def append_many(self, events):
+        """Aggiunge più eventi con una sola scrittura
+
+        I timestamp registrati sono strettamente crescenti (un timestamp non successivo
+        all'ultimo viene spostato appena dopo): anche due feedback identici dello
+        stesso istante restano record distinti alla riapertura del log.
+
+        Args:
+            events (iterable[FeedbackEvent]): eventi da registrare
+
+        Returns:
+            list[FeedbackEvent]: eventi registrati (con i timestamp effettivi)
+        """
+        with self._lock:
+            recorded = []
+            for event in events:
+                timestamp = max(float(event.timestamp), math.nextafter(self._last_timestamp, math.inf))
+                self._last_timestamp = timestamp
+                recorded.append(event._replace(timestamp=timestamp))
+            self._write(recorded)
+        return recorded
+
+
+    def _write(self, events):
+        # da chiamare con il lock acquisito; gli eventi sono scritti così come sono
+        data = b"".join(encode_event(event) for event in events)
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        for event in events:
+            self._pending.setdefault(event.user_id, []).append(event)
+
+
+    def pending_events(self, user_id):
+        """Eventi di un utente non ancora compattati nello snapshot
+
+        Args:
+            user_id (int): identificativo dell'utente
+
+        Returns:
+            list[FeedbackEvent]: eventi in ordine di registrazione
+        """
+        with self._lock:
+            return list(self._folding.get(user_id, ())) + list(self._pending.get(user_id, ()))
+
+
+    def events(self, include_archive=False):
+        """Eventi del log in ordine di registrazione (dati per la valutazione offline)
+
+        Args:
+            include_archive (bool): se True include anche gli eventi già compattati,
+                                    conservati nella sottocartella archive
+
+        Returns:
+            list[FeedbackEvent]: eventi del log
+        """
+        archive_dir = os.path.join(self.directory, "archive")
+        paths = []
+        if include_archive:
+            paths += [os.path.join(archive_dir, f"events.{gen}.log") for gen in sorted(self._generations(archive_dir))]
+
+        with self._lock:
+            self._file.flush()
+            paths += [self._path(gen) for gen in sorted(self._generations())]
+            events = []
+            for path in paths:
+                with open(path, "rb") as f:
+                    events.extend(decode_events(f.read())[0])
+        return events
+
+
+    def _embedding(self, embedding_fn, doc_id):
+        # documento rimosso dal corpus dopo il feedback: l'evento è applicato senza embedding
+        # invece di bloccare la lettura e la compattazione di tutti gli utenti
+        try:
+            return embedding_fn(doc_id)
+        except (ValueError, LookupError):
+            with self._lock:
+                self.unresolved += 1
+            return None
+
+
+    def replay(self, user, apply_fn, embedding_fn):
+        """Applica a uno snapshot gli eventi non compattati del suo utente
+
+        Args:
+            user (dict): snapshot del profilo (viene modificato)
+            apply_fn (callable): funzione (user, doc_id, doc_embedding, doc_readability, difficulty)
+                                 che applica un feedback al profilo (doc_embedding è None se il
+                                 documento non è più nel corpus)
+            embedding_fn (callable): funzione doc_id -> embedding del documento
+                                     (ValueError o LookupError se il documento non esiste)
+
+        Returns:
+            dict: profilo aggiornato
+        """
+        for event in self.pending_events(user["user_id"]):
+            apply_fn(user, event.doc_id, self._embedding(embedding_fn, event.doc_id),
+                     event.doc_readability, event.difficulty)
+        return user
+
+
+    def read(self, read_fn, apply_fn, embedding_fn):
+        """Legge degli snapshot e applica gli eventi non compattati in modo coerente:
+            se durante la lettura una compattazione conferma i suoi snapshot la lettura
+            viene ripetuta (altrimenti gli eventi sarebbero applicati due volte o persi)
+
+        Args:
+            read_fn (callable): funzione senza argomenti -> dict[user_id, snapshot]
+            apply_fn (callable): funzione che applica un feedback al profilo (vedi replay)
+            embedding_fn (callable): funzione doc_id -> embedding del documento
+
+        Returns:
+            dict[int, dict]: profili aggiornati
+        """
+        while True:
+            with self._lock:
+                compactions = self.compactions
+            users = read_fn()
+            for user in users.values():
+                self.replay(user, apply_fn, embedding_fn)
+            with self._lock:
+                if self.compactions == compactions:
+                    return users
+
+
+    def compact(self, apply_fn, embedding_fn):
+        """Compatta il log: applica gli eventi agli snapshot e archivia i file compattati
+
+        Le nuove append vanno subito in una nuova generazione, quindi gli eventi
+        registrati durante la compattazione non vengono toccati. Gli eventi di utenti
+        senza snapshot nell'archivio non vengono persi: sono riscritti in testa alla
+        nuova generazione e restano da compattare.
+
+        Args:
+            apply_fn (callable): funzione che applica un feedback al profilo (vedi replay)
+            embedding_fn (callable): funzione doc_id -> embedding del documento
+
+        Returns:
+            int: numero di eventi compattati
+        """
+        with self._lock:
+            user_ids = list(self._pending)
+        # utenti con snapshot: letti prima della rotazione, così gli eventi degli
+        # altri possono essere scritti per primi nella nuova generazione
+        existing = set(self.store.load_many(user_ids))
+
+        with self._lock:
+            self._file.close()
+            folded = self._pending
+            self._pending = {}
+            carried = {user_id: events for user_id, events in folded.items() if user_id not in existing}
+            for user_id in carried:
+                del folded[user_id]
+            self._folding = folded
+            self.generation += 1
+            self._file = open(self._path(self.generation), "ab")
+            next_generation = self.generation
+            if carried:
+                # copie degli eventi originali (stesso timestamp): riconosciute come tali alla riapertura
+                self._write([event for events in carried.values() for event in events])
+
+        try:
+            profiles = self.store.load_many(folded)
+            count = 0
+            for user_id, events in folded.items():
+                user = profiles[user_id]
+                for event in events:
+                    apply_fn(user, event.doc_id, self._embedding(embedding_fn, event.doc_id),
+                             event.doc_readability, event.difficulty)
+                    count += 1
+            # conferma degli snapshot e rimozione degli eventi compattati in un solo passo (vedi read)
+            with self._lock:
+                self.store.save_many(profiles.values(), meta={GENERATION_KEY: next_generation})
+                self._folding = {}
+                self.compactions += 1
+        except Exception:
+            # gli eventi restano da compattare: li rimette davanti a quelli nuovi
+            with self._lock:
+                for user_id, events in self._pending.items():
+                    folded.setdefault(user_id, []).extend(events)
+                self._pending = folded
+                self._folding = {}
+            raise
+
+        for gen in self._generations():
+            if gen < next_generation:
+                self._archive(gen)
+        return count
+
+
+class PeriodicCompactor:
+    """Compattazione periodica del log nel processo che lo possiede"""
+    def __init__(self, compact_fn, interval=300):
+        """Inizializza il compattatore (start() avvia il thread)
+
+        Args:
+            compact_fn (callable): funzione senza argomenti che compatta il log (es. model_user.compact_event_log)
+            interval (float): secondi fra due compattazioni
+        """
+        self.compact_fn = compact_fn
+        self.interval = interval
+        self.last_error = None
+        self.runs = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.compact_fn()
+                self.runs += 1
+            except Exception as e:
+                # gli eventi restano nel log: si riprova al giro successivo
+                self.last_error = e
+
+
+    def start(self):
+        """Avvia il thread di compattazione"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="event-log-compaction", daemon=True)
+            self._thread.start()
+
+
+    def stop(self):
+        """Ferma il thread di compattazione"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compattazione del log dei feedback negli snapshot dei profili "
+                                                 "(solo a servizio fermo: l'applicazione compatta da sé, vedi event_log.compact_interval)")
+    parser.add_argument("--log-dir", default=None)
+    args = parser.parse_args()
+
+    from src.user import model_user
+    try:
+        log = model_user.enable_event_log(args.log_dir)
+    except EventLogLockedError as e:
+        sys.exit(f" {e}: la compattazione viene eseguita dal processo che lo usa")
+    count = model_user.compact_event_log()
+    print(f" Compattati {count} eventi nella generazione {log.generation}")
@@ -0,0 +1,110 @@
+import numpy as np
+
+
+class DocHistory(list):
+    """History dei documenti letti da un utente
+
+    È una lista (ordine di lettura, serializzabile in json come lista) affiancata
+    da un insieme degli id, così la verifica di appartenenza costa O(1).
+    Gli id sono sempre stringhe e ogni documento compare una sola volta.
+    """
+    def __init__(self, doc_ids=()):
+        super().__init__()
+        self._members = set()
+        self.extend(doc_ids)
+
+
+    def __reduce__(self):
+        return (DocHistory, (list(self),))
+
+
+    def __contains__(self, doc_id):
+        return doc_id in self._members
+
+
+    def append(self, doc_id):
+        doc_id = str(doc_id)
+        if doc_id not in self._members:
+            self._members.add(doc_id)
+            super().append(doc_id)
+
+
+    def extend(self, doc_ids):
+        for doc_id in doc_ids:
+            self.append(doc_id)
+
+
+    def __iadd__(self, doc_ids):
+        self.extend(doc_ids)
+        return self
+
+
+    def copy(self):
+        return DocHistory(self)
+
+
+    def _rebuild(self):
+        self._members = set(self)
+
+
+    def insert(self, index, doc_id):
+        doc_id = str(doc_id)
+        if doc_id not in self._members:
+            super().insert(index, doc_id)
+            self._members.add(doc_id)
+
+
+    def remove(self, doc_id):
+        super().remove(doc_id)
+        self._members.discard(doc_id)
+
+
+    def pop(self, index=-1):
+        doc_id = super().pop(index)
+        self._members.discard(doc_id)
+        return doc_id
+
+
+    def clear(self):
+        super().clear()
+        self._members.clear()
+
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._rebuild()
+
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._rebuild()
+
+
+    def positions(self, doc_positions):
+        """Posizioni nel corpus dei documenti letti
+
+        Args:
+            doc_positions (dict[str, int]): mappa id documento -> posizione nel corpus
+
+        Returns:
+            np.ndarray: posizioni (int64) dei documenti presenti nel corpus;
+                        il costo è proporzionale alla lunghezza della history
+        """
+        return np.fromiter(
+            (doc_positions[doc_id] for doc_id in self if doc_id in doc_positions),
+            dtype=np.int64
+        )
+
+
+def as_history(history):
+    """Converte una history (lista di id) in DocHistory se necessario
+
+    Args:
+        history (iterable[str] or DocHistory): history dell'utente
+
+    Returns:
+        DocHistory: history con verifica di appartenenza O(1)
+    """
+    if isinstance(history, DocHistory):
+        return history
+    return DocHistory(history or ())
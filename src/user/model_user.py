@@ -1,19 +1,316 @@
+import atexit
+from functools import lru_cache
 import numpy as np
 import os
 import sys
+import time
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
 sys.path.insert(0, PROJECT_ROOT)
-from utils.io_utils import load_json, load_yaml, save_json, load_pickle
-from src.features.embeddings import get_document_embedding
+from utils.io_utils import load_json, load_yaml, save_json
+from utils.data_loader import load_embedding
+from src.features import embeddings as document_embeddings
+from src.features.embeddings import model, sentences_embedding
+from src.user.profile_store import ProfileStore
+from src.user.write_behind import WriteBehindPersister
+from src.user.event_log import FeedbackEventLog, FeedbackEvent, PeriodicCompactor
+from src.user.history import DocHistory, as_history
+from src.user.profile_cache import ProfileCache
 config = load_yaml() 
 
 rel_path_users = config['paths']['user_json']
 users_path = os.path.join(PROJECT_ROOT, rel_path_users)
-rel_emb = config['paths']['embeddings_pickle']
-emb_path = os.path.join(PROJECT_ROOT, rel_emb)
-emb = load_pickle(emb_path)
+rel_db = config['paths'].get('user_db', "data/profiles.db")
+db_path = os.path.join(PROJECT_ROOT, rel_db)
+
+_profile_store = None
+_persister = None
+_event_log = None
+_compactor = None
+_embedding_source = None
+
+
+def set_embedding_source(source):
+    """Indica da dove leggere gli embedding dei documenti per i feedback
+        (es. il motore corrente, che vede anche i documenti aggiunti o sostituiti online)
+    
+    Args:
+        source (object or None): oggetto con get_document_embedding(doc_id) e
+            get_document_embeddings(doc_ids), es. RecommenderEngine;
+            None per tornare agli embedding della pipeline su disco
+    """
+    global _embedding_source
+    _embedding_source = source
+
+
+def get_document_embedding(doc_id):
+    """Embedding di un documento dalla sorgente indicata con set_embedding_source
+        (dagli embedding su disco se non indicata)
+    
+    Args:
+        doc_id (str): identificativo del documento
+    
+    Returns:
+        list[float] or np.ndarray: embedding del documento
+    
+    Raises:
+        ValueError: se il documento non esiste
+    """
+    source = _embedding_source or document_embeddings
+    return source.get_document_embedding(doc_id)
+
+
+def get_document_embeddings(doc_ids):
+    """Embedding di più documenti dalla sorgente indicata con set_embedding_source
+    
+    Args:
+        doc_ids (list[str]): identificativi dei documenti
+    
+    Returns:
+        np.ndarray: matrice len(doc_ids) x D degli embedding, nello stesso ordine
+    
+    Raises:
+        ValueError: se uno dei documenti non esiste
+    """
+    source = _embedding_source or document_embeddings
+    return source.get_document_embeddings(doc_ids)
+
+
+def get_profile_store():
+    """Restituisce l'archivio SQLite dei profili (aperto alla prima chiamata)
+    
+    Returns:
+        ProfileStore: archivio dei profili utente
+    """
+    global _profile_store
+    if _profile_store is None:
+        _profile_store = ProfileStore(db_path)
+    return _profile_store
+
+
+def enable_write_behind(flush_interval=1.0, max_batch=500):
+    """Attiva il salvataggio asincrono dei profili: save_user mette il profilo in coda
+    e un thread in background lo scrive sull'archivio
+    
+    Args:
+        flush_interval (float): secondi massimi fra due scritture
+        max_batch (int): numero di profili in coda che forza una scrittura anticipata
+    
+    Returns:
+        WriteBehindPersister: persister attivo
+    """
+    global _persister
+    if _persister is None:
+        _persister = WriteBehindPersister(get_profile_store(), flush_interval=flush_interval, max_batch=max_batch)
+        atexit.register(disable_write_behind)
+    return _persister
+
+
+def disable_write_behind():
+    """Scrive i profili in coda e torna al salvataggio sincrono"""
+    global _persister
+    if _persister is not None:
+        persister, _persister = _persister, None
+        persister.close()
+
+
+def flush_profiles():
+    """Scrive subito sull'archivio i profili in coda (se il write-behind è attivo)
+    
+    Returns:
+        int: numero di profili scritti
+    """
+    if _persister is None:
+        return 0
+    return _persister.flush()
+
+
+def enable_event_log(log_dir=None, fsync=False, compact_interval=None):
+    """Attiva il log degli eventi: update_user_model registra il feedback nel log
+    invece di riscrivere il profilo, e load_user ricostruisce il profilo
+    applicando allo snapshot gli eventi non ancora compattati
+    Il processo che attiva il log ne diventa l'unico proprietario ed è l'unico
+    che può compattarlo (con compact_interval lo fa periodicamente in background)
+    
+    Args:
+        log_dir (str, optional): cartella del log (default paths.event_log in configurazione)
+        fsync (bool): se True ogni evento viene forzato su disco
+        compact_interval (float, optional): secondi fra due compattazioni automatiche
+    
+    Returns:
+        FeedbackEventLog: log attivo
+    
+    Raises:
+        EventLogLockedError: se il log è già aperto da un altro processo
+    """
+    global _event_log, _compactor
+    if _event_log is None:
+        if log_dir is None:
+            log_dir = os.path.join(PROJECT_ROOT, config['paths'].get('event_log', "data/event_log"))
+        _event_log = FeedbackEventLog(log_dir, get_profile_store(), fsync=fsync)
+    if compact_interval and _compactor is None:
+        _compactor = PeriodicCompactor(compact_event_log, interval=compact_interval)
+        _compactor.start()
+    return _event_log
+
+
+def compact_event_log():
+    """Applica agli snapshot dei profili gli eventi del log e li archivia
+    
+    Returns:
+        int: numero di eventi compattati
+    """
+    if _event_log is None:
+        return 0
+    flush_profiles()
+    return _event_log.compact(apply_feedback, get_document_embedding)
+
+
+def save_user(user):
+    """Salva un profilo utente nella cache e nell'archivio dei profili
+        (in coda se il write-behind è attivo)
+    
+    Args:
+        user (dict): dizionario con i dati dell'utente
+    """
+    _profile_cache.put(user)
+    if _persister is not None:
+        _persister.submit(user)
+    else:
+        get_profile_store().save(user)
+
+
+def load_user(user_id):
+    """Carica un profilo utente dalla cache dei profili (dall'archivio in caso di miss)
+    
+    Args:
+        user_id (int): identificativo dell'utente
+    
+    Returns:
+        dict or None: dizionario con i dati dell'utente oppure None se non esiste
+    """
+    return _profile_cache.get(user_id)
+
+
+def load_users(user_ids):
+    """Carica più profili utente dalla cache, leggendo in blocco quelli mancanti
+    
+    Args:
+        user_ids (iterable[int]): identificativi degli utenti
+    
+    Returns:
+        dict[int, dict]: profili trovati indicizzati per user_id
+    """
+    return _profile_cache.get_many(user_ids)
+
+
+def profile_version(user_id):
+    """Versione corrente del profilo di un utente nella cache
+        (cambia a ogni aggiornamento, utilizzabile come chiave per cache a valle)
+    
+    Args:
+        user_id (int): identificativo dell'utente
+    
+    Returns:
+        int or None: versione del profilo oppure None se non è in cache
+    """
+    return _profile_cache.version(user_id)
+
+
+def profile_cache_stats():
+    """Statistiche della cache dei profili
+    
+    Returns:
+        dict: hit, miss, eviction, dimensione e hit rate
+    """
+    return _profile_cache.stats()
+
+
+def _read_user(user_id):
+    """Legge un profilo utente dall'archivio dei profili
+        considerando anche i profili in coda di scrittura e gli eventi del log
+    
+    Args:
+        user_id (int): identificativo dell'utente
+    
+    Returns:
+        dict or None: dizionario con i dati dell'utente oppure None se non esiste
+    """
+    def read():
+        user = None
+        if _persister is not None:
+            user = _persister.pending(user_id)
+        if user is None:
+            user = get_profile_store().load(user_id)
+        return {} if user is None else {user_id: user}
+    
+    if _event_log is not None:
+        return _event_log.read(read, apply_feedback, get_document_embedding).get(user_id)
+    return read().get(user_id)
+
+
+def _read_users(user_ids):
+    """Legge più profili utente con una lettura in blocco dall'archivio
+        (stesse regole di _read_user per coda di scrittura e log degli eventi)
+    
+    Args:
+        user_ids (iterable[int]): identificativi degli utenti
+    
+    Returns:
+        dict[int, dict]: profili trovati indicizzati per user_id
+    """
+    user_ids = list(user_ids)
+    
+    def read():
+        users = {}
+        if _persister is not None:
+            for user_id in user_ids:
+                user = _persister.pending(user_id)
+                if user is not None:
+                    users[user_id] = user
+        
+        missing = [user_id for user_id in user_ids if user_id not in users]
+        users.update(get_profile_store().load_many(missing))
+        return users
+    
+    if _event_log is not None:
+        return _event_log.read(read, apply_feedback, get_document_embedding)
+    return read()
+
+
+_profile_cache = ProfileCache(
+    _read_user,
+    bulk_loader=_read_users,
+    capacity=config.get('profile_cache', {}).get('capacity', 10000)
+)
+
+
+def save_users(users):
+    """Salva più profili utente nella cache e nell'archivio con un'unica scrittura
+        (in coda se il write-behind è attivo)
+    
+    Args:
+        users (iterable[dict]): profili degli utenti
+    """
+    users = list(users)
+    for user in users:
+        _profile_cache.put(user)
+    if _persister is not None:
+        for user in users:
+            _persister.submit(user)
+    else:
+        get_profile_store().save_many(users)
+
+
+def list_user_ids():
+    """Elenco degli utenti presenti nell'archivio dei profili
+    
+    Returns:
+        list[int]: id utente in ordine crescente
+    """
+    return get_profile_store().user_ids()
+
 
 def save_user_json(user, user_id):
     """Salva un profilo utente nel file JSON
@@ -25,7 +322,7 @@ def save_user_json(user, user_id):
     os.makedirs(users_path, exist_ok=True)
     file_name = f"user{user_id}.json"
     path = os.path.join(users_path, file_name)
-    save_json(user, path)
+    save_json(user, path, indent=None)
     
     
     
@@ -44,9 +341,18 @@ def initialize_topic_vector(embedding):
     mean = np.mean(norm_emb, axis=0)
     norm_mean = mean / np.linalg.norm(mean)
     np.save("topic_vector_init.npy", norm_mean)
-    
+    return norm_mean
 
-initialize_topic_vector(emb)
+
+@lru_cache(maxsize=1)
+def corpus_centroid():
+    """Topic vector iniziale di default (centroide del corpus), calcolato una sola volta
+        per corpus: dopo la pubblicazione di un nuovo corpus va svuotato con cache_clear
+    
+    Returns:
+        np.ndarray: vettore 1 x 384 normalizzato
+    """
+    return initialize_topic_vector(load_embedding())
 
 
 
@@ -55,32 +361,124 @@ def build_user_model(user_id, *, topic_vector_default=None, default_readability=
     
     Args:
         user_id (int): identificativo univoco dell'utente
-        topic_vector_init (np.ndarray): vettore iniziale 1 x 384
+        topic_vector_default (np.ndarray, optional): vettore iniziale 1 x 384 (default centroide del corpus)
         default_readability (int): target readability preferito (default 60)
-        save (bool): se True, salva il profilo nel JSON (default True)
+        save (bool): se True, salva il profilo nell'archivio dei profili (default True)
     
     Returns:
         dict: dizionario con i dati dell'utente
     """
     
     if topic_vector_default is None:
-        topic_vector_default = np.load("topic_vector_init.npy")
-    
+        topic_vector_default = corpus_centroid()
     
     user = {
         "user_id": user_id,
         "topic_vector": topic_vector_default.tolist(),
         "target_readability": default_readability,
-        "history": []
+        "history": DocHistory()
     }
     
     if save:
-        save_user_json(user, user_id)
+        save_user(user)
     
     return user
 
 
 
+def _seed_list(value):
+    # celle vuote di un DataFrame (NaN/None) -> nessun seed, stringa singola -> un seed
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def build_user_models_bulk(rows, *, default_readability=60, save=True, overwrite=False):
+    """Crea in blocco nuovi profili utente (es. iscrizione di una classe)
+    
+    Il topic vector iniziale di ogni utente è il centroide degli embedding dei
+    suoi documenti o testi di interesse, oppure il centroide del corpus se non
+    ne indica. Gli embedding dei seed si ottengono con un'unica indicizzazione
+    (doc id) e un unico encode SBERT (testi), i centroidi con una sola somma
+    per gruppi e i profili vengono salvati con un'unica scrittura.
+    
+    Args:
+        rows (pd.DataFrame or iterable[dict]): righe con user_id e opzionalmente
+            target_readability, seed_doc_ids (list[str]) e seed_texts (list[str])
+        default_readability (int): target readability per le righe che non lo indicano
+        save (bool): se True, salva i profili nell'archivio dei profili (default True)
+        overwrite (bool): se True, sostituisce i profili già esistenti (default False)
+    
+    Returns:
+        list[dict]: profili creati, nell'ordine delle righe
+    
+    Raises:
+        ValueError: se un user_id è ripetuto, un documento seed non esiste oppure,
+            con save e senza overwrite, un utente ha già un profilo
+    """
+    if hasattr(rows, "to_dict"):
+        rows = rows.to_dict("records")
+    rows = list(rows)
+    
+    user_ids = [int(row["user_id"]) for row in rows]
+    if len(set(user_ids)) != len(user_ids):
+        raise ValueError("user_id ripetuti nella tabella di iscrizione")
+    if save and not overwrite:
+        existing = sorted(load_users(user_ids))
+        if existing:
+            raise ValueError(f"profili già esistenti per gli utenti {existing[:10]} (usa overwrite=True per sostituirli)")
+    
+    doc_ids, doc_owners = [], []
+    texts, text_owners = [], []
+    for i, row in enumerate(rows):
+        for doc_id in _seed_list(row.get("seed_doc_ids")):
+            doc_ids.append(str(doc_id))
+            doc_owners.append(i)
+        for text in _seed_list(row.get("seed_texts")):
+            texts.append(text)
+            text_owners.append(i)
+    
+    centroid = np.asarray(corpus_centroid(), dtype=float)
+    seeds = [np.empty((0, len(centroid)))]
+    if doc_ids:
+        unique_ids = list(dict.fromkeys(doc_ids))
+        unique_pos = {doc_id: j for j, doc_id in enumerate(unique_ids)}
+        unique_emb = np.asarray(get_document_embeddings(unique_ids), dtype=float)
+        seeds.append(unique_emb[[unique_pos[doc_id] for doc_id in doc_ids]])
+    if texts:
+        seeds.append(np.asarray(sentences_embedding(texts, model), dtype=float))
+    seeds = np.vstack(seeds)
+    owners = np.asarray(doc_owners + text_owners, dtype=np.int64)
+    
+    vectors = np.tile(centroid, (len(rows), 1))
+    if len(owners):
+        seeds = seeds / np.linalg.norm(seeds, axis=1, keepdims=True)
+        sums = np.zeros_like(vectors)
+        np.add.at(sums, owners, seeds)
+        seeded = np.unique(owners)
+        vectors[seeded] = sums[seeded] / np.linalg.norm(sums[seeded], axis=1, keepdims=True)
+    
+    users = []
+    for row, vector in zip(rows, vectors):
+        target = row.get("target_readability")
+        if target is None or (isinstance(target, float) and np.isnan(target)):
+            target = default_readability
+        users.append({
+            "user_id": int(row["user_id"]),
+            "topic_vector": vector.tolist(),
+            "target_readability": target,
+            "history": DocHistory()
+        })
+    
+    if save:
+        save_users(users)
+    
+    return users
+
+
+
 def load_user_model(name, path):
     """Carica un profilo utente da file JSON
     
@@ -102,7 +500,7 @@ def load_user_model(name, path):
         "user_id": user_json['user_id'],
         "topic_vector": user_json['topic_vector'],
         "target_readability": user_json['target_readability'],
-        "history": user_json.get('history', []),
+        "history": as_history(user_json.get('history', [])),
     }
     
     return user
@@ -197,57 +595,181 @@ def update_target_readability(old_target, doc_readability, difficulty, learning_
 
 
 def update_history(user, doc_id):
-    doc_id = str(doc_id)
-    if doc_id not in user["history"]:
-        user["history"].append(doc_id)
+    """Aggiunge un documento alla history dell'utente se non già presente
+    
+    Args:
+        user (dict): user model dell'utente
+        doc_id (int or str): identificativo del documento letto
+    """
+    history = as_history(user.get("history"))
+    user["history"] = history
+    history.append(doc_id)
         
         
     
-def update_user_model(user, doc_id, doc_readability, difficulty):
+def apply_feedback(user, doc_id, doc_embedding, doc_readability, difficulty):
+    """Applica un feedback al profilo utente senza salvarlo
+    
+    Args:
+        user (dict): user model dell'utente (viene modificato)
+        doc_id (int or str): identificativo del documento letto 
+        doc_embedding (list[float] or None): embedding del documento letto; None se il
+            documento non è più nel corpus (replay del log): il topic vector non cambia
+        doc_readability (int or float): leggibilità del documento
+        difficulty (int): difficoltà espressa dall'utente (1-5)
+    
+    Returns:
+        dict: user model aggiornato
+    """
+    update_history(user, doc_id)
+    
+    if doc_embedding is not None:
+        user['topic_vector'] = update_topic_vector(user, doc_embedding, difficulty).tolist()
+    user['target_readability'] = update_target_readability(user['target_readability'], doc_readability, difficulty)
+    
+    return user
+
+
+def update_user_model(user, doc_id, doc_readability, difficulty, doc_embedding=None):
     """Aggiorna il profilo utente quando legge un documento - richiama le funzioni per aggiornare:
         -topic_vector 
         -target_readability
         -history
+        il profilo viene salvato, oppure il feedback viene registrato nel log degli eventi se attivo
     
     Args:
         user (dict): user model dell'utente
         doc_id (int or str): identificativo del documento appena letto 
-        doc_embedding (list[list[float]]): embedding del documento appena letto
         doc_readability (int or float): leggibilità del documento
         difficulty (int): difficoltà espressa dall'utente (1-5)
+        doc_embedding (array-like, optional): embedding del documento, da passare quando si ha
+            già il motore della richiesta (default get_document_embedding)
     
     Returns:
         dict: user model aggiornato - history, topic_vector, target_readability
-        
-    """
-    update_history(user, doc_id)
     
-    doc_embedding = get_document_embedding(doc_id)
-    new_vector = update_topic_vector(user, doc_embedding, difficulty)
-    new_target = update_target_readability(user['target_readability'], doc_readability, difficulty)
-    
-    user['topic_vector'] = new_vector.tolist()
-    user['target_readability'] = new_target
+    Raises:
+        ValueError: se doc_embedding non è indicato e il documento non esiste
+    """
+    if doc_embedding is None:
+        doc_embedding = get_document_embedding(doc_id)
+    apply_feedback(user, doc_id, doc_embedding, doc_readability, difficulty)
     
-    save_user_json(user, user["user_id"])
+    if _event_log is not None:
+        _event_log.append(user["user_id"], doc_id, doc_readability, difficulty)
+        _profile_cache.put(user)
+    else:
+        save_user(user)
     
     return user
 
 
 
+def update_topic_vector_sequence(topic_vector, doc_embeddings, alphas):
+    """Applica in sequenza più aggiornamenti update_topic_vector in forma vettoriale
+    
+    Ogni vettore intermedio è combinazione lineare del vettore iniziale e degli
+    embedding normalizzati dei documenti: si aggiornano solo i coefficienti e le
+    norme si ottengono dalla matrice di Gram, poi il vettore finale si ricostruisce
+    con un solo prodotto matriciale.
+    
+    Args:
+        topic_vector (list[float]): topic vector iniziale dell'utente
+        doc_embeddings (np.ndarray): matrice T x D degli embedding dei documenti letti, in ordine
+        alphas (list[float]): pesi di aggiornamento (difficulty_to_alpha) per ogni documento
+    
+    Returns:
+        np.ndarray: topic vector dopo tutti gli aggiornamenti
+    """
+    docs = np.asarray(doc_embeddings, dtype=float)
+    docs = docs / np.linalg.norm(docs, axis=1, keepdims=True)
+    basis = np.vstack([np.asarray(topic_vector, dtype=float), docs])
+    gram = basis @ basis.T
+    
+    coeffs = np.zeros(len(basis))
+    coeffs[0] = 1.0
+    gram_coeffs = gram[:, 0].copy()
+    
+    for t, alpha in enumerate(alphas, start=1):
+        coeffs *= (1 - alpha)
+        coeffs[t] += alpha
+        gram_coeffs = (1 - alpha) * gram_coeffs + alpha * gram[:, t]
+        norm = np.sqrt(coeffs @ gram_coeffs)
+        coeffs /= norm
+        gram_coeffs /= norm
+    
+    return coeffs @ basis
 
 
+def _event_fields(event):
+    if hasattr(event, "_asdict"):
+        event = event._asdict()
+    return event["user_id"], str(event["doc_id"]), float(event["doc_readability"]), int(event["difficulty"])
 
 
-
-
-
-
-
-
-
+def update_user_models_bulk(events, embedding_source=None):
+    """Aggiorna in blocco i profili utente con un insieme di feedback
     
+    Gli eventi vengono raggruppati per utente (mantenendo l'ordine), gli embedding
+    di tutti i documenti coinvolti sono letti con un'unica indicizzazione, il topic
+    vector di ogni utente è aggiornato in forma vettoriale e ogni profilo viene
+    salvato una sola volta (oppure gli eventi vengono registrati nel log se attivo).
+    Il risultato è lo stesso di update_user_model chiamato su ogni evento in ordine.
     
-
-
+    Args:
+        events (iterable[dict or FeedbackEvent]): feedback con chiavi
+            user_id, doc_id, doc_readability, difficulty
+        embedding_source (object, optional): motore (o altro oggetto con get_document_embeddings)
+            da cui leggere gli embedding (default get_document_embeddings)
+    
+    Returns:
+        dict[int, dict]: profili aggiornati indicizzati per user_id
+    
+    Raises:
+        ValueError: se un utente o un documento non esiste
+    """
+    events = [_event_fields(event) for event in events]
+    if not events:
+        return {}
+    
+    by_user = {}
+    for event in events:
+        by_user.setdefault(event[0], []).append(event)
+    
+    users = load_users(by_user)
+    missing = [user_id for user_id in by_user if user_id not in users]
+    if missing:
+        raise ValueError(f"profili utente non trovati: {missing}")
+    
+    doc_ids = list(dict.fromkeys(event[1] for event in events))
+    doc_pos = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+    if embedding_source is not None:
+        doc_embeddings = np.asarray(embedding_source.get_document_embeddings(doc_ids))
+    else:
+        doc_embeddings = np.asarray(get_document_embeddings(doc_ids))
+    
+    for user_id, user_events in by_user.items():
+        user = users[user_id]
+        alphas = [difficulty_to_alpha(event[3]) for event in user_events]
+        rows = [doc_pos[event[1]] for event in user_events]
+        
+        new_vector = update_topic_vector_sequence(user["topic_vector"], doc_embeddings[rows], alphas)
+        
+        target = user["target_readability"]
+        for _, doc_id, doc_readability, difficulty in user_events:
+            update_history(user, doc_id)
+            target = update_target_readability(target, doc_readability, difficulty)
+        
+        user["topic_vector"] = new_vector.tolist()
+        user["target_readability"] = target
+    
+    if _event_log is not None:
+        now = time.time()
+        _event_log.append_many(FeedbackEvent(*event, now) for event in events)
+        for user in users.values():
+            _profile_cache.put(user)
+    else:
+        save_users(users.values())
+    
+    return users
 
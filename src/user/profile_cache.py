@@ -0,0 +1,194 @@
+import itertools
+import threading
+from collections import OrderedDict
+
+from src.user.history import DocHistory
+
+
+def copy_profile(user):
+    """Copia di un profilo indipendente dall'originale (topic vector e history copiati)
+
+    Args:
+        user (dict): profilo dell'utente
+
+    Returns:
+        dict: copia del profilo
+    """
+    snapshot = dict(user)
+    snapshot["topic_vector"] = list(user["topic_vector"])
+    snapshot["history"] = DocHistory(user.get("history", ()))
+    return snapshot
+
+
+class ProfileCache:
+    """Cache in memoria dei profili utente con versione ed eviction LRU
+
+    Ogni inserimento (lettura dall'archivio o aggiornamento) assegna al profilo una
+    versione crescente, salvata anche nel campo "version" del profilo: le cache a
+    valle (es. raccomandazioni) possono usare (user_id, version) come chiave invece
+    di confrontare il topic vector.
+    La cache conserva e restituisce copie dei profili: chi modifica un profilo
+    letto (es. update_user_model) non lo cambia sotto ai lettori concorrenti, che
+    vedono la versione precedente finché il profilo non viene reinserito con put.
+    """
+    def __init__(self, loader, bulk_loader=None, capacity=10000):
+        """Inizializza la cache
+
+        Args:
+            loader (callable): funzione user_id -> profilo (o None) usata in caso di miss
+            bulk_loader (callable, optional): funzione list[user_id] -> dict[user_id, profilo]
+            capacity (int): numero massimo di profili in cache
+        """
+        self.loader = loader
+        self.bulk_loader = bulk_loader
+        self.capacity = capacity
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._versions = itertools.count(1)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def _insert(self, user):
+        # da chiamare con il lock acquisito; user deve essere una copia privata della cache
+        user["version"] = next(self._versions)
+        self._entries[user["user_id"]] = user
+        self._entries.move_to_end(user["user_id"])
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return user["version"]
+
+
+    def get(self, user_id):
+        """Restituisce il profilo di un utente, caricandolo in caso di miss
+
+        Args:
+            user_id (int): identificativo dell'utente
+
+        Returns:
+            dict or None: copia del profilo dell'utente oppure None se non esiste
+        """
+        with self._lock:
+            user = self._entries.get(user_id)
+            if user is not None:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return copy_profile(user)
+            self.misses += 1
+
+        user = self.loader(user_id)
+        if user is None:
+            return None
+
+        with self._lock:
+            # un put concorrente ha già inserito una versione più recente
+            current = self._entries.get(user_id)
+            if current is None:
+                current = copy_profile(user)
+                self._insert(current)
+            return copy_profile(current)
+
+
+    def get_many(self, user_ids):
+        """Restituisce più profili, caricando in blocco quelli non in cache
+
+        Args:
+            user_ids (iterable[int]): identificativi degli utenti
+
+        Returns:
+            dict[int, dict]: copie dei profili trovati indicizzate per user_id
+        """
+        users = {}
+        missing = []
+        with self._lock:
+            for user_id in dict.fromkeys(user_ids):
+                user = self._entries.get(user_id)
+                if user is not None:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    users[user_id] = copy_profile(user)
+                else:
+                    self.misses += 1
+                    missing.append(user_id)
+
+        if missing:
+            if self.bulk_loader is not None:
+                loaded = self.bulk_loader(missing)
+            else:
+                loaded = {user_id: self.loader(user_id) for user_id in missing}
+
+            with self._lock:
+                for user_id, user in loaded.items():
+                    if user is None:
+                        continue
+                    current = self._entries.get(user_id)
+                    if current is None:
+                        current = copy_profile(user)
+                        self._insert(current)
+                    users[user_id] = copy_profile(current)
+        return users
+
+
+    def put(self, user):
+        """Inserisce o aggiorna un profilo assegnandogli una nuova versione
+            (la cache ne conserva una copia, la versione è scritta anche in user)
+
+        Args:
+            user (dict): profilo dell'utente
+
+        Returns:
+            int: nuova versione del profilo
+        """
+        snapshot = copy_profile(user)
+        with self._lock:
+            user["version"] = self._insert(snapshot)
+            return user["version"]
+
+
+    def version(self, user_id):
+        """Versione corrente di un profilo in cache
+
+        Args:
+            user_id (int): identificativo dell'utente
+
+        Returns:
+            int or None: versione del profilo oppure None se non è in cache
+        """
+        with self._lock:
+            user = self._entries.get(user_id)
+        return user["version"] if user is not None else None
+
+
+    def invalidate(self, user_id=None):
+        """Rimuove un profilo dalla cache (tutti se user_id è None)
+
+        Args:
+            user_id (int, optional): identificativo dell'utente
+        """
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+    def stats(self):
+        """Statistiche della cache
+
+        Returns:
+            dict: hit, miss, eviction, dimensione corrente e hit rate
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "hit_rate": self.hits / total if total else 0.0
+            }
@@ -0,0 +1,303 @@
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+
+import numpy as np
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from utils.io_utils import load_json, load_yaml
+from src.user.history import DocHistory
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    target_readability REAL NOT NULL,
+    topic_vector BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    user_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    doc_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# limite dei parametri per singola query IN (...)
+MAX_QUERY_PARAMS = 500
+
+# metadato incrementato a ogni modifica dei profili (vedi ProfileStore.version)
+VERSION_KEY = "profiles_version"
+
+
+def vector_to_blob(vector):
+    """Converte un topic vector in blob binario float32
+
+    Args:
+        vector (list[float] or np.ndarray): topic vector
+
+    Returns:
+        bytes: contenuto binario del vettore
+    """
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def blob_to_vector(blob):
+    """Converte un blob binario float32 in topic vector
+
+    Args:
+        blob (bytes): contenuto binario del vettore
+
+    Returns:
+        list[float]: topic vector
+    """
+    return np.frombuffer(blob, dtype=np.float32).tolist()
+
+
+class ProfileStore:
+    """Archivio dei profili utente su un unico database SQLite in modalità WAL
+
+    I topic vector sono salvati come blob float32 e la history in una tabella
+    separata indicizzata per utente. I profili letti e scritti hanno lo stesso
+    formato di load_user_model (user_id, topic_vector, target_readability, history).
+    """
+    def __init__(self, db_path):
+        """Apre (o crea) il database dei profili
+
+        Args:
+            db_path (str): path del file sqlite
+        """
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+
+    def close(self):
+        """Chiude la connessione al database"""
+        with self._lock:
+            self._conn.close()
+
+
+    def user_ids(self):
+        """Elenco degli id utente presenti
+
+        Returns:
+            list[int]: id utente in ordine crescente
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id FROM users ORDER BY user_id").fetchall()
+        return [row[0] for row in rows]
+
+
+    def load(self, user_id):
+        """Carica il profilo di un utente
+
+        Args:
+            user_id (int): identificativo dell'utente
+
+        Returns:
+            dict or None: profilo dell'utente oppure None se non esiste
+        """
+        return self.load_many([user_id]).get(user_id)
+
+
+    def load_many(self, user_ids):
+        """Carica i profili di più utenti con poche query
+
+        Args:
+            user_ids (iterable[int]): identificativi degli utenti
+
+        Returns:
+            dict[int, dict]: profili trovati indicizzati per user_id
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        profiles = {}
+
+        with self._lock:
+            for start in range(0, len(user_ids), MAX_QUERY_PARAMS):
+                chunk = user_ids[start:start + MAX_QUERY_PARAMS]
+                marks = ",".join("?" * len(chunk))
+
+                for user_id, target, blob in self._conn.execute(
+                    f"SELECT user_id, target_readability, topic_vector FROM users WHERE user_id IN ({marks})",
+                    chunk
+                ):
+                    profiles[user_id] = {
+                        "user_id": user_id,
+                        "topic_vector": blob_to_vector(blob),
+                        "target_readability": target,
+                        "history": DocHistory()
+                    }
+
+                for user_id, doc_id in self._conn.execute(
+                    f"SELECT user_id, doc_id FROM history WHERE user_id IN ({marks}) ORDER BY user_id, position",
+                    chunk
+                ):
+                    profiles[user_id]["history"].append(doc_id)
+
+        return profiles
+
+
+    def save(self, user):
+        """Salva (inserisce o aggiorna) il profilo di un utente
+
+        Args:
+            user (dict): profilo dell'utente
+        """
+        self.save_many([user])
+
+
+    def get_meta(self, key, default=None):
+        """Legge un valore dalla tabella dei metadati
+
+        Args:
+            key (str): chiave del metadato
+            default (str, optional): valore restituito se la chiave non esiste
+
+        Returns:
+            str or None: valore del metadato
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else default
+
+
+    def version(self):
+        """Versione dei profili: cambia a ogni salvataggio o eliminazione di un profilo
+
+        Returns:
+            int: versione corrente (0 se nessun profilo è mai stato scritto)
+        """
+        return int(self.get_meta(VERSION_KEY, 0))
+
+
+    def _bump_version(self):
+        # da chiamare dentro la transazione che modifica i profili
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+            (VERSION_KEY,)
+        )
+
+
+    def save_many(self, users, meta=None):
+        """Salva più profili in un'unica transazione
+
+        Args:
+            users (iterable[dict]): profili degli utenti
+            meta (dict, optional): metadati da salvare nella stessa transazione
+        """
+        users = list(users)
+        if not users and not meta:
+            return
+
+        user_rows = [
+            (user["user_id"], float(user["target_readability"]), vector_to_blob(user["topic_vector"]))
+            for user in users
+        ]
+        history_rows = [
+            (user["user_id"], position, str(doc_id))
+            for user in users
+            for position, doc_id in enumerate(user.get("history", []))
+        ]
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO users (user_id, target_readability, topic_vector) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET "
+                "target_readability = excluded.target_readability, topic_vector = excluded.topic_vector",
+                user_rows
+            )
+            self._conn.executemany("DELETE FROM history WHERE user_id = ?", [(row[0],) for row in user_rows])
+            self._conn.executemany(
+                "INSERT INTO history (user_id, position, doc_id) VALUES (?, ?, ?)",
+                history_rows
+            )
+            if users:
+                self._bump_version()
+            if meta:
+                self._conn.executemany(
+                    "INSERT INTO meta (key, value) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    [(key, str(value)) for key, value in meta.items()]
+                )
+
+
+    def delete(self, user_id):
+        """Elimina il profilo di un utente
+
+        Args:
+            user_id (int): identificativo dell'utente
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM history WHERE user_id = ?", (user_id,))
+            self._conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+            self._bump_version()
+
+
+
+def migrate_json_profiles(json_dir, store, batch_size=1000):
+    """Importa nel database i profili salvati come file user{id}.json
+
+    Args:
+        json_dir (str): cartella contenente i file json dei profili
+        store (ProfileStore): archivio di destinazione
+        batch_size (int): numero di profili salvati per transazione
+
+    Returns:
+        int: numero di profili importati
+    """
+    if not os.path.isdir(json_dir):
+        return 0
+
+    batch = []
+    count = 0
+    for file in sorted(os.listdir(json_dir)):
+        if not (file.startswith("user") and file.endswith(".json")):
+            continue
+
+        user_json = load_json(os.path.join(json_dir, file))
+        batch.append({
+            "user_id": user_json['user_id'],
+            "topic_vector": user_json['topic_vector'],
+            "target_readability": user_json['target_readability'],
+            "history": user_json.get('history', []),
+        })
+
+        if len(batch) >= batch_size:
+            store.save_many(batch)
+            count += len(batch)
+            batch = []
+
+    store.save_many(batch)
+    return count + len(batch)
+
+
+if __name__ == "__main__":
+    config = load_yaml()
+    paths = config['paths']
+
+    parser = argparse.ArgumentParser(description="Migrazione dei profili utente json nel database SQLite")
+    parser.add_argument("--json-dir", default=paths['user_json'])
+    parser.add_argument("--db", default=paths.get('user_db', "data/profiles.db"))
+    args = parser.parse_args()
+
+    store = ProfileStore(os.path.join(PROJECT_ROOT, args.db))
+    count = migrate_json_profiles(os.path.join(PROJECT_ROOT, args.json_dir), store)
+    store.close()
+
+    print(f" Migrati {count} profili utente in {args.db}")
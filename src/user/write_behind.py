@@ -0,0 +1,155 @@
+import threading
+import time
+
+from src.user.profile_cache import copy_profile
+
+
+class WriteBehindPersister:
+    """Salvataggio asincrono (write-behind) dei profili utente
+
+    I profili aggiornati vengono messi in coda e scritti sull'archivio da un thread
+    in background, a intervalli regolari o quando la coda raggiunge max_batch.
+    Più aggiornamenti dello stesso utente fra due scritture vengono accorpati:
+    si salva solo l'ultimo. Il blocco in scrittura resta visibile a pending()
+    finché la transazione non è confermata.
+    """
+    def __init__(self, store, flush_interval=1.0, max_batch=500):
+        """Avvia il thread di scrittura
+
+        Args:
+            store (ProfileStore): archivio su cui salvare i profili (deve offrire save_many)
+            flush_interval (float): secondi massimi fra due scritture
+            max_batch (int): numero di profili in coda che forza una scrittura anticipata
+        """
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self._pending = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.last_error = None
+
+        self._thread = threading.Thread(target=self._run, name="profile-write-behind", daemon=True)
+        self._thread.start()
+
+
+    def submit(self, user):
+        """Mette in coda il profilo da salvare (copiandolo)
+
+        Args:
+            user (dict): profilo dell'utente
+
+        Raises:
+            RuntimeError: se il persister è già stato chiuso
+        """
+        snapshot = copy_profile(user)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("WriteBehindPersister chiuso")
+            self._pending[snapshot["user_id"]] = snapshot
+            self.submitted += 1
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._wakeup.set()
+
+
+    def pending(self, user_id):
+        """Profilo in attesa di scrittura per un utente
+
+        Args:
+            user_id (int): identificativo dell'utente
+
+        Returns:
+            dict or None: copia dell'ultimo profilo in coda o in scrittura oppure None
+        """
+        with self._lock:
+            user = self._pending.get(user_id)
+            if user is None:
+                user = self._inflight.get(user_id)
+        return copy_profile(user) if user is not None else None
+
+
+    def _write_pending(self):
+        with self._write_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = {}
+                # fino alla conferma della scrittura l'archivio ha ancora i profili vecchi
+                self._inflight = batch
+            if not batch:
+                return 0
+
+            try:
+                self.store.save_many(batch.values())
+            except Exception as e:
+                # rimette in coda i profili non scritti senza sovrascrivere quelli più recenti
+                with self._lock:
+                    for user_id, user in batch.items():
+                        self._pending.setdefault(user_id, user)
+                    self._inflight = {}
+                self.last_error = e
+                raise
+
+            with self._lock:
+                self._inflight = {}
+            self.written += len(batch)
+            self.batches += 1
+            return len(batch)
+
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self._write_pending()
+            except Exception:
+                time.sleep(self.flush_interval)
+            with self._lock:
+                if self._closed:
+                    return
+
+
+    def flush(self):
+        """Scrive subito sull'archivio tutti i profili in coda (bloccante)
+
+        Returns:
+            int: numero di profili scritti
+        """
+        return self._write_pending()
+
+
+    def close(self):
+        """Scrive i profili in coda e ferma il thread di scrittura"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        self._write_pending()
+
+
+    def stats(self):
+        """Statistiche del persister
+
+        Returns:
+            dict: profili inviati, scritti, accorpati, in coda e numero di scritture
+        """
+        with self._lock:
+            queued = len(self._pending) + len(self._inflight)
+        return {
+            "submitted": self.submitted,
+            "written": self.written,
+            "coalesced": self.submitted - self.written - queued,
+            "queued": queued,
+            "batches": self.batches
+        }
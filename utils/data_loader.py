@@ -37,3 +37,10 @@ def load_embedding():
         raise FileNotFoundError(f"file non trovato {emb_path}")
     return load_pickle(emb_path)
 
+
+def reset_caches():
+    """Svuota le cache dei loader: la chiamata successiva rilegge i file da disco
+        (usata dopo la pubblicazione di un nuovo corpus)
+    """
+    load_features_df.cache_clear()
+    load_embedding.cache_clear()
@@ -1,4 +1,6 @@
+import hashlib
 import json
+import numpy as np
 import pandas as pd
 import os
 import pickle
@@ -38,20 +40,22 @@ def load_json(path):
         return json.load(f)
     
 
-def save_json(data, path):
+def save_json(data, path, indent=4):
     """Salvataggio file json
     
     Args:
         data (dict): dati da salvare nel file json 
         path (str): stringa path dove salvare il file json
+        indent (int or None): indentazione, None per il formato compatto
     
     Returns:
         None  
     
     """
     os.makedirs(os.path.dirname(path), exist_ok=True)
+    separators = (",", ":") if indent is None else None
     with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+        json.dump(data, f, indent=indent, ensure_ascii=False, separators=separators)
         
 
 def load_csv(path):
@@ -108,6 +112,52 @@ def load_pickle(name_file):
     with open(name_file, 'rb') as pkl:
         data = pickle.load(pkl)
     return data
+
+
+def save_npz(path, arrays):
+    """Salvataggio di array numpy in un file npz
+    
+    Args:
+        path (str): path del file npz
+        arrays (dict[str, np.ndarray]): array da salvare indicizzati per nome
+    
+    Returns:
+        None
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+
+def load_npz(path):
+    """Caricamento di un file npz
+    
+    Args:
+        path (str): path del file npz
+    
+    Returns:
+        dict[str, np.ndarray]: array contenuti nel file indicizzati per nome
+    """
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Calcolo impronta sha1 del contenuto di un file
+    
+    Args:
+        path (str): path del file
+        chunk_size (int): dimensione dei blocchi letti dal file
+    
+    Returns:
+        str: digest esadecimale del contenuto del file
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
         
 def find(name, path):
     """Trovare un file in una directory